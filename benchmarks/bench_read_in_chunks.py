@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark for libcloud.utils.files.read_in_chunks.
+
+Streams a generated stream of the given size through read_in_chunks and
+reports the throughput and the peak RSS of the process. Every
+implementation runs in a separate process so the peak RSS values are not
+polluted by each other.
+
+The "legacy" implementation is the one used before the chunking pipeline
+was rewritten around a bytearray buffer. It copies the whole buffer for
+every incoming chunk when fill_size=True.
+
+Example (1 GB stream re-sliced into 5 MB S3 multipart chunks):
+
+    python benchmarks/bench_read_in_chunks.py --size 1024 --chunk-size 5120
+"""
+
+import os
+import sys
+import time
+import resource
+import subprocess
+from optparse import OptionParser
+
+# Add parent dir of this file's dir to sys.path (OS-agnostically)
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__),
+                                 os.path.pardir)))
+
+from libcloud.utils.py3 import b
+from libcloud.utils.py3 import next
+from libcloud.utils.files import read_in_chunks
+
+IMPLEMENTATIONS = ['legacy', 'current']
+
+
+def legacy_read_in_chunks(iterator, chunk_size=None, fill_size=False):
+    data = b('')
+    empty = False
+
+    while not empty or len(data) > 0:
+        if not empty:
+            try:
+                chunk = b(next(iterator))
+                if len(chunk) > 0:
+                    data += chunk
+                else:
+                    empty = True
+            except StopIteration:
+                empty = True
+
+        if len(data) == 0:
+            return
+
+        if fill_size:
+            if empty or len(data) >= chunk_size:
+                yield data[:chunk_size]
+                data = data[chunk_size:]
+        else:
+            yield data
+            data = b('')
+
+
+def generate_stream(size, input_chunk_size):
+    block = b('x') * input_chunk_size
+    remaining = size
+
+    while remaining > 0:
+        if remaining < input_chunk_size:
+            block = block[:remaining]
+
+        yield block
+        remaining -= len(block)
+
+
+def get_peak_rss():
+    """
+    Return the peak RSS of the current process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on OS X and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024.0)
+
+    return peak / 1024.0
+
+
+def run(implementation, size, chunk_size, input_chunk_size, fill_size):
+    if implementation == 'legacy':
+        func = legacy_read_in_chunks
+    else:
+        func = read_in_chunks
+
+    stream = generate_stream(size, input_chunk_size)
+    transferred = 0
+    start = time.time()
+
+    for chunk in func(stream, chunk_size=chunk_size, fill_size=fill_size):
+        transferred += len(chunk)
+
+    duration = time.time() - start
+    assert transferred == size
+
+    print('%-8s %10.1f MB/s %10.1f MB peak RSS %8.2f s' %
+          (implementation, size / (1024.0 * 1024.0) / max(duration, 1e-9),
+           get_peak_rss(), duration))
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--size', type='int', default=1024,
+                      help='Size of the stream in MB (default: %default)')
+    parser.add_option('--chunk-size', type='int', default=5 * 1024,
+                      help='Size of the yielded chunks in KB '
+                           '(default: %default)')
+    parser.add_option('--input-chunk-size', type='int', default=64,
+                      help='Size of the chunks produced by the source '
+                           'stream in KB (default: %default)')
+    parser.add_option('--no-fill-size', action='store_false',
+                      dest='fill_size', default=True,
+                      help='Call read_in_chunks with fill_size=False')
+    parser.add_option('--implementation', choices=IMPLEMENTATIONS,
+                      help='Only run a single implementation in this '
+                           'process')
+    options, _ = parser.parse_args()
+
+    size = options.size * 1024 * 1024
+    chunk_size = options.chunk_size * 1024
+    input_chunk_size = options.input_chunk_size * 1024
+
+    if options.implementation:
+        run(options.implementation, size, chunk_size, input_chunk_size,
+            options.fill_size)
+        return
+
+    print('stream: %d MB, chunk size: %d KB, input chunk size: %d KB, '
+          'fill_size: %s' % (options.size, options.chunk_size,
+                             options.input_chunk_size, options.fill_size))
+
+    for implementation in IMPLEMENTATIONS:
+        args = [sys.executable, __file__,
+                '--size', str(options.size),
+                '--chunk-size', str(options.chunk_size),
+                '--input-chunk-size', str(options.input_chunk_size),
+                '--implementation', implementation]
+
+        if not options.fill_size:
+            args.append('--no-fill-size')
+
+        subprocess.call(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark for extracting fields from XML responses.
+
+Uses the elements from the test fixtures and reports how many of them are
+processed per second:
+
+ * "uncached" - findtext helper with namespaced paths rebuilt on every call
+   (the way fixxpath used to work)
+ * "findtext" - findtext helper with the fixxpath cache
+ * "extractor" - XmlFieldExtractor compiled once
+ * "driver" - the complete driver conversion function (e.g. _to_image)
+
+Example (50k EC2 images, e.g. a public AMI listing):
+
+    python benchmarks/bench_xml_fields.py --count 50000
+"""
+
+import os
+import sys
+import time
+from optparse import OptionParser
+from xml.etree import ElementTree as ET
+
+# Add parent dir of this file's dir to sys.path (OS-agnostically)
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__),
+                                 os.path.pardir)))
+
+from libcloud.utils.xml import findtext, findall, XmlFieldExtractor
+from libcloud.compute.drivers.ec2 import EC2NodeDriver
+from libcloud.compute.drivers.ec2 import NAMESPACE, NODE_FIELDS, IMAGE_FIELDS
+from libcloud.storage.base import Container
+from libcloud.storage.drivers.s3 import S3StorageDriver
+from libcloud.storage.drivers.s3 import NAMESPACE as S3_NAMESPACE
+from libcloud.storage.drivers.s3 import OBJECT_FIELDS
+from libcloud.storage.drivers.azure_blobs import AzureBlobsStorageDriver
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.path.pardir,
+                            'libcloud', 'test')
+
+
+def uncached_findtext(element, xpath, namespace):
+    xpath = '/'.join(['{%s}%s' % (namespace, e) for e in xpath.split('/')])
+    return element.findtext(xpath)
+
+
+def load_elements(path, xpath, namespace=None):
+    fp = open(os.path.join(FIXTURES_DIR, path))
+
+    try:
+        root = ET.XML(fp.read())
+    finally:
+        fp.close()
+
+    return findall(element=root, xpath=xpath, namespace=namespace)
+
+
+def get_cases():
+    """
+    Return a list of (name, elements, fields, namespace, to_object) tuples.
+    """
+    ec2 = EC2NodeDriver('key', 'secret')
+    s3 = S3StorageDriver('key', 'secret')
+    azure = AzureBlobsStorageDriver('account', 'c2VjcmV0')
+    container = Container(name='test', extra={}, driver=s3)
+    azure_container = Container(name='test', extra={}, driver=azure)
+
+    return [
+        ('ec2 node',
+         load_elements('compute/fixtures/ec2/describe_instances.xml',
+                       'reservationSet/item/instancesSet/item', NAMESPACE),
+         NODE_FIELDS, NAMESPACE, ec2._to_node),
+        ('ec2 image',
+         load_elements('compute/fixtures/ec2/describe_images.xml',
+                       'imagesSet/item', NAMESPACE),
+         IMAGE_FIELDS, NAMESPACE, ec2._to_image),
+        ('s3 object',
+         load_elements('storage/fixtures/s3/list_container_objects.xml',
+                       'Contents', S3_NAMESPACE),
+         OBJECT_FIELDS, S3_NAMESPACE,
+         lambda element: s3._to_obj(element, container)),
+        ('azure blob',
+         load_elements('storage/fixtures/azure_blobs/list_objects_1.xml',
+                       'Blobs/Blob'),
+         None, None,
+         lambda element: azure._xml_to_object(azure_container, element))
+    ]
+
+
+def run(name, label, func, elements, count):
+    repeat = max(1, count // len(elements))
+    start = time.time()
+
+    for _ in range(repeat):
+        for element in elements:
+            func(element)
+
+    duration = max(time.time() - start, 1e-9)
+    print('%-12s %-10s %12.0f items/s' %
+          (name, label, repeat * len(elements) / duration))
+
+
+def get_field_functions(fields, namespace):
+    fields = list(fields.items())
+    extractor = XmlFieldExtractor(dict(fields), namespace=namespace)
+
+    def uncached(element):
+        for _, xpath in fields:
+            uncached_findtext(element, xpath, namespace)
+
+    def cached(element):
+        for _, xpath in fields:
+            findtext(element=element, xpath=xpath, namespace=namespace)
+
+    return [('uncached', uncached), ('findtext', cached),
+            ('extractor', extractor.extract)]
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--count', type='int', default=50000,
+                      help='Number of elements to process for each case '
+                           '(default: %default)')
+    options, _ = parser.parse_args()
+
+    for name, elements, fields, namespace, to_object in get_cases():
+        functions = []
+
+        if fields is not None:
+            functions.extend(get_field_functions(fields, namespace))
+
+        functions.append(('driver', to_object))
+
+        for label, func in functions:
+            run(name, label, func, elements, options.count)
+
+
+if __name__ == '__main__':
+    main()
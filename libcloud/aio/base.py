@@ -0,0 +1,608 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio front-end for the libcloud drivers.
+
+Requests are sent over a non-blocking asyncio transport and the responses are
+parsed by the driver's existing Response classes, so drivers don't need to be
+rewritten. Front-end classes for the individual APIs live in
+L{libcloud.aio.compute}, L{libcloud.aio.storage} and L{libcloud.aio.dns}.
+
+Note: This module requires Python 3.6 or higher.
+"""
+
+import os
+import ssl
+import asyncio
+import warnings
+import functools
+
+import libcloud.security
+
+from libcloud.utils.py3 import httplib
+from libcloud.common.base import DEFAULT_POOL_MAX_SIZE
+
+__all__ = [
+    'AsyncHTTPConnection',
+    'AsyncHTTPResponse',
+    'AsyncConnection',
+    'AsyncDriver',
+    'get_async_driver'
+]
+
+# Maximum length of the status and header lines
+MAX_LINE_LENGTH = 65536
+
+
+class AsyncHTTPResponse(object):
+    """
+    Response returned by L{AsyncHTTPConnection}.
+
+    Status and headers are available as soon as the response object is
+    returned, body is read incrementally using the L{read} coroutine.
+    """
+
+    def __init__(self, reader, method, status, reason, version, headers):
+        self.status = status
+        self.reason = reason
+        self.version = version
+        self.chunked = False
+        self.will_close = False
+
+        self._reader = reader
+        self._headers = headers
+        self._callbacks = []
+        self._complete = False
+        self._length = None
+        self._chunk_left = None
+
+        lowercase_headers = dict((k.lower(), v) for k, v in headers)
+        encoding = lowercase_headers.get('transfer-encoding', '')
+        connection = lowercase_headers.get('connection', '').lower()
+
+        if version == 10 or connection == 'close':
+            self.will_close = True
+
+        if encoding.lower() == 'chunked':
+            self.chunked = True
+        elif 'content-length' in lowercase_headers:
+            self._length = int(lowercase_headers['content-length'])
+        else:
+            # Body is delimited by the server closing the connection
+            self.will_close = True
+
+        if method == 'HEAD' or status in (httplib.NO_CONTENT,
+                                          httplib.NOT_MODIFIED) or \
+           100 <= status < 200:
+            self._length = 0
+            self.chunked = False
+
+        if self._length == 0:
+            self._set_complete()
+
+    def getheaders(self):
+        return list(self._headers)
+
+    def getheader(self, name, default=None):
+        name = name.lower()
+
+        for key, value in self._headers:
+            if key.lower() == name:
+                return value
+
+        return default
+
+    def isclosed(self):
+        return self._complete
+
+    def add_done_callback(self, callback):
+        """
+        Register a function which is called with the response once the whole
+        body has been read.
+        """
+        if self._complete:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    async def read(self, amt=None):
+        """
+        Read up to C{amt} bytes of the response body (or the whole remaining
+        body if amt is not provided).
+
+        @rtype: C{bytes}
+        @return: Data or an empty string if the whole body has been read.
+        """
+        if self._complete:
+            return b''
+
+        if self.chunked:
+            data = await self._read_chunked(amt)
+        elif self._length is not None:
+            data = await self._read_length(amt)
+        else:
+            data = await self._reader.read(-1 if amt is None else amt)
+
+            if not data or amt is None:
+                self._set_complete()
+
+        return data
+
+    async def _read_length(self, amt):
+        if amt is None or amt >= self._length:
+            data = await self._reader.readexactly(self._length)
+        else:
+            data = await self._reader.read(amt)
+
+        if not data:
+            raise httplib.IncompleteRead(b'', self._length)
+
+        self._length -= len(data)
+
+        if self._length == 0:
+            self._set_complete()
+
+        return data
+
+    async def _read_chunked(self, amt):
+        result = []
+        remaining = amt
+
+        while remaining is None or remaining > 0:
+            if not self._chunk_left:
+                line = await self._reader.readline()
+                chunk_size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+
+                if chunk_size == 0:
+                    # Consume optional trailers and the final empty line
+                    while True:
+                        line = await self._reader.readline()
+
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+
+                    self._set_complete()
+                    break
+
+                self._chunk_left = chunk_size
+
+            size = self._chunk_left
+
+            if remaining is not None:
+                size = min(size, remaining)
+
+            data = await self._reader.readexactly(size)
+            self._chunk_left -= size
+            result.append(data)
+
+            if remaining is not None:
+                remaining -= size
+
+            if self._chunk_left == 0:
+                # Chunk data is followed by CRLF
+                await self._reader.readline()
+
+        return b''.join(result)
+
+    def _set_complete(self):
+        if self._complete:
+            return
+
+        self._complete = True
+
+        for callback in self._callbacks:
+            callback(self)
+
+        self._callbacks = []
+
+
+class BufferedHTTPResponse(object):
+    """
+    httplib like response which wraps a fully read L{AsyncHTTPResponse}.
+
+    It is passed to the driver's Response classes which expect a blocking
+    C{read} method.
+    """
+
+    def __init__(self, response, body):
+        self.status = response.status
+        self.reason = response.reason
+        self.version = response.version
+        self.chunked = False
+        self._headers = response.getheaders()
+        self._body = body
+
+    def read(self, amt=None):
+        if amt is None:
+            data, self._body = self._body, b''
+        else:
+            data, self._body = self._body[:amt], self._body[amt:]
+
+        return data
+
+    def getheaders(self):
+        return list(self._headers)
+
+    def getheader(self, name, default=None):
+        name = name.lower()
+
+        for key, value in self._headers:
+            if key.lower() == name:
+                return value
+
+        return default
+
+
+class AsyncHTTPConnection(object):
+    """
+    Minimal non-blocking HTTP/1.1 client connection with keep-alive support.
+    """
+
+    def __init__(self, host, port, secure=True, timeout=None,
+                 ssl_context=None):
+        self.host = host
+        self.port = int(port)
+        self.secure = secure
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+
+        self._reader = None
+        self._writer = None
+        self._response = None
+
+        # True once the whole last request has been sent to the server
+        self.request_written = False
+
+    async def connect(self):
+        kwargs = {}
+
+        if self.secure:
+            kwargs['ssl'] = self.ssl_context or get_ssl_context()
+            kwargs['server_hostname'] = self.host
+
+        coro = asyncio.open_connection(self.host, self.port,
+                                       limit=MAX_LINE_LENGTH, **kwargs)
+        self._reader, self._writer = await self._wait(coro)
+
+    def is_idle(self):
+        """
+        Return True if the connection is established and it can be used to
+        send another request.
+        """
+        if self._reader is None or self._reader.at_eof():
+            return False
+
+        return self._response is None or self._response.isclosed()
+
+    async def request(self, method, url, body=None, headers=None):
+        """
+        Send a request and return L{AsyncHTTPResponse} once the status line
+        and the headers have been received.
+        """
+        headers = headers or {}
+        self.request_written = False
+
+        if self._reader is None:
+            await self.connect()
+
+        if body is not None and not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        lines = ['%s %s HTTP/1.1' % (method, url)]
+
+        for key, value in headers.items():
+            lines.append('%s: %s' % (key, value))
+
+        if body is not None and 'Content-Length' not in headers:
+            lines.append('Content-Length: %d' % (len(body)))
+
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8'))
+
+        if body:
+            self._writer.write(body)
+
+        await self._wait(self._writer.drain())
+        self.request_written = True
+        self._response = await self._wait(self._read_response(method))
+        return self._response
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+        self._reader = None
+        self._writer = None
+        self._response = None
+
+    async def _read_response(self, method):
+        while True:
+            line = await self._reader.readline()
+
+            if not line:
+                raise httplib.BadStatusLine(repr(line))
+
+            try:
+                version, status, reason = \
+                    (line.decode('iso-8859-1').rstrip('\r\n').split(None, 2) +
+                     [''])[:3]
+                status = int(status)
+            except ValueError:
+                raise httplib.BadStatusLine(repr(line))
+
+            headers = []
+
+            while True:
+                line = await self._reader.readline()
+
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+                key, value = line.decode('iso-8859-1').split(':', 1)
+                headers.append((key.strip(), value.strip()))
+
+            # Skip "100 Continue" and other informational responses
+            if status != httplib.CONTINUE:
+                break
+
+        version = 10 if version == 'HTTP/1.0' else 11
+        response = AsyncHTTPResponse(reader=self._reader, method=method,
+                                     status=status, reason=reason,
+                                     version=version, headers=headers)
+        response.add_done_callback(self._on_response_complete)
+        return response
+
+    def _on_response_complete(self, response):
+        if response.will_close:
+            self.close()
+
+    async def _wait(self, coro):
+        if self.timeout:
+            return await asyncio.wait_for(coro, self.timeout)
+
+        return await coro
+
+
+class AsyncConnection(object):
+    """
+    Non-blocking counterpart of a L{libcloud.common.base.Connection}.
+
+    Requests are prepared by the wrapped connection (so all the
+    authentication and signing hooks are used) and the responses are parsed
+    by the connection's responseCls.
+
+    Note: Connection subclasses which override C{request} itself are not
+    supported, their front-ends need to fall back to the blocking methods.
+    """
+
+    transport_cls = AsyncHTTPConnection
+
+    def __init__(self, connection, max_idle=DEFAULT_POOL_MAX_SIZE):
+        """
+        @param connection: Connection instance to wrap.
+        @type connection: L{libcloud.common.base.Connection}
+
+        @param max_idle: Maximum number of idle connections per endpoint.
+        @type max_idle: C{int}
+        """
+        self.connection = connection
+        self.max_idle = max_idle
+        self._idle = {}
+
+    async def request(self, action, params=None, data=None, headers=None,
+                      method='GET', context=None):
+        """
+        Perform a request and return an instance of the connection's
+        responseCls.
+
+        @param context: Optional context which is set on the connection
+                        before the response is parsed.
+        @type context: C{dict}
+        """
+        response = await self.request_stream(action=action, params=params,
+                                             data=data, headers=headers,
+                                             method=method)
+        body = await response.read()
+
+        if context is not None:
+            self.connection.set_context(context)
+
+        return self.connection.responseCls(
+            response=BufferedHTTPResponse(response, body),
+            connection=self.connection)
+
+    async def request_stream(self, action, params=None, data=None,
+                             headers=None, method='GET'):
+        """
+        Perform a request and return L{AsyncHTTPResponse} whose body can be
+        read incrementally.
+
+        The underlying connection is reused once the body has been fully
+        read.
+
+        A request which fails on a reused keep-alive connection is only sent
+        again if the wrapped connection considers it safe (see
+        L{libcloud.common.base.Connection._can_resend_request}).
+        """
+        url, data, headers = self.connection._prepare_request(
+            action=action, params=params, data=data, headers=headers,
+            method=method)
+
+        key = (self.connection.host, int(self.connection.port),
+               self.connection.secure)
+        transport = self._acquire(key)
+        reused = transport is not None
+
+        if transport is None:
+            transport = self._create_transport(*key)
+
+        try:
+            response = await transport.request(method, url, body=data,
+                                               headers=headers)
+        except (ConnectionError, httplib.BadStatusLine,
+                asyncio.IncompleteReadError):
+            transport.close()
+
+            if not reused or not self.connection._can_resend_request(
+                    method=method, data=data, raw=False,
+                    written=transport.request_written):
+                raise
+
+            # Reused keep-alive connection has been closed by the server
+            transport = self._create_transport(*key)
+            response = None
+        except:
+            transport.close()
+            raise
+
+        if response is None:
+            try:
+                response = await transport.request(method, url, body=data,
+                                                   headers=headers)
+            except:
+                transport.close()
+                raise
+
+        response.add_done_callback(functools.partial(self._release, key,
+                                                     transport))
+        return response
+
+    def close(self):
+        """
+        Close all the idle connections.
+        """
+        for transports in self._idle.values():
+            for transport in transports:
+                transport.close()
+
+        self._idle = {}
+
+    def _create_transport(self, host, port, secure):
+        return self.transport_cls(host=host, port=port, secure=secure,
+                                  timeout=self.connection.timeout)
+
+    def _acquire(self, key):
+        transports = self._idle.get(key, [])
+
+        while transports:
+            transport = transports.pop()
+
+            if transport.is_idle():
+                return transport
+
+            transport.close()
+
+        return None
+
+    def _release(self, key, transport, response):
+        if response.will_close or not transport.is_idle():
+            return
+
+        transports = self._idle.setdefault(key, [])
+
+        if len(transports) < self.max_idle:
+            transports.append(transport)
+        else:
+            transport.close()
+
+
+class AsyncDriver(object):
+    """
+    Base class for the asyncio driver front-ends.
+
+    Methods which don't have a non-blocking implementation for a particular
+    driver fall back to running the blocking method in an executor.
+    """
+
+    def __init__(self, driver, executor=None):
+        """
+        @param driver: Driver instance to wrap.
+        @type driver: L{libcloud.common.base.BaseDriver}
+
+        @param executor: Optional executor used for the methods which fall
+                         back to the blocking implementation (defaults to the
+                         event loop's default executor).
+        @type executor: C{concurrent.futures.Executor}
+        """
+        self.driver = driver
+        self.executor = executor
+        self.connection = AsyncConnection(driver.connection)
+
+    def close(self):
+        self.connection.close()
+
+    async def _run_sync(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(func, *args,
+                                                            **kwargs))
+
+    async def _iterate_sync(self, iterator):
+        """
+        Turn a blocking iterator into an asynchronous one.
+        """
+        iterator = iter(iterator)
+        sentinel = object()
+
+        while True:
+            item = await self._run_sync(next, iterator, sentinel)
+
+            if item is sentinel:
+                break
+
+            yield item
+
+
+def get_async_driver(driver, front_ends, default, **kwargs):
+    """
+    Return the most specific front-end for the provided driver instance.
+
+    @param front_ends: List of (driver class, front-end class) tuples.
+    @type front_ends: C{list}
+
+    @param default: Front-end class to use if the driver doesn't have a
+                    dedicated one.
+    @type default: C{class}
+    """
+    for driver_cls, front_end_cls in front_ends:
+        if isinstance(driver, driver_cls):
+            return front_end_cls(driver, **kwargs)
+
+    return default(driver, **kwargs)
+
+
+def get_ssl_context():
+    """
+    Return SSL context which follows the settings in L{libcloud.security}.
+    """
+    if libcloud.security.VERIFY_SSL_CERT:
+        ca_certs = [cert for cert in libcloud.security.CA_CERTS_PATH
+                    if os.path.exists(cert) and os.path.isfile(cert)]
+
+        if ca_certs:
+            return ssl.create_default_context(cafile=ca_certs[0])
+
+        if libcloud.security.VERIFY_SSL_CERT_STRICT:
+            raise RuntimeError(
+                libcloud.security.CA_CERTS_UNAVAILABLE_ERROR_MSG)
+
+        warnings.warn(libcloud.security.CA_CERTS_UNAVAILABLE_WARNING_MSG)
+    else:
+        warnings.warn(libcloud.security.VERIFY_SSL_DISABLED_MSG)
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
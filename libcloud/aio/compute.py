@@ -0,0 +1,142 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio front-end for the compute drivers.
+
+Note: This module requires Python 3.6 or higher.
+
+Usage:
+
+    driver = get_async_driver(EC2NodeDriver('key', 'secret'))
+    nodes = await driver.list_nodes()
+"""
+
+import asyncio
+
+from libcloud.aio.base import AsyncDriver
+from libcloud.aio.base import get_async_driver as _get_async_driver
+from libcloud.compute.drivers.ec2 import BaseEC2NodeDriver
+
+__all__ = [
+    'AsyncNodeDriver',
+    'AsyncEC2NodeDriver',
+    'get_async_driver'
+]
+
+
+class AsyncNodeDriver(AsyncDriver):
+    """
+    asyncio front-end for a L{libcloud.compute.base.NodeDriver}.
+
+    This class falls back to running the blocking driver methods in an
+    executor, driver specific subclasses provide non-blocking
+    implementations.
+    """
+
+    async def list_nodes(self, *args, **kwargs):
+        """
+        @inherits: L{NodeDriver.list_nodes}
+        """
+        return await self._run_sync(self.driver.list_nodes, *args, **kwargs)
+
+    async def create_node(self, **kwargs):
+        """
+        @inherits: L{NodeDriver.create_node}
+        """
+        return await self._run_sync(self.driver.create_node, **kwargs)
+
+
+class AsyncEC2NodeDriver(AsyncNodeDriver):
+    """
+    Non-blocking front-end for the EC2 based drivers.
+    """
+
+    async def list_nodes(self, ex_node_ids=None):
+        """
+        @inherits: L{BaseEC2NodeDriver.list_nodes}
+        """
+        driver = self.driver
+        params = {'Action': 'DescribeInstances'}
+
+        if ex_node_ids:
+            params.update(driver._pathlist('InstanceId', ex_node_ids))
+
+        response = await self.connection.request(driver.path, params=params)
+        nodes = driver._to_reservation_nodes(response.object)
+
+        if not nodes:
+            return nodes
+
+        params = driver._get_describe_addresses_params(nodes)
+        response = await self.connection.request(driver.path, params=params)
+        mappings = driver._to_nodes_elastic_ip_mappings(response.object, nodes)
+        driver._add_elastic_ips(nodes, mappings)
+        return nodes
+
+    async def create_node(self, **kwargs):
+        """
+        @inherits: L{BaseEC2NodeDriver.create_node}
+        """
+        driver = self.driver
+        params = driver._get_create_node_params(**kwargs)
+        response = await self.connection.request(driver.path, params=params)
+        nodes = driver._to_nodes(response.object, 'instancesSet/item')
+
+        tags = {'Name': kwargs['name']}
+        results = await asyncio.gather(*[self._create_tags(node, tags)
+                                         for node in nodes],
+                                       return_exceptions=True)
+
+        for node, result in zip(nodes, results):
+            if isinstance(result, Exception):
+                continue
+
+            node.name = kwargs['name']
+            node.extra.update({'tags': tags})
+
+        if len(nodes) == 1:
+            return nodes[0]
+        else:
+            return nodes
+
+    async def _create_tags(self, resource, tags):
+        if type(self.driver).ex_create_tags is not \
+           BaseEC2NodeDriver.ex_create_tags:
+            # Driver has a custom implementation (e.g. Nimbus doesn't
+            # support tags)
+            return await self._run_sync(self.driver.ex_create_tags,
+                                        resource=resource, tags=tags)
+
+        params = self.driver._get_create_tags_params(resource=resource,
+                                                     tags=tags)
+        await self.connection.request(self.driver.path, params=params)
+
+
+ASYNC_DRIVERS = [
+    (BaseEC2NodeDriver, AsyncEC2NodeDriver)
+]
+
+
+def get_async_driver(driver, **kwargs):
+    """
+    Return asyncio front-end for the provided compute driver instance.
+
+    @param driver: Driver instance.
+    @type driver: L{libcloud.compute.base.NodeDriver}
+
+    @rtype: L{AsyncNodeDriver}
+    """
+    return _get_async_driver(driver, ASYNC_DRIVERS, AsyncNodeDriver, **kwargs)
@@ -0,0 +1,95 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio front-end for the DNS drivers.
+
+Note: This module requires Python 3.6 or higher.
+
+Usage:
+
+    driver = get_async_driver(Route53DNSDriver('key', 'secret'))
+    records = await driver.list_records(zone)
+"""
+
+from libcloud.aio.base import AsyncDriver
+from libcloud.aio.base import get_async_driver as _get_async_driver
+from libcloud.dns.drivers.route53 import Route53DNSDriver, API_ROOT
+
+__all__ = [
+    'AsyncDNSDriver',
+    'AsyncRoute53DNSDriver',
+    'get_async_driver'
+]
+
+
+class AsyncDNSDriver(AsyncDriver):
+    """
+    asyncio front-end for a L{libcloud.dns.base.DNSDriver}.
+
+    This class falls back to running the blocking driver methods in an
+    executor, driver specific subclasses provide non-blocking
+    implementations.
+    """
+
+    async def list_records(self, zone):
+        """
+        @inherits: L{DNSDriver.list_records}
+        """
+        return await self._run_sync(self.driver.list_records, zone)
+
+
+class AsyncRoute53DNSDriver(AsyncDNSDriver):
+    """
+    Non-blocking front-end for the Route53 driver.
+    """
+
+    async def list_records(self, zone):
+        """
+        @inherits: L{DNSDriver.list_records}
+
+        Records are retrieved one page at a time while the response is
+        truncated.
+        """
+        uri = API_ROOT + 'hostedzone/' + zone.id + '/rrset'
+        params = {}
+        records = []
+
+        while params is not None:
+            response = await self.connection.request(
+                uri, params=params, context={'zone_id': zone.id})
+            data = response.object
+
+            records.extend(self.driver._to_records(data=data, zone=zone))
+            params = self.driver._get_next_records_params(data=data)
+
+        return records
+
+
+ASYNC_DRIVERS = [
+    (Route53DNSDriver, AsyncRoute53DNSDriver)
+]
+
+
+def get_async_driver(driver, **kwargs):
+    """
+    Return asyncio front-end for the provided DNS driver instance.
+
+    @param driver: Driver instance.
+    @type driver: L{libcloud.dns.base.DNSDriver}
+
+    @rtype: L{AsyncDNSDriver}
+    """
+    return _get_async_driver(driver, ASYNC_DRIVERS, AsyncDNSDriver, **kwargs)
@@ -0,0 +1,154 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio front-end for the storage drivers.
+
+Note: This module requires Python 3.6 or higher.
+
+Usage:
+
+    driver = get_async_driver(S3StorageDriver('key', 'secret'))
+
+    async for obj in driver.iterate_container_objects(container):
+        print(obj.name)
+"""
+
+from libcloud.utils.py3 import httplib
+from libcloud.utils.xml import fixxpath
+from libcloud.common.types import LibcloudError
+from libcloud.aio.base import AsyncDriver
+from libcloud.aio.base import get_async_driver as _get_async_driver
+from libcloud.storage.types import ObjectDoesNotExistError
+from libcloud.storage.drivers.s3 import S3StorageDriver
+
+__all__ = [
+    'AsyncStorageDriver',
+    'AsyncS3StorageDriver',
+    'get_async_driver'
+]
+
+
+class AsyncStorageDriver(AsyncDriver):
+    """
+    asyncio front-end for a L{libcloud.storage.base.StorageDriver}.
+
+    This class falls back to running the blocking driver methods in an
+    executor, driver specific subclasses provide non-blocking
+    implementations.
+    """
+
+    async def iterate_container_objects(self, container):
+        """
+        Return an asynchronous generator of objects for the given container.
+
+        @inherits: L{StorageDriver.iterate_container_objects}
+        """
+        iterator = await self._run_sync(
+            self.driver.iterate_container_objects, container)
+
+        async for obj in self._iterate_sync(iterator):
+            yield obj
+
+    async def download_object_as_stream(self, obj, chunk_size=None):
+        """
+        Return an asynchronous generator which yields object data.
+
+        @inherits: L{StorageDriver.download_object_as_stream}
+        """
+        iterator = await self._run_sync(
+            self.driver.download_object_as_stream, obj,
+            chunk_size=chunk_size)
+
+        async for chunk in self._iterate_sync(iterator):
+            yield chunk
+
+
+class AsyncS3StorageDriver(AsyncStorageDriver):
+    """
+    Non-blocking front-end for the S3 based drivers.
+    """
+
+    async def iterate_container_objects(self, container):
+        driver = self.driver
+        params = {}
+        last_key = None
+        exhausted = False
+        container_path = driver._get_container_path(container)
+
+        while not exhausted:
+            if last_key:
+                params['marker'] = last_key
+
+            response = await self.connection.request(container_path,
+                                                     params=params)
+
+            if response.status != httplib.OK:
+                raise LibcloudError('Unexpected status code: %s' %
+                                    (response.status), driver=driver)
+
+            objects = driver._to_objs(obj=response.object,
+                                      xpath='Contents', container=container)
+            is_truncated = response.object.findtext(fixxpath(
+                xpath='IsTruncated', namespace=driver.namespace)).lower()
+            exhausted = (is_truncated == 'false')
+
+            last_key = None
+            for obj in objects:
+                last_key = obj.name
+                yield obj
+
+    async def download_object_as_stream(self, obj, chunk_size=None):
+        driver = self.driver
+        chunk_size = chunk_size or self.driver.chunk_size
+        obj_path = driver._get_object_path(obj.container, obj.name)
+        response = await self.connection.request_stream(obj_path,
+                                                        method='GET')
+
+        if response.status == httplib.NOT_FOUND:
+            await response.read()
+            raise ObjectDoesNotExistError(object_name=obj.name,
+                                          value='', driver=driver)
+        elif response.status != httplib.OK:
+            await response.read()
+            raise LibcloudError(value='Unexpected status code: %s' %
+                                      (response.status),
+                                driver=driver)
+
+        while True:
+            data = await response.read(chunk_size)
+
+            if not data:
+                break
+
+            yield data
+
+
+ASYNC_DRIVERS = [
+    (S3StorageDriver, AsyncS3StorageDriver)
+]
+
+
+def get_async_driver(driver, **kwargs):
+    """
+    Return asyncio front-end for the provided storage driver instance.
+
+    @param driver: Driver instance.
+    @type driver: L{libcloud.storage.base.StorageDriver}
+
+    @rtype: L{AsyncStorageDriver}
+    """
+    return _get_async_driver(driver, ASYNC_DRIVERS, AsyncStorageDriver,
+                             **kwargs)
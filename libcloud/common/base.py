@@ -13,9 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import with_statement
+
 import sys
 import ssl
 import time
+import socket
+import select
+import threading
 
 from xml.etree import ElementTree as ET
 from pipes import quote as pquote
@@ -34,15 +39,27 @@ from libcloud.utils.py3 import urlencode
 from libcloud.utils.py3 import StringIO
 from libcloud.utils.py3 import u
 from libcloud.utils.py3 import b
+from libcloud.utils.py3 import bytes
+from libcloud.utils.py3 import basestring
 
 from libcloud.utils.misc import lowercase_keys
 from libcloud.utils.compression import decompress_data
+from libcloud.utils.compression import DecompressingReader
+from libcloud.utils.xml import XmlItemIterator, XML_PARSE_ERRORS
+from libcloud.utils.jsonstream import JsonItemIterator
 from libcloud.common.types import LibcloudError, MalformedResponseError
 
 from libcloud.httplib_ssl import LibcloudHTTPSConnection
 
 LibcloudHTTPConnection = httplib.HTTPConnection
 
+# Maximum number of idle connections which are kept around per
+# (connection class, host, port) combination.
+DEFAULT_POOL_MAX_SIZE = 10
+
+# Number of seconds after which an idle pooled connection is discarded.
+DEFAULT_POOL_IDLE_TIMEOUT = 60
+
 
 # Stores information about all of the issued HTTP request.
 # Request logger is only active is LIBCLOUD_DEBUG and LIBCLOUD_REQUESTS_STATS
@@ -131,6 +148,16 @@ class Response(object):
         """
         return self.status == httplib.OK or self.status == httplib.CREATED
 
+    def close(self):
+        """
+        Close the response.
+
+        The body has already been fully read so this is a no-op. It allows
+        the responses returned by L{Connection.request_stream} to be closed
+        without checking whether they are streamed.
+        """
+        pass
+
     def _decompress_response(self, response):
         """
         Decompress a response body if it is using deflate or gzip encoding.
@@ -236,6 +263,153 @@ class RawResponse(Response):
         return self._reason
 
 
+class StreamResponse(object):
+    """
+    Response whose body is read incrementally from the socket instead of
+    being buffered in memory.
+
+    The underlying HTTP connection is owned by the response until the whole
+    body has been read (or the response is closed) and only then handed back
+    to the connection pool.
+    """
+
+    def __init__(self, response, connection, http_connection, pool_key):
+        self.status = response.status
+        self.headers = lowercase_keys(dict(response.getheaders()))
+        self.error = response.reason
+        self.connection = connection
+        self.response = response
+
+        self._http_connection = http_connection
+        self._pool_key = pool_key
+        self._started = False
+        self._closed = False
+
+        original_data = getattr(response, '_original_data', None)
+        encoding = self.headers.get('content-encoding', None)
+
+        if original_data is not None:
+            # LoggingConnection has already read and decompressed the body
+            if PY3:
+                from io import BytesIO
+                cls = BytesIO
+            else:
+                cls = StringIO
+
+            self.body = cls(b(original_data))
+        elif encoding in ['zlib', 'deflate']:
+            self.body = DecompressingReader(response, 'zlib')
+        elif encoding in ['gzip', 'x-gzip']:
+            self.body = DecompressingReader(response, 'gzip')
+        else:
+            self.body = response
+
+    def read(self, amt=None):
+        if self._closed:
+            return b('')
+
+        data = self.body.read(amt)
+
+        if not self._started and data:
+            # Non-streaming responses strip the body as well, XML parser
+            # doesn't accept whitespace in front of the declaration.
+            data = data.lstrip()
+            self._started = True
+
+            if not data:
+                return self.read(amt)
+
+        if not data:
+            self._release()
+
+        return data
+
+    def iterparse(self, xpath, namespace=None):
+        """
+        Iterate over the XML elements at the provided path (relative to the
+        root element) as they are read from the socket.
+
+        @rtype: L{XmlStreamIterator}
+        """
+        return XmlStreamIterator(response=self, xpath=xpath,
+                                 namespace=namespace)
+
+    def iterjson(self, path=None):
+        """
+        Iterate over the items of the JSON array at the provided path as they
+        are read from the socket.
+
+        @rtype: L{JsonStreamIterator}
+        """
+        return JsonStreamIterator(response=self, path=path)
+
+    def close(self):
+        """
+        Close the response. If the body hasn't been fully read, the underlying
+        connection is closed instead of being returned to the pool.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+
+        try:
+            self._http_connection.close()
+        except Exception:
+            pass
+
+    def _release(self):
+        pool = self.connection.pool
+
+        if pool is None or self._pool_key is None:
+            self.close()
+            return
+
+        self._closed = True
+        pool.release(self._pool_key, self._http_connection)
+
+
+class XmlStreamIterator(XmlItemIterator):
+    """
+    L{XmlItemIterator} which reads from a L{StreamResponse} and raises
+    L{MalformedResponseError} if the response body is not valid XML.
+    """
+
+    def __init__(self, response, xpath, namespace=None):
+        super(XmlStreamIterator, self).__init__(source=response, xpath=xpath,
+                                                namespace=namespace)
+        self.response = response
+
+    def __iter__(self):
+        try:
+            for element in super(XmlStreamIterator, self).__iter__():
+                yield element
+        except XML_PARSE_ERRORS:
+            self.response.close()
+            driver = self.response.connection.driver
+            raise MalformedResponseError('Failed to parse XML', driver=driver)
+
+
+class JsonStreamIterator(JsonItemIterator):
+    """
+    L{JsonItemIterator} which reads from a L{StreamResponse} and raises
+    L{MalformedResponseError} if the response body is not valid JSON.
+    """
+
+    def __init__(self, response, path=None):
+        super(JsonStreamIterator, self).__init__(source=response, path=path)
+        self.response = response
+
+    def __iter__(self):
+        try:
+            for item in super(JsonStreamIterator, self).__iter__():
+                yield item
+        except ValueError:
+            self.response.close()
+            driver = self.response.connection.driver
+            raise MalformedResponseError('Failed to parse JSON', driver=driver)
+
+
 #TODO: Move this to a better location/package
 class LoggingConnection():
     """
@@ -390,28 +564,244 @@ class LoggingHTTPConnection(LoggingConnection, LibcloudHTTPConnection):
                                                body, headers)
 
 
+class ConnectionPool(object):
+    """
+    A pool of reusable (keep-alive) HTTP(s) connections.
+
+    Idle connections are stored per key (usually a connection class, host and
+    port combination) and handed out again on subsequent requests so the
+    TCP and TLS handshake only needs to be performed once.
+    """
+
+    def __init__(self, max_size=DEFAULT_POOL_MAX_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+        """
+        @param max_size: Maximum number of idle connections per key.
+        @type max_size: C{int}
+
+        @param idle_timeout: Number of seconds after which an idle connection
+                             is closed instead of being reused.
+        @type idle_timeout: C{int}
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Return an idle connection for the provided key or None if no usable
+        connection is available.
+        """
+        now = time.time()
+
+        while True:
+            with self._lock:
+                connections = self._idle.get(key, [])
+
+                if not connections:
+                    return None
+
+                connection, last_used = connections.pop()
+
+            if self.idle_timeout is not None and \
+               (now - last_used) > self.idle_timeout:
+                self._close(connection)
+                continue
+
+            if self._is_dropped(connection):
+                self._close(connection)
+                continue
+
+            return connection
+
+    def release(self, key, connection):
+        """
+        Return a connection to the pool.
+
+        Connections with a pending (not fully read) response are closed since
+        they can't be safely reused.
+        """
+        if not self._is_idle(connection):
+            self._close(connection)
+            return
+
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+
+            if len(connections) < self.max_size:
+                connections.append((connection, time.time()))
+                return
+
+        self._close(connection)
+
+    def discard(self, key):
+        """
+        Close all the idle connections for the provided key.
+        """
+        with self._lock:
+            connections = self._idle.pop(key, [])
+
+        for connection, _ in connections:
+            self._close(connection)
+
+    def clear(self):
+        """
+        Close all the idle connections in this pool.
+        """
+        with self._lock:
+            keys = list(self._idle.keys())
+
+        for key in keys:
+            self.discard(key)
+
+    def _is_idle(self, connection):
+        # httplib doesn't expose the connection state so we need to peek at
+        # the private attributes. Other connection classes (e.g. mock ones
+        # used in the tests) are always considered to be idle.
+        state = getattr(connection, '_HTTPConnection__state', None)
+
+        if state is None:
+            return True
+
+        if state != 'Idle':
+            return False
+
+        response = getattr(connection, '_HTTPConnection__response', None)
+        return response is None or response.isclosed()
+
+    def _is_dropped(self, connection):
+        # An idle keep-alive socket should never be readable. If it is, the
+        # server has either closed the connection or sent garbage.
+        sock = getattr(connection, 'sock', None)
+
+        if sock is None:
+            return False
+
+        try:
+            readable, _, _ = select.select([sock], [], [], 0.0)
+        except (select.error, socket.error, ValueError, TypeError):
+            return True
+
+        return bool(readable)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class ThreadLocalAttribute(object):
+    """
+    Descriptor for an instance attribute which holds a separate value for
+    each thread.
+
+    It is used for the per-request state of a L{Connection} so a single
+    connection (and driver) instance can be shared between multiple threads.
+    """
+
+    def __init__(self, name, default=None, default_factory=None):
+        """
+        @param name: Attribute name.
+        @type name: C{str}
+
+        @param default: Value which is returned if the attribute hasn't been
+                        set in the current thread.
+
+        @param default_factory: Optional callable which is used to construct
+                                a default value (e.g. C{dict}) for each
+                                thread.
+        """
+        self.name = name
+        self.default = default
+        self.default_factory = default_factory
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        local = self._get_local(instance)
+
+        try:
+            return getattr(local, self.name)
+        except AttributeError:
+            if self.default_factory is None:
+                return self.default
+
+            value = self.default_factory()
+            setattr(local, self.name, value)
+            return value
+
+    def __set__(self, instance, value):
+        setattr(self._get_local(instance), self.name, value)
+
+    def __delete__(self, instance):
+        try:
+            delattr(self._get_local(instance), self.name)
+        except AttributeError:
+            pass
+
+    def _get_local(self, instance):
+        local = instance.__dict__.get('_thread_local', None)
+
+        if local is None:
+            # setdefault is atomic so all the threads end up with the same
+            # threading.local instance
+            local = instance.__dict__.setdefault('_thread_local',
+                                                 threading.local())
+        return local
+
+
 class Connection(object):
     """
     A Base Connection class to derive from.
+
+    Connection instances are thread safe - state of an in-flight request
+    (connection, action, method and context) is kept per thread and the
+    underlying HTTP connections are handed out by a thread safe pool.
     """
     #conn_classes = (LoggingHTTPSConnection)
     conn_classes = (LibcloudHTTPConnection, LibcloudHTTPSConnection)
 
     responseCls = Response
     rawResponseCls = RawResponse
-    connection = None
     host = '127.0.0.1'
     port = 443
     timeout = None
     secure = 1
     driver = None
-    action = None
+
+    # Per-request state
+    connection = ThreadLocalAttribute('connection')
+    action = ThreadLocalAttribute('action')
+    method = ThreadLocalAttribute('method')
+    context = ThreadLocalAttribute('context', default_factory=dict)
+
+    # Pool of keep-alive connections shared by all the connection classes.
+    # Set it to None in a subclass to open a new connection for each request.
+    # Only httplib based connection classes are pooled (see _is_pooled).
+    pool = ConnectionPool()
+
+    # Exceptions which indicate that a reused keep-alive connection has been
+    # closed by the remote server.
+    stale_connection_exceptions = (socket.error, httplib.BadStatusLine)
+
+    # Requests with these methods are retried on a new connection even if
+    # the reused connection failed after the request had been written (the
+    # server might have processed it already).
+    idempotent_methods = ['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']
+
+    _pool_key = ThreadLocalAttribute('_pool_key')
+    _connection_reused = ThreadLocalAttribute('_connection_reused',
+                                              default=False)
+    _request_written = ThreadLocalAttribute('_request_written',
+                                            default=False)
 
     def __init__(self, secure=True, host=None, port=None, url=None,
                  timeout=None):
         self.secure = secure and 1 or 0
         self.ua = []
-        self.context = {}
 
         self.request_path = ''
 
@@ -495,7 +885,20 @@ class Connection(object):
         if self.timeout and not PY25:
             kwargs.update({'timeout': self.timeout})
 
-        connection = self.conn_classes[secure](**kwargs)
+        # Hand the previously used connection back before acquiring a new one
+        self._release_connection()
+
+        connection_cls = self.conn_classes[secure]
+
+        if self.pool is not None and self._is_pooled(connection_cls):
+            self._pool_key = (connection_cls, kwargs['host'], kwargs['port'],
+                              kwargs.get('timeout', None))
+            connection = self.pool.acquire(self._pool_key)
+
+        self._connection_reused = connection is not None
+
+        if connection is None:
+            connection = connection_cls(**kwargs)
         # You can uncoment this line, if you setup a reverse proxy server
         # which proxies to your endpoint, and lets you easily capture
         # connections in cleartext when you setup the proxy to do SSL
@@ -504,6 +907,45 @@ class Connection(object):
 
         self.connection = connection
 
+    def _is_pooled(self, connection_cls):
+        """
+        Return True if the connections of the provided class can be reused.
+
+        Connection classes which are not based on httplib (e.g. the mock ones
+        used in the tests) keep per-request state on the instance so they are
+        only pooled if they set the C{pooled} class attribute to True.
+        """
+        try:
+            default = issubclass(connection_cls, httplib.HTTPConnection)
+        except TypeError:
+            default = False
+
+        return getattr(connection_cls, 'pooled', default)
+
+    def _release_connection(self):
+        """
+        Return the current connection to the pool so it can be reused by
+        subsequent requests.
+        """
+        key = self._pool_key
+        self._pool_key = None
+
+        if key is None or self.connection is None or self.pool is None:
+            return
+
+        self.pool.release(key, self.connection)
+
+    def _close_connection(self):
+        """
+        Close the current connection instead of returning it to the pool.
+        """
+        self._pool_key = None
+
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
     def _user_agent(self):
         user_agent_suffix = ' '.join(['(%s)' % x for x in self.ua])
 
@@ -562,6 +1004,88 @@ class Connection(object):
 
         @return: An instance of type I{responseCls}
         """
+        url, data, headers = self._prepare_request(action=action,
+                                                   params=params, data=data,
+                                                   headers=headers,
+                                                   method=method, raw=raw)
+
+        # Removed terrible hack...this a less-bad hack that doesn't execute a
+        # request twice, but it's still a hack.
+        self.connect()
+
+        try:
+            http_response = self._send_request(method=method, url=url,
+                                               data=data, headers=headers,
+                                               raw=raw)
+        except:
+            self._close_connection()
+            raise
+
+        if raw:
+            # Body is sent and response is read by the caller, connection is
+            # released on the next request.
+            return self.rawResponseCls(connection=self)
+
+        try:
+            response = self.responseCls(response=http_response,
+                                        connection=self)
+        finally:
+            self._release_connection()
+
+        return response
+
+    def request_stream(self, action, params=None, data=None, headers=None,
+                       method='GET'):
+        """
+        Request a given `action` and return a response whose body can be read
+        incrementally.
+
+        Arguments are the same as for L{request}. Unsuccessful responses are
+        fully read and parsed using I{responseCls} which means that errors
+        are handled the same way as with L{request}.
+
+        @return: An instance of L{StreamResponse} or I{responseCls} for
+                 unsuccessful responses.
+        """
+        url, data, headers = self._prepare_request(action=action,
+                                                   params=params, data=data,
+                                                   headers=headers,
+                                                   method=method)
+
+        self.connect()
+
+        try:
+            http_response = self._send_request(method=method, url=url,
+                                               data=data, headers=headers)
+        except:
+            self._close_connection()
+            raise
+
+        if not 200 <= http_response.status < 300:
+            try:
+                response = self.responseCls(response=http_response,
+                                            connection=self)
+            finally:
+                self._release_connection()
+
+            return response
+
+        # Detach the HTTP connection so the requests performed while the
+        # body is being consumed don't reuse or close it
+        http_connection, pool_key = self.connection, self._pool_key
+        self.connection = None
+        self._pool_key = None
+
+        return StreamResponse(response=http_response, connection=self,
+                              http_connection=http_connection,
+                              pool_key=pool_key)
+
+    def _prepare_request(self, action, params=None, data=None, headers=None,
+                         method='GET', raw=False):
+        """
+        Run all the request hooks and return a (url, data, headers) tuple
+        which is ready to be sent to the server.
+        """
         if params is None:
             params = {}
 
@@ -613,33 +1137,93 @@ class Connection(object):
         else:
             url = action
 
-        # Removed terrible hack...this a less-bad hack that doesn't execute a
-        # request twice, but it's still a hack.
-        self.connect()
+        return url, data, headers
+
+    def _send_request(self, method, url, data, headers, raw=False):
+        """
+        Send a request using the current connection and return the response
+        (or None in "raw" mode).
+
+        If a reused keep-alive connection turns out to be closed by the
+        remote server, the request is transparently retried on a new
+        connection as long as it's safe to send it again (see
+        L{_can_resend_request}).
+        """
         try:
-            # @TODO: Should we just pass File object as body to request method
-            # instead of dealing with splitting and sending the file ourselves?
-            if raw:
-                self.connection.putrequest(method, url)
+            return self._send_request_once(method=method, url=url, data=data,
+                                           headers=headers, raw=raw)
+        except ssl.SSLError:
+            e = sys.exc_info()[1]
+            raise ssl.SSLError(str(e))
+        except self.stale_connection_exceptions:
+            if not self._connection_reused or \
+                    not self._can_resend_request(method=method, data=data,
+                                                 raw=raw):
+                raise
 
-                for key, value in list(headers.items()):
-                    self.connection.putheader(key, str(value))
+        # Other idle connections to the same endpoint are most likely stale
+        # as well
+        key = self._pool_key
+        self._close_connection()
 
-                self.connection.endheaders()
-            else:
-                self.connection.request(method=method, url=url, body=data,
-                                        headers=headers)
+        if key is not None and self.pool is not None:
+            self.pool.discard(key)
+
+        self.connect()
+
+        try:
+            return self._send_request_once(method=method, url=url, data=data,
+                                           headers=headers, raw=raw)
         except ssl.SSLError:
             e = sys.exc_info()[1]
             raise ssl.SSLError(str(e))
 
+    def _can_resend_request(self, method, data, raw, written=None):
+        """
+        Return True if a request which failed on a reused connection can be
+        sent again.
+
+        @param written: True if the whole request has been written to the
+                        connection (defaults to the state of the last request
+                        sent by this thread).
+        @type written: C{bool}
+        """
         if raw:
-            response = self.rawResponseCls(connection=self)
-        else:
-            response = self.responseCls(response=self.connection.getresponse(),
-                                        connection=self)
+            # Only the headers have been sent, the body is sent by the caller
+            # once the request succeeds
+            return True
 
-        return response
+        if data is not None and not isinstance(data, (basestring, bytes)):
+            # Iterator or file body has already been (partially) consumed
+            return False
+
+        if written is None:
+            written = self._request_written
+
+        if not written:
+            # The remote server can't act on an incomplete request
+            return True
+
+        return method.upper() in self.idempotent_methods
+
+    def _send_request_once(self, method, url, data, headers, raw=False):
+        self._request_written = False
+
+        # @TODO: Should we just pass File object as body to request method
+        # instead of dealing with splitting and sending the file ourselves?
+        if raw:
+            self.connection.putrequest(method, url)
+
+            for key, value in list(headers.items()):
+                self.connection.putheader(key, str(value))
+
+            self.connection.endheaders()
+            return None
+
+        self.connection.request(method=method, url=url, body=data,
+                                headers=headers)
+        self._request_written = True
+        return self.connection.getresponse()
 
     def morph_action_hook(self, action):
         return self.request_path + action
@@ -13,17 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
 import base64
 import hashlib
 import hmac
+import threading
 
 from libcloud.utils.py3 import urlencode
 from libcloud.utils.py3 import b
+from libcloud.utils.concurrency import start_workers
 
 from libcloud.common.base import ConnectionUserAndKey, PollingConnection
 from libcloud.common.base import JsonResponse
 from libcloud.common.types import MalformedResponseError
 
+# Number of items requested per page by the paged list iterators
+DEFAULT_PAGE_SIZE = 500
+
 
 class CloudStackResponse(JsonResponse):
     pass
@@ -103,6 +109,130 @@ class CloudStackConnection(ConnectionUserAndKey, PollingConnection):
         result = result.object[command]
         return result
 
+    def _sync_request_iter(self, command, key, **kwargs):
+        """Iterate over the items of a synchronous list call as they are
+           read from the socket instead of loading the whole (possibly huge)
+           response in memory."""
+
+        kwargs['command'] = command
+        response = self.request_stream(self.driver.path, params=kwargs)
+        command = command.lower() + 'response'
+
+        try:
+            items = response.iterjson(path='%s/%s' % (command, key))
+
+            for item in items:
+                yield item
+        finally:
+            response.close()
+
+        if command not in items.root:
+            raise MalformedResponseError(
+                "Unknown response format",
+                body=None,
+                driver=self.driver)
+
+    def _sync_request_pages(self, command, key, page_size=DEFAULT_PAGE_SIZE,
+                            concurrency=1, **kwargs):
+        """Iterate over the items of a synchronous list call one page at a
+           time using the page and pagesize parameters, so only the pages
+           which are being fetched are kept in memory.
+
+           With concurrency > 1, the number of pages is determined from the
+           item count in the first response and up to concurrency of the
+           following pages are fetched in parallel. Items are always
+           yielded in order.
+
+           If the response contains the item count, pages are fetched
+           until all the items have arrived and a first page which is
+           smaller than page_size (server side page size cap) determines
+           the size of the following pages."""
+
+        items, count = self._get_page(command, key, 1, page_size, kwargs)
+
+        for item in items:
+            yield item
+
+        if count is not None and len(items) < count:
+            if not items:
+                return
+
+            # The server caps the page size (default.page.size) so the size
+            # of the first page is the real one
+            page_size = len(items)
+
+        if count is None or concurrency <= 1:
+            page = 1
+            received = len(items)
+
+            while items:
+                if count is None and len(items) < page_size:
+                    # A short page is the last one
+                    return
+
+                if count is not None and received >= count:
+                    return
+
+                page += 1
+                items, _ = self._get_page(command, key, page, page_size,
+                                          kwargs)
+                received += len(items)
+
+                for item in items:
+                    yield item
+
+            return
+
+        last_page = (count + page_size - 1) // page_size
+        next_page = 2
+        pending = {}
+
+        def fetch(page, done, result):
+            try:
+                result['items'] = self._get_page(command, key, page,
+                                                 page_size, kwargs)[0]
+            except Exception:
+                result['error'] = sys.exc_info()[1]
+
+            done.set()
+
+        submit, finish = start_workers(fetch, concurrency)
+
+        try:
+            while next_page <= last_page or pending:
+                while next_page <= last_page and len(pending) < concurrency:
+                    done, result = threading.Event(), {}
+                    pending[next_page] = (done, result)
+                    submit(next_page, done, result)
+                    next_page += 1
+
+                page = min(pending.keys())
+                done, result = pending.pop(page)
+                done.wait()
+
+                if 'error' in result:
+                    raise result['error']
+
+                for item in result['items']:
+                    yield item
+        finally:
+            finish()
+
+    def _get_page(self, command, key, page, page_size, params):
+        """Return a (items, count) tuple for a single page. Count is the
+           total number of items (if provided by the API)."""
+
+        params = params.copy()
+        params['page'] = page
+        params['pagesize'] = page_size
+        result = self._sync_request(command, **params)
+        count = result.get('count', None)
+
+        if count is not None:
+            count = int(count)
+
+        return result.get(key, []), count
+
 
 class CloudStackDriverMixIn(object):
     host = None
@@ -118,5 +248,15 @@ class CloudStackDriverMixIn(object):
     def _sync_request(self, command, **kwargs):
         return self.connection._sync_request(command, **kwargs)
 
+    def _sync_request_iter(self, command, key, **kwargs):
+        return self.connection._sync_request_iter(command, key, **kwargs)
+
+    def _sync_request_pages(self, command, key, page_size=DEFAULT_PAGE_SIZE,
+                            concurrency=1, **kwargs):
+        return self.connection._sync_request_pages(command, key,
+                                                   page_size=page_size,
+                                                   concurrency=concurrency,
+                                                   **kwargs)
+
     def _async_request(self, command, **kwargs):
         return self.connection._async_request(command, **kwargs)
@@ -18,13 +18,27 @@ Common utilities for OpenStack
 """
 import sys
 import binascii
+import hashlib
 import os
+import stat
+import time
+import calendar
 import datetime
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
 
 from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
 from libcloud.utils.iso8601 import parse_date
 
 from libcloud.common.base import ConnectionUserAndKey, Response
+from libcloud.common.base import ThreadLocalAttribute
 from libcloud.compute.types import (LibcloudError, InvalidCredsError,
                                     MalformedResponseError)
 
@@ -49,15 +63,24 @@ AUTH_VERSIONS_WITH_EXPIRES = [
 # user from getting "InvalidCredsError" if token is about to expire.
 AUTH_TOKEN_EXPIRES_GRACE_SECONDS = 5
 
+# How many seconds before the auth token expiration time a token which is
+# shared through an auth cache is refreshed. Only a single connection
+# refreshes the token and the others keep using the cached one until then.
+AUTH_TOKEN_REFRESH_SECONDS = 60
+
 __all__ = [
     'OpenStackBaseConnection',
     'OpenStackAuthConnection',
     'OpenStackServiceCatalog',
     'OpenStackDriverMixin',
+    'OpenStackAuthCache',
+    'OpenStackMemoryAuthCache',
+    'OpenStackFileAuthCache',
     "OpenStackBaseConnection",
     "OpenStackAuthConnection",
 
-    'AUTH_TOKEN_EXPIRES_GRACE_SECONDS'
+    'AUTH_TOKEN_EXPIRES_GRACE_SECONDS',
+    'AUTH_TOKEN_REFRESH_SECONDS'
 ]
 
 
@@ -336,6 +359,8 @@ class OpenStackServiceCatalog(object):
             raise LibcloudError('auth version "%s" not supported'
                                 % (self._auth_version))
 
+        self._build_indexes()
+
     def get_catalog(self):
         return self._service_catalog
 
@@ -351,31 +376,46 @@ class OpenStackServiceCatalog(object):
         return result
 
     def get_endpoints(self, service_type=None, name=None):
-        eps = []
+        key = self._get_index_key(service_type, name)
+        return list(self._endpoints_index.get(key, []))
 
+    def get_endpoint(self, service_type=None, name=None, region=None):
+        key = self._get_index_key(service_type, name) + (region,)
+        return self._endpoint_index.get(key, {})
+
+    def _get_index_key(self, service_type, name):
+        # Auth 1.x catalog doesn't include the service types
         if '2.0' in self._auth_version:
-            endpoints = self._service_catalog.get(service_type, {}) \
-                                             .get(name, {})
-        elif ('1.1' in self._auth_version) or ('1.0' in self._auth_version):
-            endpoints = self._service_catalog.get(name, {})
+            return (service_type, name)
 
-        for regionName, values in endpoints.items():
-            eps.append(values[0])
+        return (None, name)
 
-        return eps
+    def _build_indexes(self):
+        """
+        Index the endpoints by (service_type, name) and by (service_type,
+        name, region) so the lookups which are done on every request don't
+        need to walk the catalog.
+        """
+        self._endpoints_index = {}
+        self._endpoint_index = {}
 
-    def get_endpoint(self, service_type=None, name=None, region=None):
         if '2.0' in self._auth_version:
-            endpoint = self._service_catalog.get(service_type, {}) \
-                                            .get(name, {}).get(region, [])
-        elif ('1.1' in self._auth_version) or ('1.0' in self._auth_version):
-            endpoint = self._service_catalog.get(name, {}).get(region, [])
-
-        # ideally an endpoint either isn't found or only one match is found.
-        if len(endpoint) == 1:
-            return endpoint[0]
+            services = self._service_catalog.items()
         else:
-            return {}
+            services = [(None, self._service_catalog)]
+
+        for service_type, names in services:
+            for name, regions in names.items():
+                key = (service_type, name)
+                self._endpoints_index[key] = []
+
+                for region, endpoints in regions.items():
+                    self._endpoints_index[key].append(endpoints[0])
+
+                    # ideally an endpoint either isn't found or only one
+                    # match is found.
+                    if len(endpoints) == 1:
+                        self._endpoint_index[key + (region,)] = endpoints[0]
 
     def _parse_auth_v1(self, service_catalog):
         for service, endpoints in service_catalog.items():
@@ -411,6 +451,184 @@ class OpenStackServiceCatalog(object):
                 catalog[region].append(endpoint)
 
 
+class OpenStackAuthCache(object):
+    """
+    Base class for caches of auth tokens and service catalogs which are
+    shared by multiple connections (e.g. all the drivers in a process or all
+    the processes on a host) so they don't all need to authenticate.
+
+    Cached values are dictionaries which can be serialized as JSON.
+    """
+
+    def get(self, key):
+        """
+        Return the cached value or C{None} if there is no value for the key.
+
+        @rtype: C{dict}
+        """
+        raise NotImplementedError('get not implemented for this cache')
+
+    def put(self, key, value):
+        """
+        Store a value in the cache.
+
+        @type value: C{dict}
+        """
+        raise NotImplementedError('put not implemented for this cache')
+
+    def get_lock(self, key):
+        """
+        Return a lock which serializes token refreshes for the provided key.
+
+        The returned object has the same acquire(blocking=True) and release()
+        methods as C{threading.Lock}.
+        """
+        raise NotImplementedError('get_lock not implemented for this cache')
+
+
+class OpenStackMemoryAuthCache(OpenStackAuthCache):
+    """
+    Auth cache which is shared by the connections in a single process.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._values.get(key, None)
+
+    def put(self, key, value):
+        self._values[key] = value
+
+    def get_lock(self, key):
+        self._lock.acquire()
+
+        try:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+
+            return self._locks[key]
+        finally:
+            self._lock.release()
+
+
+class OpenStackFileAuthCache(OpenStackAuthCache):
+    """
+    Auth cache which stores the values as files in a directory so they are
+    shared by all the processes on a host.
+
+    Values are replaced atomically so reading them doesn't require a lock.
+    Refreshes are serialized using fcntl file locks (on platforms without
+    fcntl only within a single process).
+    """
+
+    def __init__(self, path):
+        """
+        @param path: Path to the cache directory. It's created (only
+                     accessible by the current user) if it doesn't exist.
+        @type path: C{str}
+        """
+        self.path = path
+
+    def get(self, key):
+        try:
+            fp = open(self._get_file_path(key), 'r')
+
+            try:
+                return json.loads(fp.read())
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        self._create_directory()
+        file_path = self._get_file_path(key)
+
+        # mkstemp creates a file which is only readable by the current user
+        fd, tmp_path = tempfile.mkstemp(prefix='.%s' % (key), dir=self.path)
+
+        try:
+            os.write(fd, b(json.dumps(value)))
+        finally:
+            os.close(fd)
+
+        try:
+            os.rename(tmp_path, file_path)
+        except OSError:
+            # Windows doesn't allow renaming over an existing file
+            os.remove(file_path)
+            os.rename(tmp_path, file_path)
+
+    def get_lock(self, key):
+        self._create_directory()
+        return _FileLock(self._get_file_path(key) + '.lock')
+
+    def _create_directory(self):
+        if os.path.isdir(self.path):
+            return
+
+        try:
+            os.makedirs(self.path, stat.S_IRWXU)
+        except OSError:
+            # Created by another process in the meantime
+            if not os.path.isdir(self.path):
+                raise
+
+    def _get_file_path(self, key):
+        return os.path.join(self.path, '%s.json' % (key))
+
+
+class _FileLock(object):
+    """
+    Exclusive lock on a file which is shared by the processes on a host.
+    """
+
+    # Used if fcntl is not available
+    _thread_locks = OpenStackMemoryAuthCache()
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = None
+
+    def acquire(self, blocking=True):
+        if fcntl is None:
+            return self._thread_locks.get_lock(self.path).acquire(blocking)
+
+        fp = open(self.path, 'a')
+        flags = fcntl.LOCK_EX
+
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(fp.fileno(), flags)
+        except IOError:
+            fp.close()
+
+            if blocking:
+                raise
+
+            return False
+
+        self._fp = fp
+        return True
+
+    def release(self):
+        if fcntl is None:
+            self._thread_locks.get_lock(self.path).release()
+            return
+
+        fp, self._fp = self._fp, None
+
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+        finally:
+            fp.close()
+
+
 class OpenStackBaseConnection(ConnectionUserAndKey):
 
     """
@@ -465,6 +683,11 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
     @param ex_auth_connection: OpenStackAuthConnection instance to use for
     making HTTP requests. If not specified, a new one is instantiated.
     @type ex_auth_connection: C{OpenStackAuthConnection}
+
+    @param ex_auth_cache: Cache which shares the auth token and service
+    catalog with other connections (and processes) using the same
+    credentials. If specified, tokens are also refreshed before they expire.
+    @type ex_auth_cache: L{OpenStackAuthCache}
     """
 
     auth_url = None
@@ -475,8 +698,22 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
     service_type = None
     service_name = None
     service_region = None
+    auth_cache = None
     _auth_version = None
 
+    # Unix timestamps at which a token obtained through the auth cache should
+    # be refreshed and at which it can't be used anymore.
+    _auth_refresh_at = None
+    _auth_expires_at = None
+
+    # Endpoint is resolved before each request and it can differ between
+    # requests (e.g. CDN requests in the CloudFiles driver) so it's kept per
+    # thread.
+    host = ThreadLocalAttribute('host', default='127.0.0.1')
+    port = ThreadLocalAttribute('port', default=443)
+    secure = ThreadLocalAttribute('secure', default=1)
+    request_path = ThreadLocalAttribute('request_path', default='')
+
     def __init__(self, user_id, key, secure=True,
                  host=None, port=None, timeout=None,
                  ex_force_base_url=None,
@@ -487,7 +724,8 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
                  ex_force_service_type=None,
                  ex_force_service_name=None,
                  ex_force_service_region=None,
-                 ex_auth_connection=None):
+                 ex_auth_connection=None,
+                 ex_auth_cache=None):
 
         self._ex_force_base_url = ex_force_base_url
         self._ex_force_auth_url = ex_force_auth_url
@@ -498,6 +736,14 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
         self._ex_force_service_region = ex_force_service_region
 
         self._auth_connection = ex_auth_connection
+        self._auth_lock = threading.Lock()
+
+        # Maps the values the endpoint depends on to the parsed
+        # (host, port, secure, request_path) tuple
+        self._endpoint_cache = {}
+
+        if ex_auth_cache is not None:
+            self.auth_cache = ex_auth_cache
 
         if ex_force_auth_token:
             self.auth_token = ex_force_auth_token
@@ -585,24 +831,176 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
         after an initial authentication request.
         """
 
-        if not self.auth_token:
-            auth_connection = self.get_auth_connection_instance()
+        if not self.auth_token or self._is_auth_token_expired():
+            self._auth_lock.acquire()
 
-            # may throw InvalidCreds, etc
-            auth_connection.authenticate()
+            try:
+                # Another thread might have already authenticated while we
+                # were waiting for the lock
+                if not self.auth_token or self._is_auth_token_expired():
+                    self._authenticate()
+            finally:
+                self._auth_lock.release()
+        elif self._should_refresh_auth_token():
+            # Token is about to expire. Unless another thread is already
+            # refreshing it, do it now. Others keep using the current one.
+            if self._auth_lock.acquire(False):
+                try:
+                    if self._should_refresh_auth_token():
+                        self._authenticate()
+                finally:
+                    self._auth_lock.release()
 
-            self.auth_token = auth_connection.auth_token
-            self.auth_token_expires = auth_connection.auth_token_expires
-            self.auth_user_info = auth_connection.auth_user_info
+        # Set up connection info
+        key = (self.auth_token, self._ex_force_base_url,
+               self._get_endpoint_cache_key())
+        endpoint = self._endpoint_cache.get(key, None)
 
-            # pull out and parse the service catalog
-            self.service_catalog = OpenStackServiceCatalog(auth_connection.urls,
-                    ex_force_auth_version=self._auth_version)
+        if endpoint is None:
+            url = self._ex_force_base_url or self.get_endpoint()
+            endpoint = self._tuple_from_url(url)
+            self._endpoint_cache[key] = endpoint
 
-        # Set up connection info
-        url = self._ex_force_base_url or self.get_endpoint()
-        (self.host, self.port, self.secure, self.request_path) = \
-                self._tuple_from_url(url)
+        (self.host, self.port, self.secure, self.request_path) = endpoint
+
+    def _get_endpoint_cache_key(self):
+        """
+        Return a hashable value which identifies the endpoint returned by
+        L{get_endpoint} for the current auth token.
+
+        Connections which select the endpoint based on the per-request state
+        need to override this method.
+        """
+        return None
+
+    def _authenticate(self):
+        cache = self.auth_cache
+
+        if cache is None or \
+           self._auth_version not in AUTH_VERSIONS_WITH_EXPIRES:
+            self._set_auth_info(self._get_auth_info())
+            return
+
+        key = self._get_auth_cache_key()
+        info = cache.get(key)
+
+        if info is not None and \
+           time.time() < self._get_auth_info_times(info)[0]:
+            self._set_auth_info(info)
+            return
+
+        # If the cached token is still usable, only a single connection
+        # refreshes it and the others keep using it in the meantime
+        usable = info is not None and \
+            time.time() < self._get_auth_info_times(info)[1]
+        lock = cache.get_lock(key)
+
+        if not lock.acquire(not usable):
+            self._set_auth_info(info)
+            return
+
+        try:
+            # Token might have been refreshed while we were waiting for the
+            # lock
+            info = cache.get(key)
+
+            if info is None or \
+               time.time() >= self._get_auth_info_times(info)[0]:
+                info = self._get_auth_info(force=True)
+                cache.put(key, info)
+        finally:
+            lock.release()
+
+        self._set_auth_info(info)
+
+    def _get_auth_info(self, force=False):
+        """
+        Authenticate and return the auth token and service catalog as a
+        dictionary which can be stored in the auth cache.
+
+        @rtype: C{dict}
+        """
+        auth_connection = self.get_auth_connection_instance()
+
+        # may throw InvalidCreds, etc
+        auth_connection.authenticate(force=force)
+
+        expires = auth_connection.auth_token_expires
+
+        if expires is not None:
+            expires = expires.isoformat()
+
+        return {'auth_token': auth_connection.auth_token,
+                'auth_token_expires': expires,
+                'auth_user_info': auth_connection.auth_user_info,
+                'urls': auth_connection.urls}
+
+    def _set_auth_info(self, info):
+        # pull out and parse the service catalog
+        self.service_catalog = OpenStackServiceCatalog(info['urls'],
+                ex_force_auth_version=self._auth_version)
+
+        # Endpoints need to be resolved again from the new catalog
+        self._endpoint_cache = {}
+
+        expires = info['auth_token_expires']
+
+        if expires is not None:
+            expires = parse_date(expires)
+
+        self._auth_refresh_at, self._auth_expires_at = \
+            self._get_auth_info_times(info)
+        self.auth_token_expires = expires
+        self.auth_user_info = info['auth_user_info']
+
+        # Token is set last since other threads only wait for the lock if
+        # the token is not set
+        self.auth_token = info['auth_token']
+
+    def _get_auth_info_times(self, info):
+        """
+        Return a (refresh_at, expires_at) tuple of Unix timestamps for the
+        provided auth info.
+        """
+        expires = info['auth_token_expires']
+
+        if expires is None:
+            return None, None
+
+        expires = calendar.timegm(parse_date(expires).utctimetuple())
+        return (expires - AUTH_TOKEN_REFRESH_SECONDS,
+                expires - AUTH_TOKEN_EXPIRES_GRACE_SECONDS)
+
+    def _is_auth_token_expired(self):
+        """
+        Return True if the token obtained through the auth cache has expired.
+        """
+        if self.auth_cache is None or self._auth_expires_at is None:
+            return False
+
+        return time.time() >= self._auth_expires_at
+
+    def _should_refresh_auth_token(self):
+        """
+        Return True if the token obtained through the auth cache is about to
+        expire.
+        """
+        if self.auth_cache is None or self._auth_refresh_at is None:
+            return False
+
+        return time.time() >= self._auth_refresh_at
+
+    def _get_auth_cache_key(self):
+        """
+        Return the key under which the auth info for the credentials used by
+        this connection is cached.
+
+        @rtype: C{str}
+        """
+        auth_url = self._ex_force_auth_url or self.auth_url
+        values = [auth_url, self._auth_version, self.user_id, self.key,
+                  self._ex_tenant_name or '']
+        return hashlib.sha1(b('\n'.join(values))).hexdigest()
 
     def _add_cache_busting_to_params(self, params):
         cache_busting_number = binascii.hexlify(os.urandom(8))
@@ -625,7 +1023,8 @@ class OpenStackDriverMixin(object):
         'ex_force_service_type',
         'ex_force_service_name',
         'ex_force_service_region',
-        'ex_auth_connection'
+        'ex_auth_connection',
+        'ex_auth_cache'
     ]
 
     def __init__(self, *args, **kwargs):
@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+import threading
+
 from libcloud.utils.py3 import httplib
 
 __all__ = [
@@ -102,43 +105,219 @@ InvalidCredsException = InvalidCredsError
 
 
 class LazyList(object):
+    """
+    A list-like object whose items are retrieved page by page.
+
+    get_more is called with the last_key returned for the previous page
+    (None for the first page) and value_dict. It returns a tuple of
+    (items, last_key, exhausted).
+
+    Pages are only retrieved when they are needed by iteration, indexing or
+    slicing, so iterating over a list yields the first item after a single
+    request. If prefetch is True, the next page is retrieved in a
+    background thread while the items of the current page are consumed.
+    If max_pages is provided, only that many pages are kept in memory and a
+    page which has been dropped is retrieved again (using the remembered
+    last_key of the previous page) when it's needed. Note that len() (and
+    list() which calls it) needs to retrieve all the pages.
+    """
+
+    def __init__(self, get_more, value_dict=None, prefetch=False,
+                 max_pages=None):
+        if max_pages is not None and max_pages < 1:
+            raise ValueError('max_pages must be at least 1')
 
-    def __init__(self, get_more, value_dict=None):
-        self._data = []
-        self._last_key = None
-        self._exhausted = False
-        self._all_loaded = False
         self._get_more = get_more
         self._value_dict = value_dict or {}
+        self._prefetch = prefetch
+        self._max_pages = max_pages
 
-    def __iter__(self):
-        if not self._all_loaded:
-            self._load_all()
+        # Retained pages by page index, oldest first in _retained
+        self._pages = {}
+        self._retained = []
+
+        # last_key, first item index and size of every known page
+        self._page_keys = [None]
+        self._page_starts = []
+        self._page_sizes = []
+
+        # Total number of items (known once the last page has been loaded)
+        self._length = None
 
-        data = self._data
-        for i in data:
-            yield i
+        # (page index, thread, result) of the page being prefetched
+        self._prefetching = None
+
+    def __iter__(self):
+        return self._iter_from(0)
 
     def __getitem__(self, index):
-        if index >= len(self._data) and not self._all_loaded:
+        if isinstance(index, slice):
+            return self._get_slice(index)
+
+        if index < 0:
             self._load_all()
+            index += self._length
+
+            if index < 0:
+                raise IndexError('list index out of range')
 
-        return self._data[index]
+        page_index = self._find_page(index)
+
+        if page_index is None:
+            raise IndexError('list index out of range')
+
+        items = self._get_page(page_index)
+        return items[index - self._page_starts[page_index]]
 
     def __len__(self):
         self._load_all()
-        return len(self._data)
+        return self._length
 
     def __repr__(self):
-        self._load_all()
-        repr_string = ', ' .join([repr(item) for item in self._data])
+        repr_string = ', ' .join([repr(item) for item in self])
         repr_string = '[%s]' % (repr_string)
         return repr_string
 
+    def _iter_from(self, index):
+        page_index = self._find_page(index)
+
+        if page_index is None:
+            return
+
+        offset = index - self._page_starts[page_index]
+
+        while True:
+            items = self._get_page(page_index)
+            self._start_prefetch(page_index + 1)
+
+            for item in items[offset:]:
+                yield item
+
+            offset = 0
+            page_index += 1
+
+            if page_index == len(self._page_starts) and \
+                    self._length is not None:
+                return
+
+    def _get_slice(self, index):
+        start, stop, step = index.start, index.stop, index.step
+
+        if (start or 0) >= 0 and (stop is None or stop >= 0) and \
+                (step or 1) > 0:
+            # Only the pages up to the end of the slice are needed
+            start = start or 0
+            result = []
+
+            if stop is not None and stop <= start:
+                return result
+
+            for i, item in enumerate(self._iter_from(start)):
+                if stop is not None and start + i >= stop:
+                    break
+
+                if i % (step or 1) == 0:
+                    result.append(item)
+
+            return result
+
+        self._load_all()
+        return [self[i] for i in range(*index.indices(self._length))]
+
+    def _find_page(self, index):
+        """
+        Return the index of the page which holds the item with the given
+        index (or None if there is no such item). Pages are loaded until
+        the item is reached.
+        """
+        while self._length is None and (not self._page_starts or
+                                        self._page_starts[-1] +
+                                        self._page_sizes[-1] <= index):
+            self._get_page(len(self._page_starts))
+
+        if self._length is not None and index >= self._length:
+            return None
+
+        # Empty pages share the start with the following page
+        page_index = len(self._page_starts) - 1
+
+        while self._page_starts[page_index] > index or \
+                self._page_sizes[page_index] == 0:
+            page_index -= 1
+
+        return page_index
+
+    def _get_page(self, page_index):
+        if page_index in self._pages:
+            return self._pages[page_index]
+
+        items, last_key, exhausted = self._fetch(page_index)
+        items = list(items)
+
+        if page_index == len(self._page_starts):
+            if self._page_starts:
+                start = self._page_starts[-1] + self._page_sizes[-1]
+            else:
+                start = 0
+
+            self._page_starts.append(start)
+            self._page_sizes.append(len(items))
+
+            if exhausted:
+                self._length = start + len(items)
+            else:
+                self._page_keys.append(last_key)
+
+        self._pages[page_index] = items
+        self._retained.append(page_index)
+
+        if self._max_pages is not None:
+            while len(self._retained) > self._max_pages:
+                del self._pages[self._retained.pop(0)]
+
+        return items
+
+    def _fetch(self, page_index):
+        prefetching = self._prefetching
+
+        if prefetching is not None and prefetching[0] == page_index:
+            self._prefetching = None
+            thread, result = prefetching[1:]
+            thread.join()
+
+            if 'error' in result:
+                raise result['error']
+
+            return result['page']
+
+        return self._get_more(last_key=self._page_keys[page_index],
+                              value_dict=self._value_dict)
+
+    def _start_prefetch(self, page_index):
+        """
+        Start retrieving a page which hasn't been retrieved yet in a
+        background thread.
+        """
+        if not self._prefetch or self._prefetching is not None or \
+                self._length is not None or \
+                page_index != len(self._page_starts):
+            return
+
+        last_key = self._page_keys[page_index]
+        result = {}
+
+        def fetch():
+            try:
+                result['page'] = self._get_more(last_key=last_key,
+                                                value_dict=self._value_dict)
+            except Exception:
+                result['error'] = sys.exc_info()[1]
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        thread.start()
+        self._prefetching = (page_index, thread, result)
+
     def _load_all(self):
-        while not self._exhausted:
-            newdata, self._last_key, self._exhausted = \
-                     self._get_more(last_key=self._last_key,
-                                    value_dict=self._value_dict)
-            self._data.extend(newdata)
-        self._all_loaded = True
+        while self._length is None:
+            self._get_page(len(self._page_starts))
@@ -19,6 +19,7 @@ Provides base classes for working with drivers
 
 import sys
 import time
+import random
 import hashlib
 import os
 import socket
@@ -26,6 +27,7 @@ import struct
 import binascii
 
 from libcloud.utils.py3 import b
+from libcloud.utils.concurrency import run_concurrently, start_workers
 
 import libcloud.compute.ssh
 from libcloud.pricing import get_size_price
@@ -48,6 +50,9 @@ NODE_ONLINE_WAIT_TIMEOUT = 10 * 60
 # script.
 SSH_CONNECT_TIMEOUT = 5 * 60
 
+# How many nodes are created and deployed at the same time by deploy_nodes
+DEPLOY_NODES_CONCURRENCY = 10
+
 
 __all__ = [
     "Node",
@@ -624,33 +629,11 @@ class NodeDriver(BaseDriver):
                                    'public_ips', other option is 'private_ips'.
         @type       ssh_interface: C{str}
         """
-        if not libcloud.compute.ssh.have_paramiko:
-            raise RuntimeError('paramiko is not installed. You can install ' +
-                               'it using pip: pip install paramiko')
-
-        password = None
-
-        if 'create_node' not in self.features:
-            raise NotImplementedError(
-                'deploy_node not implemented for this driver')
-        elif 'generates_password' not in self.features["create_node"]:
-            if 'password' not in self.features["create_node"] and \
-               'ssh_key' not in self.features["create_node"]:
-                raise NotImplementedError(
-                    'deploy_node not implemented for this driver')
-
-            if 'auth' not in kwargs:
-                value = os.urandom(16)
-                kwargs['auth'] = NodeAuthPassword(binascii.hexlify(value))
-
-            if 'ssh_key' not in kwargs:
-                password = kwargs['auth'].password
+        self._check_deploy_supported()
+        password = self._prepare_deploy_kwargs(kwargs)
 
         node = self.create_node(**kwargs)
-        max_tries = kwargs.get('max_tries', 3)
-
-        if 'generates_password' in self.features['create_node']:
-            password = node.extra.get('password')
+        password = self._get_deploy_password(node, password)
 
         ssh_interface = kwargs.get('ssh_interface', 'public_ips')
 
@@ -665,42 +648,100 @@ class NodeDriver(BaseDriver):
             e = sys.exc_info()[1]
             raise DeploymentError(node=node, original_exception=e, driver=self)
 
-        if password:
-            node.extra['password'] = password
+        self._run_deployment(node=node, ip_addresses=ip_addresses,
+                             password=password, kwargs=kwargs)
+        return node
 
-        ssh_username = kwargs.get('ssh_username', 'root')
-        ssh_alternate_usernames = kwargs.get('ssh_alternate_usernames', [])
-        ssh_port = kwargs.get('ssh_port', 22)
-        ssh_timeout = kwargs.get('ssh_timeout', 10)
-        ssh_key_file = kwargs.get('ssh_key', None)
-        timeout = kwargs.get('timeout', SSH_CONNECT_TIMEOUT)
+    def deploy_nodes(self, node_kwargs,
+                     concurrency=DEPLOY_NODES_CONCURRENCY, **kwargs):
+        """
+        Create multiple nodes and run a deployment on each of them.
 
-        deploy_error = None
+        Nodes are created concurrently and a single poller waits for all of
+        them. As soon as a node is running, its deployment is started on a
+        pool of at most C{concurrency} workers.
 
-        for username in ([ssh_username] + ssh_alternate_usernames):
+        Failures don't abort the whole batch. Instead, a result for each
+        node is returned in the same order as C{node_kwargs}. A result is
+        either a L{Node} (successful deployment), a L{DeploymentError} (node
+        was created, but waiting for it or the deployment failed) or the
+        exception raised by L{create_node}.
+
+        @param      node_kwargs: List of dictionaries with the arguments
+                                 which are specific to a node (e.g. name).
+                                 They override the common arguments.
+        @type       node_kwargs: C{list} of C{dict}
+
+        @param      concurrency: Maximum number of nodes which are created
+                                 or deployed at the same time.
+        @type       concurrency: C{int}
+
+        @inherits: L{NodeDriver.deploy_node}
+
+        @rtype: C{list} of L{Node} or C{Exception}
+        """
+        self._check_deploy_supported()
+
+        all_kwargs = []
+        passwords = []
+
+        for values in node_kwargs:
+            node_kwargs_copy = kwargs.copy()
+            node_kwargs_copy.update(values)
+            all_kwargs.append(node_kwargs_copy)
+            passwords.append(self._prepare_deploy_kwargs(node_kwargs_copy))
+
+        results = [None] * len(all_kwargs)
+
+        def create(index):
             try:
-                self._connect_and_run_deployment_script(
-                    task=kwargs['deploy'], node=node,
-                    ssh_hostname=ip_addresses[0], ssh_port=ssh_port,
-                    ssh_username=username, ssh_password=password,
-                    ssh_key_file=ssh_key_file, ssh_timeout=ssh_timeout,
-                    timeout=timeout, max_tries=max_tries)
+                node = self.create_node(**all_kwargs[index])
             except Exception:
-                # Try alternate username
-                # Todo: Need to fix paramiko so we can catch a more specific
-                # exception
-                e = sys.exc_info()[1]
-                deploy_error = e
+                results[index] = sys.exc_info()[1]
             else:
-                # Script sucesfully executed, don't try alternate username
-                deploy_error = None
-                break
+                passwords[index] = self._get_deploy_password(
+                    node, passwords[index])
+                results[index] = node
 
-        if deploy_error is not None:
-            raise DeploymentError(node=node, original_exception=deploy_error,
-                                  driver=self)
+        run_concurrently(create, [(i,) for i in range(len(results))],
+                         concurrency)
 
-        return node
+        indexes = dict([(results[i].uuid, i) for i in range(len(results))
+                        if isinstance(results[i], Node)])
+
+        def deploy(index, node, ip_addresses):
+            try:
+                self._run_deployment(node=node, ip_addresses=ip_addresses,
+                                     password=passwords[index],
+                                     kwargs=all_kwargs[index])
+            except DeploymentError:
+                results[index] = sys.exc_info()[1]
+            else:
+                results[index] = node
+
+        submit, finish = start_workers(deploy, concurrency)
+        running = []
+
+        try:
+            for node, ip_addresses in self._iterate_running_nodes(
+                    nodes=[results[i] for i in sorted(indexes.values())],
+                    wait_period=3,
+                    timeout=kwargs.get('timeout', NODE_ONLINE_WAIT_TIMEOUT),
+                    ssh_interface=kwargs.get('ssh_interface', 'public_ips')):
+                running.append(node.uuid)
+                submit(indexes[node.uuid], node, ip_addresses)
+        except Exception:
+            e = sys.exc_info()[1]
+
+            for uuid, index in indexes.items():
+                if uuid not in running:
+                    results[index] = DeploymentError(node=results[index],
+                                                     original_exception=e,
+                                                     driver=self)
+        finally:
+            finish()
+
+        return results
 
     def create_volume(self, size, name, location=None, snapshot=None):
         """
@@ -779,17 +820,103 @@ class NodeDriver(BaseDriver):
                                        ssh_interface=ssh_interface,
                                        force_ipv4=force_ipv4)
 
+    def _check_deploy_supported(self):
+        if not libcloud.compute.ssh.have_paramiko:
+            raise RuntimeError('paramiko is not installed. You can install ' +
+                               'it using pip: pip install paramiko')
+
+        if 'create_node' not in self.features:
+            raise NotImplementedError(
+                'deploy_node not implemented for this driver')
+        elif 'generates_password' not in self.features["create_node"]:
+            if 'password' not in self.features["create_node"] and \
+               'ssh_key' not in self.features["create_node"]:
+                raise NotImplementedError(
+                    'deploy_node not implemented for this driver')
+
+    def _prepare_deploy_kwargs(self, kwargs):
+        """
+        Add a random password to the create_node arguments if the driver
+        doesn't generate one and no authentication was provided.
+
+        Returns the password which is used to connect to the node (if any).
+        """
+        password = None
+
+        if 'generates_password' not in self.features["create_node"]:
+            if 'auth' not in kwargs:
+                value = os.urandom(16)
+                kwargs['auth'] = NodeAuthPassword(binascii.hexlify(value))
+
+            if 'ssh_key' not in kwargs:
+                password = kwargs['auth'].password
+
+        return password
+
+    def _get_deploy_password(self, node, password):
+        if 'generates_password' in self.features['create_node']:
+            password = node.extra.get('password')
+
+        return password
+
+    def _run_deployment(self, node, ip_addresses, password, kwargs):
+        """
+        Connect to a running node and run the deployment.
+
+        @raises: L{DeploymentError}
+        """
+        if password:
+            node.extra['password'] = password
+
+        max_tries = kwargs.get('max_tries', 3)
+        ssh_username = kwargs.get('ssh_username', 'root')
+        ssh_alternate_usernames = kwargs.get('ssh_alternate_usernames', [])
+        ssh_port = kwargs.get('ssh_port', 22)
+        ssh_timeout = kwargs.get('ssh_timeout', 10)
+        ssh_key_file = kwargs.get('ssh_key', None)
+        timeout = kwargs.get('timeout', SSH_CONNECT_TIMEOUT)
+
+        deploy_error = None
+
+        for username in ([ssh_username] + ssh_alternate_usernames):
+            try:
+                self._connect_and_run_deployment_script(
+                    task=kwargs['deploy'], node=node,
+                    ssh_hostname=ip_addresses[0], ssh_port=ssh_port,
+                    ssh_username=username, ssh_password=password,
+                    ssh_key_file=ssh_key_file, ssh_timeout=ssh_timeout,
+                    timeout=timeout, max_tries=max_tries)
+            except Exception:
+                # Try alternate username
+                # Todo: Need to fix paramiko so we can catch a more specific
+                # exception
+                e = sys.exc_info()[1]
+                deploy_error = e
+            else:
+                # Script sucesfully executed, don't try alternate username
+                deploy_error = None
+                break
+
+        if deploy_error is not None:
+            raise DeploymentError(node=node, original_exception=deploy_error,
+                                  driver=self)
+
     def wait_until_running(self, nodes, wait_period=3, timeout=600,
-                           ssh_interface='public_ips', force_ipv4=True):
+                           ssh_interface='public_ips', force_ipv4=True,
+                           max_wait_period=30):
         """
         Block until the given nodes are fully booted and have an IP address
         assigned.
 
+        Only the nodes which are not running yet are retrieved on each loop
+        iteration and the time between the iterations grows exponentially
+        (with a random jitter) from wait_period up to max_wait_period.
+
         @keyword    nodes: list of node instances.
         @type       nodes: C{List} of L{Node}
 
-        @keyword    wait_period: How many seconds to between each loop
-                                 iteration (default is 3)
+        @keyword    wait_period: How many seconds to wait after the first
+                                 loop iteration (default is 3)
         @type       wait_period: C{int}
 
         @keyword    timeout: How many seconds to wait before timing out
@@ -804,6 +931,11 @@ class NodeDriver(BaseDriver):
         @keyword    force_ipv4: Ignore ipv6 IP addresses (default is True).
         @type       force_ipv4: C{bool}
 
+        @keyword    max_wait_period: Maximum number of seconds to wait
+                                     between the loop iterations (default is
+                                     30)
+        @type       max_wait_period: C{int}
+
         @return: C{[(Node, ip_addresses)]} list of tuple of Node instance and
                  list of ip_address on success.
 
@@ -811,6 +943,28 @@ class NodeDriver(BaseDriver):
                  success (node, ip_addresses).
         @rtype: C{list} of C{tuple}
         """
+        uuids = [n.uuid for n in nodes]
+        running = {}
+
+        for node, addresses in self._iterate_running_nodes(
+                nodes=nodes, wait_period=wait_period, timeout=timeout,
+                ssh_interface=ssh_interface, force_ipv4=force_ipv4,
+                max_wait_period=max_wait_period):
+            running[node.uuid] = (node, addresses)
+
+        return [running[uuid] for uuid in uuids]
+
+    def _iterate_running_nodes(self, nodes, wait_period=3, timeout=600,
+                               ssh_interface='public_ips', force_ipv4=True,
+                               max_wait_period=30):
+        """
+        Return a generator which yields a (node, ip_addresses) tuple for each
+        of the given nodes as soon as it's running and has an IP address of
+        the requested interface assigned.
+
+        Takes the same arguments as L{wait_until_running} and raises the same
+        errors.
+        """
         def is_supported(address):
             """Return True for supported address"""
             if force_ipv4 and not is_valid_ip_address(address=address,
@@ -829,29 +983,62 @@ class NodeDriver(BaseDriver):
             raise ValueError('ssh_interface argument must either be' +
                              'public_ips or private_ips')
 
-        uuids = set([n.uuid for n in nodes])
-        while time.time() < end:
-            nodes = self.list_nodes()
-            nodes = list([n for n in nodes if n.uuid in uuids])
+        uuids = [n.uuid for n in nodes]
+        pending = dict([(n.uuid, n) for n in nodes])
+        delay = wait_period
 
-            if len(nodes) > len(uuids):
+        while pending and time.time() < end:
+            node_ids = [n.id for n in pending.values()]
+            nodes = self._list_nodes_by_ids(node_ids)
+            nodes = list([n for n in nodes if n.uuid in pending])
+
+            if len(nodes) > len(pending):
                 found_uuids = [n.uuid for n in nodes]
                 msg = ('Unable to match specified uuids ' +
                        '(%s) with existing nodes. Found ' % (uuids) +
                        'multiple nodes with same uuid: (%s)' % (found_uuids))
                 raise LibcloudError(value=msg, driver=self)
 
-            running_nodes = [n for n in nodes if n.state == NodeState.RUNNING]
-            addresses = [filter_addresses(getattr(n, ssh_interface)) for n in
-                         running_nodes]
-            if len(running_nodes) == len(uuids) == len(addresses):
-                return list(zip(running_nodes, addresses))
-            else:
-                time.sleep(wait_period)
-                continue
+            # Nodes which are running and have an address are not polled
+            # anymore. A node can be running before its address is assigned.
+            for node in nodes:
+                if node.state != NodeState.RUNNING:
+                    continue
+
+                addresses = filter_addresses(getattr(node, ssh_interface))
 
-        raise LibcloudError(value='Timed out after %s seconds' % (timeout),
-                            driver=self)
+                if addresses:
+                    del pending[node.uuid]
+                    yield node, addresses
+
+            if not pending:
+                return
+
+            # "Equal jitter" so the nodes created at the same time by
+            # different processes don't poll the API at the same time
+            sleep = delay / 2.0 + random.uniform(0, delay / 2.0)
+            time.sleep(max(0, min(sleep, end - time.time())))
+            delay = min(delay * 2, max_wait_period)
+
+        if pending:
+            raise LibcloudError(value='Timed out after %s seconds' % (timeout),
+                                driver=self)
+
+    def _list_nodes_by_ids(self, node_ids):
+        """
+        Return the nodes with the provided ids which currently exist.
+
+        Used when polling for the state of specific nodes. By default, all
+        the nodes are listed and filtered on the client, drivers which can
+        retrieve only the specified nodes should override this method.
+
+        @param      node_ids: List of node ids
+        @type       node_ids: C{list} of C{str}
+
+        @rtype: C{list} of L{Node}
+        """
+        node_ids = set(node_ids)
+        return [node for node in self.list_nodes() if node.id in node_ids]
 
     def _ssh_client_connect(self, ssh_client, wait_period=1.5, timeout=300):
         """
@@ -102,14 +102,20 @@ class FileDeployment(Deployment):
 
         See also L{Deployment.run}
         """
+        client.put(**self._get_put_kwargs())
+        return node
+
+    def _get_put_kwargs(self):
+        """
+        Return the keyword arguments for L{BaseSSHClient.put} which upload
+        this file.
+        """
         perms = int(oct(os.stat(self.source).st_mode)[4:], 8)
 
         with open(self.source, 'rb') as fp:
             content = fp.read()
 
-        client.put(path=self.target, chmod=perms,
-                   contents=content)
-        return node
+        return {'path': self.target, 'chmod': perms, 'contents': content}
 
 
 class ScriptDeployment(Deployment):
@@ -222,8 +228,27 @@ class MultiStepDeployment(Deployment):
         """
         Run each deployment that has been added.
 
+        Consecutive L{FileDeployment} steps are uploaded with a single
+        L{BaseSSHClient.put_many} call.
+
         See also L{Deployment.run}
         """
+        files = []
+
         for s in self.steps:
+            if isinstance(s, FileDeployment):
+                files.append(s)
+                continue
+
+            self._put_files(node, client, files)
+            files = []
             node = s.run(node, client)
+
+        self._put_files(node, client, files)
         return node
+
+    def _put_files(self, node, client, files):
+        if len(files) == 1:
+            files[0].run(node, client)
+        elif files:
+            client.put_many([f._get_put_kwargs() for f in files])
@@ -196,60 +196,107 @@ class CloudStackNodeDriver(CloudStackDriverMixIn, NodeDriver):
         @inherits: L{NodeDriver.list_nodes}
         @rtype: C{list} of L{CloudStackNode}
         """
-        vms = self._sync_request('listVirtualMachines')
+        return list(self.ex_iterate_nodes())
+
+    def ex_iterate_nodes(self, ex_page_size=None, ex_concurrency=1):
+        """
+        Return a generator which yields the nodes as they are read from the
+        listVirtualMachines response, without loading the whole response in
+        memory.
+
+        @param ex_page_size: If specified, nodes are retrieved in pages of
+                             this size instead of in a single response.
+        @type  ex_page_size: C{int}
+
+        @param ex_concurrency: Maximum number of pages which are retrieved
+                               in parallel (only used with ex_page_size).
+        @type  ex_concurrency: C{int}
+
+        @rtype: C{generator} of L{CloudStackNode}
+        """
+        if ex_page_size:
+            addrs = self._sync_request_pages('listPublicIpAddresses',
+                                             'publicipaddress',
+                                             page_size=ex_page_size,
+                                             concurrency=ex_concurrency)
+            vms = self._sync_request_pages('listVirtualMachines',
+                                           'virtualmachine',
+                                           page_size=ex_page_size,
+                                           concurrency=ex_concurrency)
+        else:
+            addrs = self._sync_request('listPublicIpAddresses')
+            addrs = addrs.get('publicipaddress', [])
+            vms = self._sync_request_iter('listVirtualMachines',
+                                          'virtualmachine')
+
+        public_ips_map = self._to_public_ips_map(addrs)
+
+        for vm in vms:
+            yield self._to_node(vm, public_ips_map)
+
+    def _list_nodes_by_ids(self, node_ids):
         addrs = self._sync_request('listPublicIpAddresses')
+        public_ips_map = self._to_public_ips_map(
+            addrs.get('publicipaddress', []))
+        nodes = []
+
+        for node_id in node_ids:
+            vms = self._sync_request('listVirtualMachines', id=node_id)
+
+            for vm in vms.get('virtualmachine', []):
+                nodes.append(self._to_node(vm, public_ips_map))
 
+        return nodes
+
+    def _to_public_ips_map(self, addrs):
         public_ips_map = {}
-        for addr in addrs.get('publicipaddress', []):
+        for addr in addrs:
             if 'virtualmachineid' not in addr:
                 continue
             vm_id = addr['virtualmachineid']
             if vm_id not in public_ips_map:
                 public_ips_map[vm_id] = {}
             public_ips_map[vm_id][addr['ipaddress']] = addr['id']
+        return public_ips_map
 
-        nodes = []
+    def _to_node(self, vm, public_ips_map):
+        state = self.NODE_STATE_MAP[vm['state']]
 
-        for vm in vms.get('virtualmachine', []):
-            state = self.NODE_STATE_MAP[vm['state']]
-
-            public_ips = []
-            private_ips = []
-
-            for nic in vm['nic']:
-                if 'ipaddress' in nic:
-                    private_ips.append(nic['ipaddress'])
-
-            public_ips = public_ips_map.get(vm['id'], {}).keys()
-
-            node = CloudStackNode(
-                id=vm['id'],
-                name=vm.get('displayname', None),
-                state=state,
-                public_ips=public_ips,
-                private_ips=private_ips,
-                driver=self,
-                extra={'zoneid': vm['zoneid'], }
-            )
-
-            addrs = public_ips_map.get(vm['id'], {}).items()
-            addrs = [CloudStackAddress(node, v, k) for k, v in addrs]
-            node.extra['ip_addresses'] = addrs
-
-            rules = []
-            for addr in addrs:
-                result = self._sync_request('listIpForwardingRules')
-                for r in result.get('ipforwardingrule', []):
-                    rule = CloudStackForwardingRule(node, r['id'], addr,
-                                                    r['protocol'].upper(),
-                                                    r['startport'],
-                                                    r['endport'])
-                    rules.append(rule)
-            node.extra['ip_forwarding_rules'] = rules
-
-            nodes.append(node)
+        public_ips = []
+        private_ips = []
 
-        return nodes
+        for nic in vm['nic']:
+            if 'ipaddress' in nic:
+                private_ips.append(nic['ipaddress'])
+
+        public_ips = public_ips_map.get(vm['id'], {}).keys()
+
+        node = CloudStackNode(
+            id=vm['id'],
+            name=vm.get('displayname', None),
+            state=state,
+            public_ips=public_ips,
+            private_ips=private_ips,
+            driver=self,
+            extra={'zoneid': vm['zoneid'], }
+        )
+
+        addrs = public_ips_map.get(vm['id'], {}).items()
+        addrs = [CloudStackAddress(node, v, k) for k, v in addrs]
+        node.extra['ip_addresses'] = addrs
+
+        rules = []
+        for addr in addrs:
+            result = self._sync_request('listIpForwardingRules')
+            for r in result.get('ipforwardingrule', []):
+                rule = CloudStackForwardingRule(node, r['id'], addr,
+                                                r['protocol'].upper(),
+                                                r['startport'],
+                                                r['endport'])
+                rules.append(rule)
+        node.extra['ip_forwarding_rules'] = rules
+
+        return node
 
     def list_sizes(self, location=None):
         szs = self._sync_request('listServiceOfferings')
@@ -29,6 +29,7 @@ from xml.etree import ElementTree as ET
 from libcloud.utils.py3 import b
 
 from libcloud.utils.xml import fixxpath, findtext, findattr, findall
+from libcloud.utils.xml import XmlFieldExtractor
 from libcloud.common.aws import AWSBaseResponse, SignedAWSConnection
 from libcloud.common.types import (InvalidCredsError, MalformedResponseError,
                                    LibcloudError)
@@ -40,6 +41,9 @@ from libcloud.compute.base import NodeImage, StorageVolume
 API_VERSION = '2010-08-31'
 NAMESPACE = 'http://ec2.amazonaws.com/doc/%s/' % (API_VERSION)
 
+# Maximum number of values in a single filter
+MAX_FILTER_VALUES = 200
+
 """
 Sizes must be hardcoded, because Amazon doesn't provide an API to fetch them.
 From http://aws.amazon.com/ec2/instance-types/
@@ -338,6 +342,41 @@ REGION_DETAILS = {
 VALID_EC2_DATACENTERS = REGION_DETAILS.keys()
 VALID_EC2_DATACENTERS = [d for d in VALID_EC2_DATACENTERS if d != 'nimbus']
 
+# Fields of the instancesSet items. Node extra uses the same keys.
+NODE_FIELDS = {
+    'dns_name': 'dnsName',
+    'instanceId': 'instanceId',
+    'imageId': 'imageId',
+    'private_dns': 'privateDnsName',
+    'status': 'instanceState/name',
+    'keyname': 'keyName',
+    'launchindex': 'amiLaunchIndex',
+    'instancetype': 'instanceType',
+    'launchdatetime': 'launchTime',
+    'availability': 'placement/availabilityZone',
+    'kernelid': 'kernelId',
+    'ramdiskid': 'ramdiskId',
+    'clienttoken': 'clientToken',
+    'ipAddress': 'ipAddress',
+    'privateIpAddress': 'privateIpAddress'
+}
+
+# Fields of the imagesSet items. Image extra uses the same keys.
+IMAGE_FIELDS = {
+    'imageId': 'imageId',
+    'imageLocation': 'imageLocation',
+    'state': 'imageState',
+    'ownerid': 'imageOwnerId',
+    'owneralias': 'imageOwnerAlias',
+    'ispublic': 'isPublic',
+    'architecture': 'architecture',
+    'imagetype': 'imageType',
+    'platform': 'platform',
+    'rootdevicetype': 'rootDeviceType',
+    'virtualizationtype': 'virtualizationType',
+    'hypervisor': 'hypervisor'
+}
+
 
 class EC2NodeLocation(NodeLocation):
     def __init__(self, id, name, country, driver, availability_zone):
@@ -432,6 +471,11 @@ class BaseEC2NodeDriver(NodeDriver):
         'terminated': NodeState.TERMINATED
     }
 
+    _node_fields = XmlFieldExtractor(NODE_FIELDS, namespace=NAMESPACE)
+    _image_fields = XmlFieldExtractor(IMAGE_FIELDS, namespace=NAMESPACE)
+    _tag_fields = XmlFieldExtractor({'key': 'key', 'value': 'value'},
+                                    namespace=NAMESPACE)
+
     def _pathlist(self, key, arr):
         """
         Converts a key and an array of values into AWS query param format.
@@ -443,6 +487,66 @@ class BaseEC2NodeDriver(NodeDriver):
             params["%s.%s" % (key, i)] = value
         return params
 
+    def _get_filter_params(self, filters):
+        """
+        Converts a dictionary of filters into AWS query param format.
+        """
+        params = {}
+
+        for i, name in enumerate(sorted(filters.keys())):
+            values = filters[name]
+
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+
+            params['Filter.%d.Name' % (i + 1)] = name
+            params.update(self._pathlist('Filter.%d.Value' % (i + 1),
+                                         values))
+
+        return params
+
+    def _iterate_pages(self, params, xpath, to_objects, page_size=None):
+        """
+        Return a generator which follows the NextToken of a Describe*
+        action and yields a list of objects for every page.
+
+        Elements are converted as they are read from the socket and the
+        response is closed before a page is yielded so a connection is never
+        held while the caller processes the page.
+
+        @param      to_objects: Function which returns a list of objects
+                                for an element at the provided xpath.
+        @type       to_objects: C{callable}
+        """
+        params = params.copy()
+
+        if page_size:
+            params['MaxResults'] = str(page_size)
+
+        while True:
+            objects = []
+            response = self.connection.request_stream(self.path,
+                                                      params=params.copy())
+
+            try:
+                elements = response.iterparse(xpath=xpath,
+                                              namespace=NAMESPACE)
+
+                for element in elements:
+                    objects.extend(to_objects(element))
+            finally:
+                response.close()
+
+            yield objects
+
+            next_token = findtext(element=elements.root, xpath='nextToken',
+                                  namespace=NAMESPACE)
+
+            if not next_token:
+                break
+
+            params['NextToken'] = next_token
+
     def _get_boolean(self, element):
         tag = "{%s}%s" % (NAMESPACE, 'return')
         return element.findtext(tag) == 'true'
@@ -468,125 +572,88 @@ class BaseEC2NodeDriver(NodeDriver):
                 for el in object.findall(fixxpath(xpath=xpath,
                                                   namespace=NAMESPACE))]
 
+    def _to_reservation_nodes(self, object):
+        """
+        Return nodes for all the reservations in a DescribeInstances
+        response.
+        """
+        nodes = []
+        for rs in findall(element=object, xpath='reservationSet/item',
+                          namespace=NAMESPACE):
+            nodes += self._to_reservation(rs)
+        return nodes
+
+    def _to_reservation(self, element):
+        """
+        Return nodes for a single reservation (reservationSet item) element.
+        """
+        groups = [g.findtext('')
+                  for g in findall(element=element,
+                                   xpath='groupSet/item/groupId',
+                                   namespace=NAMESPACE)]
+        return self._to_nodes(element, 'instancesSet/item', groups)
+
+    def _add_elastic_ips(self, nodes, nodes_elastic_ips_mappings):
+        for node in nodes:
+            ips = nodes_elastic_ips_mappings[node.id]
+            node.public_ips.extend(ips)
+
     def _to_node(self, element, groups=None):
+        extra = self._node_fields.extract(element)
+
         try:
-            state = self.NODE_STATE_MAP[findattr(element=element,
-                                                 xpath="instanceState/name",
-                                                 namespace=NAMESPACE)
-                                        ]
+            state = self.NODE_STATE_MAP[extra['status']]
         except KeyError:
             state = NodeState.UNKNOWN
 
-        instance_id = findtext(element=element, xpath='instanceId',
-                               namespace=NAMESPACE)
-        tags = dict((findtext(element=item, xpath='key', namespace=NAMESPACE),
-                     findtext(element=item, xpath='value',
-                              namespace=NAMESPACE))
+        instance_id = extra['instanceId']
+        tags = dict(self._get_tag(item)
                     for item in findall(element=element,
                                         xpath='tagSet/item',
-                                        namespace=NAMESPACE)
-                    )
+                                        namespace=NAMESPACE))
 
         name = tags.get('Name', instance_id)
 
-        public_ip = findtext(element=element, xpath='ipAddress',
-                             namespace=NAMESPACE)
+        public_ip = extra.pop('ipAddress')
         public_ips = [public_ip] if public_ip else []
-        private_ip = findtext(element=element, xpath='privateIpAddress',
-                              namespace=NAMESPACE)
+        private_ip = extra.pop('privateIpAddress')
         private_ips = [private_ip] if private_ip else []
 
+        extra['productcode'] = [
+            p.text for p in findall(element=element,
+                                    xpath='productCodesSet/item/productCode',
+                                    namespace=NAMESPACE)]
+        extra['groups'] = groups
+        extra['tags'] = tags
+
         n = Node(
-            id=findtext(element=element, xpath='instanceId',
-                        namespace=NAMESPACE),
+            id=instance_id,
             name=name,
             state=state,
             public_ips=public_ips,
             private_ips=private_ips,
             driver=self.connection.driver,
-            extra={
-                'dns_name': findattr(element=element, xpath="dnsName",
-                                     namespace=NAMESPACE),
-                'instanceId': findattr(element=element, xpath="instanceId",
-                                       namespace=NAMESPACE),
-                'imageId': findattr(element=element, xpath="imageId",
-                                    namespace=NAMESPACE),
-                'private_dns': findattr(element=element,
-                                        xpath="privateDnsName",
-                                        namespace=NAMESPACE),
-                'status': findattr(element=element, xpath="instanceState/name",
-                                   namespace=NAMESPACE),
-                'keyname': findattr(element=element, xpath="keyName",
-                                    namespace=NAMESPACE),
-                'launchindex': findattr(element=element,
-                                        xpath="amiLaunchIndex",
-                                        namespace=NAMESPACE),
-                'productcode': [
-                    p.text for p in findall(
-                        element=element,
-                        xpath="productCodesSet/item/productCode",
-                        namespace=NAMESPACE
-                    )],
-                'instancetype': findattr(element=element, xpath="instanceType",
-                                         namespace=NAMESPACE),
-                'launchdatetime': findattr(element=element, xpath="launchTime",
-                                           namespace=NAMESPACE),
-                'availability': findattr(element,
-                                         xpath="placement/availabilityZone",
-                                         namespace=NAMESPACE),
-                'kernelid': findattr(element=element, xpath="kernelId",
-                                     namespace=NAMESPACE),
-                'ramdiskid': findattr(element=element, xpath="ramdiskId",
-                                      namespace=NAMESPACE),
-                'clienttoken': findattr(element=element, xpath="clientToken",
-                                        namespace=NAMESPACE),
-                'groups': groups,
-                'tags': tags
-            }
+            extra=extra
         )
         return n
 
+    def _get_tag(self, element):
+        values = self._tag_fields.extract(element)
+        return values['key'], values['value']
+
     def _to_images(self, object):
         return [self._to_image(el) for el in object.findall(
             fixxpath(xpath='imagesSet/item', namespace=NAMESPACE))
         ]
 
     def _to_image(self, element):
+        extra = self._image_fields.extract(element)
+
         n = NodeImage(
-            id=findtext(element=element, xpath='imageId', namespace=NAMESPACE),
-            name=findtext(element=element, xpath='imageLocation',
-                          namespace=NAMESPACE),
+            id=extra.pop('imageId'),
+            name=extra.pop('imageLocation'),
             driver=self.connection.driver,
-            extra={
-                'state': findattr(element=element, xpath="imageState",
-                                  namespace=NAMESPACE),
-                'ownerid': findattr(element=element, xpath="imageOwnerId",
-                                    namespace=NAMESPACE),
-                'owneralias': findattr(element=element,
-                                       xpath="imageOwnerAlias",
-                                       namespace=NAMESPACE),
-                'ispublic': findattr(element=element,
-                                     xpath="isPublic",
-                                     namespace=NAMESPACE),
-                'architecture': findattr(element=element,
-                                         xpath="architecture",
-                                         namespace=NAMESPACE),
-                'imagetype': findattr(element=element,
-                                      xpath="imageType",
-                                      namespace=NAMESPACE),
-                'platform': findattr(element=element,
-                                     xpath="platform",
-                                     namespace=NAMESPACE),
-                'rootdevicetype': findattr(element=element,
-                                           xpath="rootDeviceType",
-                                           namespace=NAMESPACE),
-                'virtualizationtype': findattr(
-                    element=element, xpath="virtualizationType",
-                    namespace=NAMESPACE),
-                'hypervisor': findattr(element=element,
-                                       xpath="hypervisor",
-                                       namespace=NAMESPACE)
-            }
+            extra=extra
         )
         return n
 
@@ -600,7 +667,7 @@ class BaseEC2NodeDriver(NodeDriver):
                              size=int(size),
                              driver=self)
 
-    def list_nodes(self, ex_node_ids=None):
+    def list_nodes(self, ex_node_ids=None, ex_filters=None):
         """
         List all nodes
 
@@ -611,25 +678,70 @@ class BaseEC2NodeDriver(NodeDriver):
         @param      ex_node_ids: List of C{node.id}
         @type       ex_node_ids: C{list} of C{str}
 
+        @param      ex_filters: Filters which are applied by the server (see
+                                L{ex_iterate_nodes})
+        @type       ex_filters: C{dict}
+
         @rtype: C{list} of L{Node}
         """
+        return list(self.ex_iterate_nodes(ex_node_ids=ex_node_ids,
+                                          ex_filters=ex_filters))
+
+    def ex_iterate_nodes(self, ex_node_ids=None, ex_filters=None,
+                         ex_page_size=None, ex_elastic_ips=True):
+        """
+        Return a generator which yields the nodes one page at a time.
+
+        @param      ex_node_ids: List of C{node.id}
+        @type       ex_node_ids: C{list} of C{str}
+
+        @param      ex_filters: Filters which are applied by the server. A key
+                                is a filter name (e.g. "instance-state-name"
+                                or "tag:Name") and the value is a value or a
+                                list of values to match.
+        @type       ex_filters: C{dict}
+
+        @param      ex_page_size: Maximum number of nodes retrieved per
+                                  request (5 - 1000). Can't be used together
+                                  with ex_node_ids. By default, the server
+                                  decides.
+        @type       ex_page_size: C{int}
+
+        @param      ex_elastic_ips: Retrieve the Elastic IP addresses for
+                                    the nodes on each page.
+        @type       ex_elastic_ips: C{bool}
+
+        @rtype: C{generator} of L{Node}
+        """
         params = {'Action': 'DescribeInstances'}
+
         if ex_node_ids:
             params.update(self._pathlist('InstanceId', ex_node_ids))
-        elem = self.connection.request(self.path, params=params).object
+
+        if ex_filters:
+            params.update(self._get_filter_params(ex_filters))
+
+        for nodes in self._iterate_pages(params=params,
+                                         xpath='reservationSet/item',
+                                         to_objects=self._to_reservation,
+                                         page_size=ex_page_size):
+            if ex_elastic_ips:
+                nodes_elastic_ips_mappings = self.ex_describe_addresses(nodes)
+                self._add_elastic_ips(nodes, nodes_elastic_ips_mappings)
+
+            for node in nodes:
+                yield node
+
+    def _list_nodes_by_ids(self, node_ids):
+        # Filter is used instead of the InstanceId parameter because
+        # DescribeInstances fails if any of the instances doesn't exist
+        # (e.g. if it has just been created)
         nodes = []
-        for rs in findall(element=elem, xpath='reservationSet/item',
-                          namespace=NAMESPACE):
-            groups = [g.findtext('')
-                      for g in findall(element=rs,
-                                       xpath='groupSet/item/groupId',
-                                       namespace=NAMESPACE)]
-            nodes += self._to_nodes(rs, 'instancesSet/item', groups)
 
-        nodes_elastic_ips_mappings = self.ex_describe_addresses(nodes)
-        for node in nodes:
-            ips = nodes_elastic_ips_mappings[node.id]
-            node.public_ips.extend(ips)
+        for i in range(0, len(node_ids), MAX_FILTER_VALUES):
+            filters = {'instance-id': node_ids[i:i + MAX_FILTER_VALUES]}
+            nodes.extend(self.ex_iterate_nodes(ex_filters=filters))
+
         return nodes
 
     def list_sizes(self, location=None):
@@ -644,7 +756,7 @@ class BaseEC2NodeDriver(NodeDriver):
             sizes.append(NodeSize(driver=self, **attributes))
         return sizes
 
-    def list_images(self, location=None, ex_image_ids=None):
+    def list_images(self, location=None, ex_image_ids=None, ex_filters=None):
         """
         List all images
 
@@ -655,17 +767,52 @@ class BaseEC2NodeDriver(NodeDriver):
         @param      ex_image_ids: List of C{NodeImage.id}
         @type       ex_image_ids: C{list} of C{str}
 
+        @param      ex_filters: Filters which are applied by the server (see
+                                L{ex_iterate_nodes})
+        @type       ex_filters: C{dict}
+
         @rtype: C{list} of L{NodeImage}
         """
+        return list(self.ex_iterate_images(location=location,
+                                           ex_image_ids=ex_image_ids,
+                                           ex_filters=ex_filters))
+
+    def ex_iterate_images(self, location=None, ex_image_ids=None,
+                          ex_filters=None, ex_page_size=None):
+        """
+        Return a generator which yields the images one page at a time.
+
+        Public image listings are large so filtering them on the server
+        (e.g. {'owner-alias': 'amazon', 'architecture': 'x86_64'}) is
+        usually much faster than filtering the result.
+
+        @param      ex_image_ids: List of C{NodeImage.id}
+        @type       ex_image_ids: C{list} of C{str}
+
+        @param      ex_filters: Filters which are applied by the server (see
+                                L{ex_iterate_nodes})
+        @type       ex_filters: C{dict}
+
+        @param      ex_page_size: Maximum number of images retrieved per
+                                  request. By default, the server decides.
+        @type       ex_page_size: C{int}
+
+        @rtype: C{generator} of L{NodeImage}
+        """
         params = {'Action': 'DescribeImages'}
 
         if ex_image_ids:
             params.update(self._pathlist('ImageId', ex_image_ids))
 
-        images = self._to_images(
-            self.connection.request(self.path, params=params).object
-        )
-        return images
+        if ex_filters:
+            params.update(self._get_filter_params(ex_filters))
+
+        for images in self._iterate_pages(
+                params=params, xpath='imagesSet/item',
+                to_objects=lambda element: [self._to_image(element)],
+                page_size=ex_page_size):
+            for image in images:
+                yield image
 
     def list_locations(self):
         locations = []
@@ -1058,12 +1205,7 @@ class BaseEC2NodeDriver(NodeDriver):
         if not tags:
             return
 
-        params = {'Action': 'CreateTags',
-                  'ResourceId.0': resource.id}
-        for i, key in enumerate(tags):
-            params['Tag.%d.Key' % i] = key
-            params['Tag.%d.Value' % i] = tags[key]
-
+        params = self._get_create_tags_params(resource=resource, tags=tags)
         result = self.connection.request(self.path,
                                          params=params.copy()).object
         element = findtext(element=result, xpath='return',
@@ -1098,15 +1240,34 @@ class BaseEC2NodeDriver(NodeDriver):
                            namespace=NAMESPACE)
         return element == 'true'
 
-    def _add_instance_filter(self, params, node):
+    def _add_instance_filter(self, params, node, index=0):
         """
         Add instance filter to the provided params dictionary.
         """
         params.update({
             'Filter.0.Name': 'instance-id',
-            'Filter.0.Value.0': node.id
+            'Filter.0.Value.%d' % (index): node.id
         })
 
+    def _get_describe_addresses_params(self, nodes):
+        params = {'Action': 'DescribeAddresses'}
+
+        # Large lists (e.g. all the nodes in an account) are cheaper to
+        # match against all the addresses than to send as a filter
+        if len(nodes) <= MAX_FILTER_VALUES:
+            for index, node in enumerate(nodes):
+                self._add_instance_filter(params, node, index)
+
+        return params
+
+    def _get_create_tags_params(self, resource, tags):
+        params = {'Action': 'CreateTags',
+                  'ResourceId.0': resource.id}
+        for i, key in enumerate(tags):
+            params['Tag.%d.Key' % i] = key
+            params['Tag.%d.Value' % i] = tags[key]
+        return params
+
     def ex_describe_all_addresses(self, only_allocated=False):
         """
         Return all the Elastic IP addresses for this account
@@ -1175,14 +1336,12 @@ class BaseEC2NodeDriver(NodeDriver):
         if not nodes:
             return {}
 
-        params = {'Action': 'DescribeAddresses'}
-
-        if len(nodes) == 1:
-            self._add_instance_filter(params, nodes[0])
-
+        params = self._get_describe_addresses_params(nodes)
         result = self.connection.request(self.path,
                                          params=params.copy()).object
+        return self._to_nodes_elastic_ip_mappings(result, nodes)
 
+    def _to_nodes_elastic_ip_mappings(self, result, nodes):
         node_instance_ids = [node.id for node in nodes]
         nodes_elastic_ip_mappings = {}
 
@@ -1294,6 +1453,31 @@ class BaseEC2NodeDriver(NodeDriver):
                     [{'DeviceName': '/dev/sdb', 'VirtualName': 'ephemeral0'}]
         @type       ex_blockdevicemappings: C{list} of C{dict}
         """
+        params = self._get_create_node_params(**kwargs)
+        object = self.connection.request(self.path, params=params).object
+        nodes = self._to_nodes(object, 'instancesSet/item')
+
+        for node in nodes:
+            tags = {'Name': kwargs['name']}
+
+            try:
+                self.ex_create_tags(resource=node, tags=tags)
+            except Exception:
+                continue
+
+            node.name = kwargs['name']
+            node.extra.update({'tags': tags})
+
+        if len(nodes) == 1:
+            return nodes[0]
+        else:
+            return nodes
+
+    def _get_create_node_params(self, **kwargs):
+        """
+        Return RunInstances request parameters for the L{create_node} keyword
+        arguments.
+        """
         image = kwargs["image"]
         size = kwargs["size"]
         params = {
@@ -1337,24 +1521,7 @@ class BaseEC2NodeDriver(NodeDriver):
                 params['BlockDeviceMapping.%d.VirtualName' % (index + 1)] = \
                     mapping['VirtualName']
 
-        object = self.connection.request(self.path, params=params).object
-        nodes = self._to_nodes(object, 'instancesSet/item')
-
-        for node in nodes:
-            tags = {'Name': kwargs['name']}
-
-            try:
-                self.ex_create_tags(resource=node, tags=tags)
-            except Exception:
-                continue
-
-            node.name = kwargs['name']
-            node.extra.update({'tags': tags})
-
-        if len(nodes) == 1:
-            return nodes[0]
-        else:
-            return nodes
+        return params
 
     def reboot_node(self, node):
         params = {'Action': 'RebootInstances'}
@@ -1615,13 +1782,17 @@ class EucNodeDriver(BaseEC2NodeDriver):
         raise NotImplementedError(
             'list_locations not implemented for this driver')
 
-    def _add_instance_filter(self, params, node):
+    def _add_instance_filter(self, params, node, index=0):
         """
         Eucalyptus driver doesn't support filtering on instance id so this is a
         no-op.
         """
         pass
 
+    def _list_nodes_by_ids(self, node_ids):
+        # Filtering on instance id is not supported
+        return NodeDriver._list_nodes_by_ids(self, node_ids)
+
 
 class NimbusConnection(EC2Connection):
     """
@@ -1657,6 +1828,10 @@ class NimbusNodeDriver(BaseEC2NodeDriver):
             nodes_elastic_ip_mappings[node.id] = []
         return nodes_elastic_ip_mappings
 
+    def _list_nodes_by_ids(self, node_ids):
+        # Filtering on instance id is not supported
+        return NodeDriver._list_nodes_by_ids(self, node_ids)
+
     def ex_create_tags(self, resource, tags):
         """
         Nimbus doesn't support creating tags, so this is a passthrough.
@@ -144,6 +144,19 @@ class OpenStackComputeConnection(OpenStackBaseConnection):
             params=params, data=data,
             method=method, headers=headers)
 
+    def request_stream(self, action, params=None, data='', headers=None,
+                       method='GET'):
+        if not params:
+            params = {}
+
+        if method == "GET":
+            self._add_cache_busting_to_params(params)
+
+        return super(OpenStackComputeConnection, self).request_stream(
+            action=action,
+            params=params, data=data,
+            method=method, headers=headers)
+
 
 class OpenStackNodeDriver(NodeDriver, OpenStackDriverMixin):
     """
@@ -1075,6 +1088,36 @@ class OpenStack_1_1_NodeDriver(OpenStackNodeDriver):
                                                     None))
         super(OpenStack_1_1_NodeDriver, self).__init__(*args, **kwargs)
 
+    def list_nodes(self):
+        return list(self.ex_iterate_nodes())
+
+    def ex_iterate_nodes(self):
+        """
+        Return a generator which yields the nodes as they are read from the
+        /servers/detail response, without loading the whole response in
+        memory.
+
+        @rtype: C{generator} of L{Node}
+        """
+        response = self.connection.request_stream('/servers/detail')
+
+        try:
+            for server in response.iterjson(path='servers'):
+                yield self._to_node(server)
+        finally:
+            response.close()
+
+    def _list_nodes_by_ids(self, node_ids):
+        nodes = []
+
+        for node_id in node_ids:
+            node = self.ex_get_node_details(node_id)
+
+            if node is not None:
+                nodes.append(node)
+
+        return nodes
+
     def create_node(self, **kwargs):
         """Create a new node
 
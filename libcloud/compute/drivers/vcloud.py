@@ -29,10 +29,13 @@ from libcloud.utils.py3 import next
 urlparse = urlparse.urlparse
 
 import time
+import threading
 
 from xml.etree import ElementTree as ET
 from xml.parsers.expat import ExpatError
 
+from libcloud.utils.xml import fixxpath as fixxpath_ns
+from libcloud.utils.concurrency import run_concurrently
 from libcloud.common.base import XmlResponse, ConnectionUserAndKey
 from libcloud.common.types import InvalidCredsError, LibcloudError
 from libcloud.compute.providers import Provider
@@ -50,6 +53,13 @@ DEFAULT_TASK_COMPLETION_TIMEOUT = 600
 
 DEFAULT_API_VERSION = '0.8'
 
+# Maximum number of vApp and catalog item documents retrieved in parallel
+DEFAULT_FETCH_CONCURRENCY = 10
+
+# Maximum number of documents kept in the document cache. The least recently
+# used documents are evicted first.
+DOCUMENT_CACHE_MAX_SIZE = 1000
+
 """
 Valid vCloud API v1.5 input values.
 """
@@ -61,9 +71,7 @@ IP_MODE_VALS_1_5 = ['POOL', 'DHCP', 'MANUAL', 'NONE']
 def fixxpath(root, xpath):
     """ElementTree wants namespaces in its xpaths, so here we add them."""
     namespace, root_tag = root.tag[1:].split("}", 1)
-    fixed_xpath = "/".join(["{%s}%s" % (namespace, e)
-                            for e in xpath.split("/")])
-    return fixed_xpath
+    return fixxpath_ns(xpath=xpath, namespace=namespace)
 
 
 def get_url_path(url):
@@ -297,7 +305,8 @@ class InstantiateVAppXML(object):
 class VCloudResponse(XmlResponse):
     def success(self):
         return self.status in (httplib.OK, httplib.CREATED,
-                               httplib.NO_CONTENT, httplib.ACCEPTED)
+                               httplib.NO_CONTENT, httplib.ACCEPTED,
+                               httplib.NOT_MODIFIED)
 
 
 class VCloudConnection(ConnectionUserAndKey):
@@ -363,6 +372,8 @@ class VCloudNodeDriver(NodeDriver):
     connectionCls = VCloudConnection
     org = None
     _vdcs = None
+    document_cache_max_size = DOCUMENT_CACHE_MAX_SIZE
+    _document_cache = None
 
     NODE_STATE_MAP = {'0': NodeState.PENDING,
                       '1': NodeState.PENDING,
@@ -537,6 +548,7 @@ class VCloudNodeDriver(NodeDriver):
             pass
 
         res = self.connection.request(node_path, method='DELETE')
+        self._uncache_document(node_path)
         return res.status == httplib.ACCEPTED
 
     def reboot_node(self, node):
@@ -548,48 +560,59 @@ class VCloudNodeDriver(NodeDriver):
     def list_nodes(self):
         return self.ex_list_nodes()
 
-    def ex_list_nodes(self, vdcs=None):
+    def ex_list_nodes(self, vdcs=None,
+                      ex_concurrency=DEFAULT_FETCH_CONCURRENCY):
         """
         List all nodes across all vDCs. Using 'vdcs' you can specify which vDCs
         should be queried.
 
+        vApps are retrieved in parallel and unchanged vApps are served from
+        the document cache (see L{_get_document}).
+
         @param vdcs: None, vDC or a list of vDCs to query. If None all vDCs
                      will be queried.
         @type vdcs: L{Vdc}
 
+        @param ex_concurrency: Maximum number of vApps which are retrieved
+                               at the same time.
+        @type ex_concurrency: C{int}
+
         @rtype: C{list} of L{Node}
         """
         if not vdcs:
             vdcs = self.vdcs
         if not isinstance(vdcs, (list, tuple)):
             vdcs = [vdcs]
-        nodes = []
+        vapp_hrefs = []
         for vdc in vdcs:
             res = self.connection.request(get_url_path(vdc.id))
             elms = res.object.findall(fixxpath(
                 res.object, "ResourceEntities/ResourceEntity")
             )
-            vapps = [
-                (i.get('name'), i.get('href'))
+            vapp_hrefs.extend([
+                i.get('href')
                 for i in elms
                 if i.get('type')
                     == 'application/vnd.vmware.vcloud.vApp+xml'
                     and i.get('name')
-            ]
+            ])
 
-            for vapp_name, vapp_href in vapps:
-                try:
-                    res = self.connection.request(
-                        get_url_path(vapp_href),
-                        headers={'Content-Type': 'application/vnd.vmware.vcloud.vApp+xml'}
-                    )
-                    nodes.append(self._to_node(res.object))
-                except Exception:
-                    # The vApp was probably removed since the previous vDC query, ignore
-                    e = sys.exc_info()[1]
-                    if not (e.args[0].tag.endswith('Error') and
-                            e.args[0].get('minorErrorCode') == 'ACCESS_TO_RESOURCE_IS_FORBIDDEN'):
-                        raise
+        documents = self._get_documents(
+            vapp_hrefs, 'application/vnd.vmware.vcloud.vApp+xml',
+            ex_concurrency)
+
+        nodes = []
+        for elm, e in documents:
+            if e is not None:
+                # The vApp was probably removed since the previous vDC
+                # query, ignore
+                error_code = e.args[0].get('minorErrorCode')
+                if not (e.args[0].tag.endswith('Error') and
+                        error_code == 'ACCESS_TO_RESOURCE_IS_FORBIDDEN'):
+                    raise e
+                continue
+
+            nodes.append(self._to_node(elm))
 
         return nodes
 
@@ -628,17 +651,129 @@ class VCloudNodeDriver(NodeDriver):
 
     def _get_catalogitem(self, catalog_item):
         """Given a catalog item href returns elementree"""
-        res = self.connection.request(
-            get_url_path(catalog_item),
-            headers={
-                'Content-Type':
-                    'application/vnd.vmware.vcloud.catalogItem+xml'
-            }
-        ).object
+        self._init_document_cache()
+        return self._get_document(
+            catalog_item, 'application/vnd.vmware.vcloud.catalogItem+xml')
+
+    def _get_document(self, href, content_type):
+        """
+        Retrieve the document at the given href.
+
+        Documents which were returned with an ETag or a Last-Modified header
+        are cached and revalidated with a conditional GET, so a document is
+        only downloaded and parsed again if it has changed. At most
+        L{document_cache_max_size} documents are cached.
+        """
+        path = get_url_path(href)
+        headers = {'Content-Type': content_type}
+        cached = self._get_cached_document(path)
+
+        if cached:
+            etag, last_modified, _ = cached
+
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        try:
+            res = self.connection.request(path, headers=headers)
+        except Exception:
+            self._uncache_document(path)
+            raise
+
+        if res.status == httplib.NOT_MODIFIED and cached:
+            return cached[2]
+
+        etag = res.headers.get('etag', None)
+        last_modified = res.headers.get('last-modified', None)
+
+        if etag or last_modified:
+            self._cache_document(path, (etag, last_modified, res.object))
+        else:
+            self._uncache_document(path)
+
+        return res.object
+
+    def _init_document_cache(self):
+        if self._document_cache is None:
+            self._document_cache = {}
+            self._document_cache_order = []
+            self._document_cache_lock = threading.Lock()
 
-        return res
+    def _get_cached_document(self, path):
+        self._document_cache_lock.acquire()
+        try:
+            cached = self._document_cache.get(path, None)
+
+            if cached is not None:
+                # Move the path to the end of the LRU order
+                self._document_cache_order.remove(path)
+                self._document_cache_order.append(path)
+
+            return cached
+        finally:
+            self._document_cache_lock.release()
+
+    def _cache_document(self, path, cached):
+        self._document_cache_lock.acquire()
+        try:
+            if path in self._document_cache:
+                self._document_cache_order.remove(path)
+
+            self._document_cache[path] = cached
+            self._document_cache_order.append(path)
+
+            while len(self._document_cache_order) > \
+                    self.document_cache_max_size:
+                del self._document_cache[self._document_cache_order.pop(0)]
+        finally:
+            self._document_cache_lock.release()
+
+    def _uncache_document(self, path):
+        if self._document_cache is None:
+            return
+
+        self._document_cache_lock.acquire()
+        try:
+            if self._document_cache.pop(path, None) is not None:
+                self._document_cache_order.remove(path)
+        finally:
+            self._document_cache_lock.release()
+
+    def _get_documents(self, hrefs, content_type, concurrency):
+        """
+        Retrieve the documents at the given hrefs in parallel.
+
+        Returns a list of (element, error) tuples in the same order as the
+        hrefs. Error is the exception raised while retrieving the document
+        (or None).
+        """
+        self._init_document_cache()
+        results = [None] * len(hrefs)
+
+        def fetch(index, href):
+            try:
+                results[index] = (self._get_document(href, content_type),
+                                  None)
+            except Exception:
+                results[index] = (None, sys.exc_info()[1])
 
-    def list_images(self, location=None):
+        run_concurrently(fetch, enumerate(hrefs), concurrency)
+        return results
+
+    def list_images(self, location=None,
+                    ex_concurrency=DEFAULT_FETCH_CONCURRENCY):
+        """
+        @inherits: L{NodeDriver.list_images}
+
+        Catalog items are retrieved in parallel and unchanged catalog items
+        are served from the document cache (see L{_get_document}).
+
+        @param ex_concurrency: Maximum number of catalog items which are
+                               retrieved at the same time.
+        @type ex_concurrency: C{int}
+        """
         images = []
         for vdc in self.vdcs:
             res = self.connection.request(get_url_path(vdc.id)).object
@@ -652,16 +787,25 @@ class VCloudNodeDriver(NodeDriver):
                     'application/vnd.vmware.vcloud.vAppTemplate+xml'
             ]
 
+        cat_items = []
         for catalog in self._get_catalog_hrefs():
-            for cat_item in self._get_catalogitems_hrefs(catalog):
-                res = self._get_catalogitem(cat_item)
-                res_ents = res.findall(fixxpath(res, 'Entity'))
-                images += [
-                    self._to_image(i)
-                    for i in res_ents
-                    if i.get('type') ==
-                        'application/vnd.vmware.vcloud.vAppTemplate+xml'
-                ]
+            cat_items.extend(self._get_catalogitems_hrefs(catalog))
+
+        documents = self._get_documents(
+            cat_items, 'application/vnd.vmware.vcloud.catalogItem+xml',
+            ex_concurrency)
+
+        for res, e in documents:
+            if e is not None:
+                raise e
+
+            res_ents = res.findall(fixxpath(res, 'Entity'))
+            images += [
+                self._to_image(i)
+                for i in res_ents
+                if i.get('type') ==
+                    'application/vnd.vmware.vcloud.vAppTemplate+xml'
+            ]
 
         def idfun(image):
             return image.id
@@ -978,7 +1122,9 @@ class VCloud_1_5_NodeDriver(VCloudNodeDriver):
             # so catch this and move on.
             pass
 
-        res = self.connection.request(get_url_path(node.id), method='DELETE')
+        node_path = get_url_path(node.id)
+        res = self.connection.request(node_path, method='DELETE')
+        self._uncache_document(node_path)
         return res.status == httplib.ACCEPTED
 
     def reboot_node(self, node):
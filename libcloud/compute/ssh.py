@@ -35,6 +35,10 @@ import logging
 from os.path import split as psplit
 from os.path import join as pjoin
 
+# Maximum number of remote files which are open at the same time while
+# uploading files with ParamikoSSHClient.put_many
+SFTP_MAX_OPEN_FILES = 32
+
 
 class BaseSSHClient(object):
     """
@@ -99,6 +103,19 @@ class BaseSSHClient(object):
         raise NotImplementedError(
             'put not implemented for this ssh client')
 
+    def put_many(self, files):
+        """
+        Upload multiple files to the remote node.
+
+        @type files: C{list} of C{dict}
+        @keyword files: Keyword arguments for L{put} (path, contents, chmod
+                        and mode) for each of the files.
+
+        @return: Full paths to the locations where the files have been saved.
+        @rtype: C{list} of C{str}
+        """
+        return [self.put(**kwargs) for kwargs in files]
+
     def delete(self, path):
         """
         Delete/Unlink a file on the remote node.
@@ -149,6 +166,12 @@ class ParamikoSSHClient(BaseSSHClient):
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
+        # SFTP session is opened on the first use and shared by all the file
+        # operations
+        self.sftp = None
+        self._home_directory = None
+        self._created_directories = set()
+
     def connect(self):
         conninfo = {'hostname': self.hostname,
                     'port': self.port,
@@ -171,48 +194,98 @@ class ParamikoSSHClient(BaseSSHClient):
         return True
 
     def put(self, path, contents=None, chmod=None, mode='w'):
-        sftp = self.client.open_sftp()
-        # less than ideal, but we need to mkdir stuff otherwise file() fails
-        head, tail = psplit(path)
+        return self.put_many([{'path': path, 'contents': contents,
+                               'chmod': chmod, 'mode': mode}])[0]
 
-        if path[0] == "/":
-            sftp.chdir("/")
-        else:
-            # Relative path - start from a home directory (~)
-            sftp.chdir('.')
-
-        for part in head.split("/"):
-            if part != "":
-                try:
-                    sftp.mkdir(part)
-                except IOError:
-                    # so, there doesn't seem to be a way to
-                    # catch EEXIST consistently *sigh*
-                    pass
-                sftp.chdir(part)
-
-        cwd = sftp.getcwd()
-
-        ak = sftp.file(tail, mode=mode)
-        ak.write(contents)
-        if chmod is not None:
-            ak.chmod(chmod)
-        ak.close()
-        sftp.close()
+    def put_many(self, files):
+        """
+        @inherits: L{BaseSSHClient.put_many}
+
+        The writes of up to L{SFTP_MAX_OPEN_FILES} files are sent before
+        waiting for the server to acknowledge any of them, so a batch of
+        small files doesn't cost a round trip per write.
+        """
+        file_paths = []
+
+        for index in range(0, len(files), SFTP_MAX_OPEN_FILES):
+            file_paths.extend(
+                self._put_files(files[index:index + SFTP_MAX_OPEN_FILES]))
+
+        return file_paths
+
+    def _put_files(self, files):
+        sftp = self._get_sftp()
+        opened = []
+
+        try:
+            for kwargs in files:
+                file_path = self._get_file_path(kwargs['path'])
+                self._create_directories(psplit(file_path)[0])
+
+                ak = sftp.file(file_path, mode=kwargs.get('mode', 'w'))
+                opened.append((file_path, ak, kwargs.get('chmod', None)))
 
+                # Don't wait for the server to acknowledge every write
+                ak.set_pipelined(True)
+                ak.write(kwargs.get('contents', None))
+
+            for file_path, ak, chmod in opened:
+                if chmod is not None:
+                    ak.chmod(chmod)
+        finally:
+            for _, ak, _ in opened:
+                ak.close()
+
+        return [file_path for file_path, _, _ in opened]
+
+    def _get_file_path(self, path):
         if path[0] == '/':
-            file_path = path
-        else:
-            file_path = pjoin(cwd, path)
+            return path
 
-        return file_path
+        # Relative path - start from a home directory (~)
+        if self._home_directory is None:
+            self._home_directory = self._get_sftp().normalize('.')
+
+            # Home directory and its parents already exist
+            directory = self._home_directory
+            while directory not in ['', '/']:
+                self._created_directories.add(directory)
+                directory = psplit(directory)[0]
+
+        return pjoin(self._home_directory, path)
 
     def delete(self, path):
-        sftp = self.client.open_sftp()
+        sftp = self._get_sftp()
         sftp.unlink(path)
-        sftp.close()
         return True
 
+    def _get_sftp(self):
+        if self.sftp is None:
+            self.sftp = self.client.open_sftp()
+            self._home_directory = None
+            self._created_directories = set()
+
+        return self.sftp
+
+    def _create_directories(self, path):
+        """
+        Create the directory and its parents unless they have already been
+        created (or found to exist) by this client.
+        """
+        if path in self._created_directories or path in ['', '/']:
+            return
+
+        self._create_directories(psplit(path)[0])
+
+        try:
+            self.sftp.mkdir(path)
+        except IOError:
+            # so, there doesn't seem to be a way to
+            # catch EEXIST consistently *sigh*
+            pass
+
+        self._created_directories.add(path)
+
     def run(self, cmd):
         # based on exec_command()
         bufsize = -1
@@ -230,6 +303,10 @@ class ParamikoSSHClient(BaseSSHClient):
         return [so, se, status]
 
     def close(self):
+        if self.sftp is not None:
+            self.sftp.close()
+            self.sftp = None
+
         self.client.close()
         return True
 
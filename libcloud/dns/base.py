@@ -19,9 +19,17 @@ __all__ = [
     'DNSDriver'
 ]
 
+from libcloud.utils.concurrency import run_concurrently
 from libcloud.common.base import ConnectionUserAndKey, BaseDriver
 from libcloud.dns.types import RecordType
 
+# Default number of record changes which are applied in parallel by
+# sync_records when the driver can't apply them in a batch
+SYNC_RECORDS_CONCURRENCY = 4
+
+# Existing records of these types are never deleted by sync_records
+SYNC_RECORDS_IGNORED_TYPES = [RecordType.NS, RecordType.SOA]
+
 
 class Zone(object):
     """
@@ -350,6 +358,167 @@ class DNSDriver(BaseDriver):
         raise NotImplementedError(
             'delete_record not implemented for this driver')
 
+    def sync_records(self, zone, records, delete=True, dry_run=False,
+                     concurrency=SYNC_RECORDS_CONCURRENCY):
+        """
+        Make the records of the zone match the desired records with as few
+        changes as possible.
+
+        Existing records are matched to the desired records by name, type
+        and data. A matched record is updated if any of the extra attributes
+        of the desired record differs. Remaining records with the same name
+        and type are updated in place, the rest is created or deleted.
+
+        The changes are applied in a batch if the driver supports it and in
+        parallel (using at most concurrency threads) otherwise.
+
+        @param zone: Zone to synchronize.
+        @type  zone: L{Zone}
+
+        @param records: Desired records as (name, type, data) or
+                        (name, type, data, extra) tuples. Only the extra
+                        attributes which are provided are compared.
+        @type  records: C{list} of C{tuple}
+
+        @param delete: Delete existing records which are not desired (the
+                       NS and SOA records are always kept).
+        @type  delete: C{bool}
+
+        @param dry_run: Only compute the changes, don't apply them.
+        @type  dry_run: C{bool}
+
+        @param concurrency: Number of changes which are applied in parallel.
+        @type  concurrency: C{int}
+
+        @return: List of (action, record, name, type, data, extra) tuples
+                 where action is one of "CREATE", "UPDATE" and "DELETE" and
+                 record is the existing record (None for "CREATE").
+        @rtype: C{list} of C{tuple}
+        """
+        try:
+            existing = self.iterate_records(zone)
+        except NotImplementedError:
+            existing = self.list_records(zone)
+
+        changes = self._get_record_changes(existing, records, delete=delete)
+
+        if changes and not dry_run:
+            self._apply_record_changes(zone, changes, concurrency)
+
+        return changes
+
+    def _get_record_changes(self, existing, records, delete):
+        """
+        Return the changes which turn the existing records into the desired
+        records (see L{sync_records}).
+        """
+        current = {}
+        keys = []
+
+        for record in existing:
+            key = (record.name, record.type)
+
+            if key not in current:
+                current[key] = []
+                keys.append(key)
+
+            current[key].append(record)
+
+        desired = {}
+
+        for values in records:
+            name, type, data = values[:3]
+            extra = len(values) > 3 and values[3] or {}
+            key = (name, type)
+
+            if key not in desired:
+                desired[key] = []
+
+                if key not in current:
+                    keys.append(key)
+
+            desired[key].append((data, extra))
+
+        deletes = []
+        updates = []
+        creates = []
+
+        for key in keys:
+            name, type = key
+            unmatched_records = list(current.get(key, []))
+            unmatched_values = []
+
+            for data, extra in desired.get(key, []):
+                matches = [record for record in unmatched_records
+                           if record.data == data]
+
+                if not matches:
+                    unmatched_values.append((data, extra))
+                    continue
+
+                record = matches[0]
+                unmatched_records.remove(record)
+
+                if not self._record_extra_matches(record, extra):
+                    updates.append(('UPDATE', record, name, type, data,
+                                    extra))
+
+            while unmatched_records and unmatched_values:
+                record = unmatched_records.pop(0)
+                data, extra = unmatched_values.pop(0)
+                updates.append(('UPDATE', record, name, type, data, extra))
+
+            for data, extra in unmatched_values:
+                creates.append(('CREATE', None, name, type, data, extra))
+
+            if not delete:
+                continue
+
+            for record in unmatched_records:
+                if record.type in SYNC_RECORDS_IGNORED_TYPES:
+                    continue
+
+                deletes.append(('DELETE', record, record.name, record.type,
+                                record.data, record.extra))
+
+        # Deletions go first so the names they free can be reused
+        return deletes + updates + creates
+
+    def _record_extra_matches(self, record, extra):
+        for key, value in extra.items():
+            if str(record.extra.get(key, None)) != str(value):
+                return False
+
+        return True
+
+    def _apply_record_changes(self, zone, changes, concurrency):
+        """
+        Apply the changes computed by L{sync_records}.
+
+        Drivers which can submit many changes in a single request should
+        override this method. The default implementation applies the
+        deletions, updates and creations (in that order) in parallel. The
+        first error stops the synchronization (see
+        L{libcloud.utils.concurrency.start_workers}).
+        """
+        for action in ['DELETE', 'UPDATE', 'CREATE']:
+            step = [(zone, change) for change in changes
+                    if change[0] == action]
+
+            run_concurrently(self._apply_record_change, step, concurrency)
+
+    def _apply_record_change(self, zone, change):
+        action, record, name, type, data, extra = change
+
+        if action == 'CREATE':
+            self.create_record(name=name, zone=zone, type=type, data=data,
+                               extra=extra)
+        elif action == 'UPDATE':
+            self.update_record(record=record, name=name, type=type,
+                               data=data, extra=extra)
+        else:
+            self.delete_record(record=record)
+
     def _string_to_record_type(self, string):
         """
         Return a string representation of a DNS record type to a
@@ -14,7 +14,8 @@
 # limitations under the License.
 
 __all__ = [
-    'Route53DNSDriver'
+    'Route53DNSDriver',
+    'Route53ChangeBatch'
 ]
 
 import base64
@@ -43,6 +44,10 @@ API_ROOT = '/%s/' % (API_VERSION)
 
 NAMESPACE = 'https://%s/doc%s' % (API_HOST, API_ROOT)
 
+# Route53 limits for a single ChangeResourceRecordSets request
+MAX_CHANGES_PER_BATCH = 100
+MAX_VALUE_CHARS_PER_BATCH = 32000
+
 
 class InvalidChangeBatch(LibcloudError):
     pass
@@ -91,6 +96,87 @@ class Route53Connection(ConnectionUserAndKey):
         return b64_hmac.decode('utf-8')
 
 
+class Route53ChangeBatch(object):
+    """
+    Collects record changes for a zone and posts them in as few
+    ChangeResourceRecordSets requests as the Route53 limits allow.
+
+    Changes are only sent when L{commit} is called. The batch can also be
+    used as a context manager in which case it's committed when the block
+    exits without an exception (and discarded otherwise).
+
+    Note: Route53 applies every request atomically, but a batch which
+    exceeds the limits of a single request is split and the requests are
+    applied one by one. Changes of a single update are never split.
+    """
+
+    def __init__(self, driver, zone):
+        """
+        @param driver: Route53 driver
+        @type driver: L{Route53DNSDriver}
+
+        @param zone: Zone the changes are applied to
+        @type zone: L{Zone}
+        """
+        self.driver = driver
+        self.zone = zone
+        self.changes = []
+
+    def create_record(self, name, type, data, extra=None):
+        """
+        Add a record creation to the batch.
+
+        @return: The record which exists once the batch is committed.
+        @rtype: L{Record}
+        """
+        self.changes.append([('CREATE', name, type, data, extra)])
+        return self.driver._to_new_record(name=name, zone=self.zone,
+                                          type=type, data=data, extra=extra)
+
+    def update_record(self, record, name, type, data, extra):
+        """
+        Add a record update to the batch.
+
+        @return: The record which exists once the batch is committed.
+        @rtype: L{Record}
+        """
+        self.changes.append([
+            ('DELETE', record.name, record.type, record.data, record.extra),
+            ('CREATE', name, type, data, extra)])
+        return self.driver._to_new_record(name=name, zone=self.zone,
+                                          type=type, data=data, extra=extra)
+
+    def delete_record(self, record):
+        """
+        Add a record deletion to the batch.
+        """
+        self.changes.append([('DELETE', record.name, record.type,
+                              record.data, record.extra)])
+
+    def commit(self):
+        """
+        Post all the changes in the batch.
+
+        @return: Number of requests which were made.
+        @rtype: C{int}
+        """
+        changes = self.changes
+        self.changes = []
+        return self.driver._post_changes(self.zone, changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.changes = []
+
+
 class Route53DNSDriver(DNSDriver):
     type = Provider.ROUTE53
     name = 'Route53 DNS'
@@ -116,12 +202,53 @@ class Route53DNSDriver(DNSDriver):
         zones = self._to_zones(data=data)
         return zones
 
-    def list_records(self, zone):
+    def iterate_records(self, zone):
+        """
+        @inherits: L{DNSDriver.iterate_records}
+
+        Records are retrieved one page at a time while the response is
+        truncated.
+        """
         self.connection.set_context({'zone_id': zone.id})
         uri = API_ROOT + 'hostedzone/' + zone.id + '/rrset'
-        data = self.connection.request(uri).object
-        records = self._to_records(data=data, zone=zone)
-        return records
+        params = {}
+
+        while True:
+            data = self.connection.request(uri, params=params).object
+
+            for record in self._to_records(data=data, zone=zone):
+                yield record
+
+            params = self._get_next_records_params(data=data)
+
+            if params is None:
+                return
+
+    def _get_next_records_params(self, data):
+        """
+        Return the query parameters for the next page of a record listing or
+        None if the listing is not truncated.
+        """
+        is_truncated = findtext(element=data, xpath='IsTruncated',
+                                namespace=NAMESPACE)
+
+        if not is_truncated or is_truncated.lower() == 'false':
+            return None
+
+        params = {
+            'name': findtext(element=data, xpath='NextRecordName',
+                             namespace=NAMESPACE),
+            'type': findtext(element=data, xpath='NextRecordType',
+                             namespace=NAMESPACE)
+        }
+
+        identifier = findtext(element=data, xpath='NextRecordIdentifier',
+                              namespace=NAMESPACE)
+
+        if identifier:
+            params['identifier'] = identifier
+
+        return params
 
     def get_zone(self, zone_id):
         self.connection.set_context({'zone_id': zone_id})
@@ -188,18 +315,16 @@ class Route53DNSDriver(DNSDriver):
     def create_record(self, name, zone, type, data, extra=None):
         batch = [('CREATE', name, type, data, extra)]
         self._post_changeset(zone, batch)
-        id = ':'.join((self.RECORD_TYPE_MAP[type], name))
-        return Record(id=id, name=name, type=type, data=data, zone=zone,
-                      driver=self, extra=extra)
+        return self._to_new_record(name=name, zone=zone, type=type,
+                                   data=data, extra=extra)
 
     def update_record(self, record, name, type, data, extra):
         batch = [
             ('DELETE', record.name, record.type, record.data, record.extra),
             ('CREATE', name, type, data, extra)]
         self._post_changeset(record.zone, batch)
-        id = ':'.join((self.RECORD_TYPE_MAP[type], name))
-        return Record(id=id, name=name, type=type, data=data, zone=record.zone,
-                      driver=self, extra=extra)
+        return self._to_new_record(name=name, zone=record.zone, type=type,
+                                   data=data, extra=extra)
 
     def delete_record(self, record):
         try:
@@ -218,14 +343,89 @@ class Route53DNSDriver(DNSDriver):
         @param zone: Zone to delete records for.
         @type  zone: L{Zone}
         """
-        deletions = []
-        for r in zone.list_records():
+        batch = self.ex_create_change_batch(zone=zone)
+
+        for r in self.iterate_records(zone=zone):
             if r.type in (RecordType.NS, RecordType.SOA):
                 continue
-            deletions.append(('DELETE', r.name, r.type, r.data, r.extra))
+            batch.delete_record(r)
+
+        batch.commit()
+
+    def ex_create_change_batch(self, zone):
+        """
+        Create a batch which groups record creations, updates and deletions
+        into as few requests as possible.
+
+        Example::
+
+            with driver.ex_create_change_batch(zone) as batch:
+                batch.create_record('www', RecordType.A, '127.0.0.1',
+                                    extra={'ttl': 300})
+                batch.delete_record(old_record)
+
+        @param zone: Zone the changes are applied to.
+        @type  zone: L{Zone}
 
-        if deletions:
-            self._post_changeset(zone, deletions)
+        @rtype: L{Route53ChangeBatch}
+        """
+        return Route53ChangeBatch(driver=self, zone=zone)
+
+    def _apply_record_changes(self, zone, changes, concurrency):
+        batch = self.ex_create_change_batch(zone=zone)
+
+        for action, record, name, type, data, extra in changes:
+            if action == 'CREATE':
+                batch.create_record(name=name, type=type, data=data,
+                                    extra=extra)
+            elif action == 'UPDATE':
+                batch.update_record(record=record, name=name, type=type,
+                                    data=data, extra=extra)
+            else:
+                batch.delete_record(record=record)
+
+        batch.commit()
+
+    def _post_changes(self, zone, changes):
+        """
+        Post the changes in as few requests as the Route53 limits allow.
+
+        @param changes: List of change lists which must be posted in the same
+                        request (e.g. DELETE and CREATE of an update).
+        @type changes: C{list}
+
+        @return: Number of requests which were made.
+        @rtype: C{int}
+        """
+        batches = self._split_changes(changes)
+
+        for batch in batches:
+            self._post_changeset(zone, batch)
+
+        return len(batches)
+
+    def _split_changes(self, changes):
+        batches = []
+        batch = []
+        value_chars = 0
+
+        for group in changes:
+            group_chars = sum([len(data) for _, _, _, data, _ in group])
+
+            if batch and \
+                    (len(batch) + len(group) > MAX_CHANGES_PER_BATCH or
+                     value_chars + group_chars > MAX_VALUE_CHARS_PER_BATCH):
+                batches.append(batch)
+                batch = []
+                value_chars = 0
+
+            batch.extend(group)
+            value_chars += group_chars
+
+        if batch:
+            batches.append(batch)
+
+        return batches
 
     def _post_changeset(self, zone, changes_list):
         attrs = {'xmlns': NAMESPACE}
@@ -251,6 +451,11 @@ class Route53DNSDriver(DNSDriver):
         self.connection.set_context({'zone_id': zone.id})
         self.connection.request(uri, method='POST', data=data)
 
+    def _to_new_record(self, name, zone, type, data, extra):
+        id = ':'.join((self.RECORD_TYPE_MAP[type], name))
+        return Record(id=id, name=name, type=type, data=data, zone=zone,
+                      driver=self, extra=extra)
+
     def _to_zones(self, data):
         zones = []
         for element in data.findall(fixxpath(xpath='HostedZones/HostedZone',
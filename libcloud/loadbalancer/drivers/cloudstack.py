@@ -14,6 +14,7 @@
 # limitations under the License.
 
 from libcloud.common.cloudstack import CloudStackDriverMixIn
+from libcloud.common.cloudstack import DEFAULT_PAGE_SIZE
 from libcloud.loadbalancer.base import LoadBalancer, Member, Driver, Algorithm
 from libcloud.loadbalancer.base import DEFAULT_ALGORITHM
 from libcloud.loadbalancer.types import Provider
@@ -74,6 +75,26 @@ class CloudStackLBDriver(CloudStackDriverMixIn, Driver):
         balancers = balancers.get('loadbalancerrule', [])
         return [self._to_balancer(balancer) for balancer in balancers]
 
+    def ex_iterate_balancers(self, ex_page_size=DEFAULT_PAGE_SIZE,
+                             ex_concurrency=1):
+        """
+        Return a generator which yields the balancers one page at a time.
+
+        @param ex_page_size: Number of balancers retrieved per request.
+        @type  ex_page_size: C{int}
+
+        @param ex_concurrency: Maximum number of pages which are retrieved
+                               in parallel.
+        @type  ex_concurrency: C{int}
+
+        @rtype: C{generator} of L{LoadBalancer}
+        """
+        for balancer in self._sync_request_pages('listLoadBalancerRules',
+                                                 'loadbalancerrule',
+                                                 page_size=ex_page_size,
+                                                 concurrency=ex_concurrency):
+            yield self._to_balancer(balancer)
+
     def get_balancer(self, balancer_id):
         balancer = self._sync_request('listLoadBalancerRules', id=balancer_id)
         balancer = balancer.get('loadbalancerrule', [])
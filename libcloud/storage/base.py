@@ -20,8 +20,12 @@ Provides base classes for working with storage
 # Backward compatibility for Python 2.5
 from __future__ import with_statement
 
+import os
 import os.path                          # pylint: disable-msg=W0404
+import ssl
+import socket
 import hashlib
+import threading
 from os.path import join as pjoin
 
 from libcloud.utils.py3 import httplib
@@ -29,11 +33,25 @@ from libcloud.utils.py3 import next
 from libcloud.utils.py3 import b
 
 import libcloud.utils.files
+from libcloud.utils.concurrency import run_concurrently
 from libcloud.common.types import LibcloudError
 from libcloud.common.base import ConnectionUserAndKey, BaseDriver
 from libcloud.storage.types import ObjectDoesNotExistError
+from libcloud.storage.types import ObjectHashMismatchError
 
-CHUNK_SIZE = 8096
+# Default size of the chunks objects are read and written in
+CHUNK_SIZE = libcloud.utils.files.CHUNK_SIZE
+
+# Size of a single byte range fetched by download_object_in_ranges
+RANGE_DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+
+# Number of byte ranges which are fetched in parallel. Ranged downloads are
+# opt-in, download_object only uses them if this is greater than 1.
+RANGE_DOWNLOAD_CONCURRENCY = 1
+
+# Suffixes of the files used to keep track of a partial ranged download
+PARTIAL_DOWNLOAD_SUFFIX = '.partial'
+PARTIAL_DOWNLOAD_JOURNAL_SUFFIX = '.partial.parts'
 
 
 class Object(object):
@@ -173,6 +191,17 @@ class StorageDriver(BaseDriver):
     hash_type = 'md5'
     supports_chunked_encoding = False
 
+    # Size of the chunks used when reading and writing object data. Can be
+    # overridden per call using the chunk_size argument where available.
+    chunk_size = CHUNK_SIZE
+
+    # Set to True in drivers which support HTTP Range requests and implement
+    # _get_object_range. Such drivers can download big objects in parallel
+    # (see download_object_in_ranges).
+    supports_range_requests = False
+    range_download_concurrency = RANGE_DOWNLOAD_CONCURRENCY
+    range_download_part_size = RANGE_DOWNLOAD_PART_SIZE
+
     def __init__(self, key, secret=None, secure=True, host=None, port=None,
                  **kwargs):
         super(StorageDriver, self).__init__(key=key, secret=secret,
@@ -329,6 +358,132 @@ class StorageDriver(BaseDriver):
         raise NotImplementedError(
             'download_object not implemented for this driver')
 
+    def download_object_in_ranges(self, obj, destination_path,
+                                  overwrite_existing=False,
+                                  delete_on_failure=True, concurrency=None,
+                                  part_size=None, resume=False,
+                                  verify_hash=True):
+        """
+        Download an object to the specified destination path by fetching
+        byte ranges of it in parallel.
+
+        Data is written to a preallocated "<path>.partial" file and the
+        completed ranges are recorded in a "<path>.partial.parts" journal.
+        The partial file is renamed to the destination path once the
+        download has completed.
+
+        If the driver doesn't support range requests, this method falls back
+        to L{download_object}.
+
+        @param obj: Object instance.
+        @type obj: L{Object}
+
+        @param destination_path: Full path to a file or a directory where the
+                                incoming file will be saved.
+        @type destination_path: C{str}
+
+        @param overwrite_existing: True to overwrite an existing file,
+            defaults to False.
+        @type overwrite_existing: C{bool}
+
+        @param delete_on_failure: True to delete a partially downloaded file if
+        the download was not successful. Pass False to be able to resume it.
+        @type delete_on_failure: C{bool}
+
+        @param concurrency: Number of ranges to fetch in parallel (defaults
+            to range_download_concurrency).
+        @type concurrency: C{int}
+
+        @param part_size: Size of a single range in bytes (defaults to
+            range_download_part_size).
+        @type part_size: C{int}
+
+        @param resume: True to only fetch the ranges which are missing from a
+            previous partial download of the same object.
+        @type resume: C{bool}
+
+        @param verify_hash: True to compare the hash of the downloaded data
+            with the object hash, if the provider reports a content hash.
+        @type verify_hash: C{bool}
+
+        @return: True if an object has been successfully downloaded, False
+        otherwise.
+        @rtype: C{bool}
+        """
+        if not self.supports_range_requests or not int(obj.size or 0):
+            return self.download_object(obj=obj,
+                                        destination_path=destination_path,
+                                        overwrite_existing=overwrite_existing,
+                                        delete_on_failure=delete_on_failure)
+
+        concurrency = concurrency or self.range_download_concurrency
+        part_size = part_size or self.range_download_part_size
+
+        file_path = self._get_destination_file_path(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=overwrite_existing)
+        partial_path = file_path + PARTIAL_DOWNLOAD_SUFFIX
+        journal_path = file_path + PARTIAL_DOWNLOAD_JOURNAL_SUFFIX
+
+        size = int(obj.size)
+        part_count = (size + part_size - 1) // part_size
+        header = '%s %d %d\n' % (obj.hash or '-', size, part_size)
+
+        completed = None
+        if resume:
+            completed = self._read_partial_download_journal(
+                partial_path=partial_path, journal_path=journal_path,
+                header=header)
+
+        if completed is None:
+            completed = set()
+
+            with open(partial_path, 'wb') as file_handle:
+                file_handle.truncate(size)
+
+            with open(journal_path, 'w') as journal:
+                journal.write(header)
+
+        lock = threading.Lock()
+
+        def download_part(file_handle, journal, index):
+            start = index * part_size
+            end = min(start + part_size, size) - 1
+
+            self._download_range(obj=obj, file_handle=file_handle,
+                                 lock=lock, start=start, end=end)
+
+            with lock:
+                journal.write('%d\n' % (index))
+                journal.flush()
+
+        try:
+            with open(partial_path, 'r+b') as file_handle:
+                with open(journal_path, 'a') as journal:
+                    run_concurrently(download_part,
+                                     [(file_handle, journal, index)
+                                      for index in range(part_count)
+                                      if index not in completed],
+                                     concurrency)
+
+            if verify_hash:
+                self._verify_downloaded_file(obj=obj, file_path=partial_path)
+        except ObjectHashMismatchError:
+            # The data is corrupt so there is nothing to resume
+            self._remove_files(partial_path, journal_path)
+            raise
+        except Exception:
+            if delete_on_failure:
+                self._remove_files(partial_path, journal_path)
+            raise
+
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+        os.rename(partial_path, file_path)
+        self._remove_files(journal_path)
+        return True
+
     def download_object_as_stream(self, obj, chunk_size=None):
         """
         Return a generator which yields object data.
@@ -485,6 +640,159 @@ class StorageDriver(BaseDriver):
                                   (response.status),
                             driver=self)
 
+    def _get_object_range(self, obj, start, end):
+        """
+        Request a byte range of an object. Drivers which set
+        supports_range_requests must implement this method.
+
+        @type obj: L{Object}
+        @param obj: Object instance.
+
+        @type start: C{int}
+        @param start: Offset of the first byte.
+
+        @type end: C{int}
+        @param end: Offset of the last byte (inclusive).
+
+        @rtype: L{RawResponse}
+        """
+        raise NotImplementedError(
+            '_get_object_range not implemented for this driver')
+
+    def _get_object_data_hash(self, obj):
+        """
+        Return the hex digest of the object data as reported by the
+        provider or None if the provider doesn't report one.
+
+        @type obj: L{Object}
+        @param obj: Object instance.
+
+        @rtype: C{str}
+        """
+        return None
+
+    def _download_range(self, obj, file_handle, lock, start, end):
+        """
+        Fetch a byte range of an object and write it at the same offset to
+        the provided file.
+        """
+        response = self._get_object_range(obj=obj, start=start, end=end)
+
+        if response.status == httplib.NOT_FOUND:
+            raise ObjectDoesNotExistError(object_name=obj.name,
+                                          value='', driver=self)
+
+        whole_object = (start == 0 and end == int(obj.size) - 1)
+        if response.status != httplib.PARTIAL_CONTENT and \
+                not (response.status == httplib.OK and whole_object):
+            raise LibcloudError(value='Unexpected status code: %s' %
+                                      (response.status),
+                                driver=self)
+
+        offset = start
+        for data in libcloud.utils.files.read_in_chunks(response.response,
+                                                        self.chunk_size):
+            data = b(data)
+
+            if offset + len(data) > end + 1:
+                raise LibcloudError(value='Received more data than requested',
+                                    driver=self)
+
+            _write_at(file_handle, lock, data, offset)
+            offset += len(data)
+
+        if offset != end + 1:
+            raise LibcloudError(value='Range %d-%d was truncated' %
+                                      (start, end),
+                                driver=self)
+
+    def _read_partial_download_journal(self, partial_path, journal_path,
+                                       header):
+        """
+        Return a set with the indexes of the ranges which have already been
+        downloaded or None if there is no partial download which can be
+        resumed.
+        """
+        if not os.path.exists(partial_path) or \
+                not os.path.exists(journal_path):
+            return None
+
+        with open(journal_path, 'r') as journal:
+            lines = journal.readlines()
+
+        if not lines or lines[0] != header:
+            # Different object or part size, start over
+            return None
+
+        completed = set()
+        for line in lines[1:]:
+            # Ignore a line which has only been partially written
+            if line.endswith('\n'):
+                completed.add(int(line))
+
+        return completed
+
+    def _verify_downloaded_file(self, obj, file_path):
+        expected_hash = self._get_object_data_hash(obj)
+
+        if not expected_hash:
+            return
+
+        with open(file_path, 'rb') as file_handle:
+            data_hash = self._get_file_hash(file_handle)
+
+        if data_hash != expected_hash.lower():
+            raise ObjectHashMismatchError(
+                value='MD5 hash checksum does not match',
+                object_name=obj.name, driver=self)
+
+    def _remove_files(self, *paths):
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _get_destination_file_path(self, obj, destination_path,
+                                   overwrite_existing=False):
+        """
+        Return the path of the file an object is downloaded to.
+        """
+        base_name = os.path.basename(destination_path)
+
+        if not base_name and not os.path.exists(destination_path):
+            raise LibcloudError(
+                value='Path %s does not exist' % (destination_path),
+                driver=self)
+
+        if not base_name:
+            file_path = pjoin(destination_path, obj.name)
+        else:
+            file_path = destination_path
+
+        if os.path.exists(file_path) and not overwrite_existing:
+            raise LibcloudError(
+                value='File %s already exists, but ' % (file_path) +
+                'overwrite_existing=False',
+                driver=self)
+
+        return file_path
+
+    def _should_download_in_ranges(self, obj, concurrency=None):
+        """
+        Return True if download_object should fetch an object in parallel
+        byte ranges.
+
+        @param concurrency: Number of ranges to fetch in parallel (defaults
+            to range_download_concurrency).
+        @type concurrency: C{int}
+        """
+        if concurrency is None:
+            concurrency = self.range_download_concurrency
+
+        return (self.supports_range_requests and concurrency > 1 and
+                int(obj.size or 0) > self.range_download_part_size)
+
     def _save_object(self, response, obj, destination_path,
                      overwrite_existing=False, delete_on_failure=True,
                      chunk_size=None):
@@ -510,31 +818,17 @@ class StorageDriver(BaseDriver):
 
         @type chunk_size: C{int}
         @param chunk_size: Optional chunk size
-            (defaults to L{libcloud.storage.base.CHUNK_SIZE}, 8kb)
+            (defaults to L{StorageDriver.chunk_size}, 64kb)
 
         @return: True on success, False otherwise.
         @rtype: C{bool}
         """
 
-        chunk_size = chunk_size or CHUNK_SIZE
-
-        base_name = os.path.basename(destination_path)
-
-        if not base_name and not os.path.exists(destination_path):
-            raise LibcloudError(
-                value='Path %s does not exist' % (destination_path),
-                driver=self)
-
-        if not base_name:
-            file_path = pjoin(destination_path, obj.name)
-        else:
-            file_path = destination_path
+        chunk_size = chunk_size or self.chunk_size
 
-        if os.path.exists(file_path) and not overwrite_existing:
-            raise LibcloudError(
-                value='File %s already exists, but ' % (file_path) +
-                'overwrite_existing=False',
-                driver=self)
+        file_path = self._get_destination_file_path(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=overwrite_existing)
 
         stream = libcloud.utils.files.read_in_chunks(response, chunk_size)
 
@@ -697,7 +991,8 @@ class StorageDriver(BaseDriver):
                                (defauls to True).
 
         @type chunk_size: C{int}
-        @param chunk_size: Optional chunk size (defaults to CHUNK_SIZE)
+        @param chunk_size: Optional chunk size (defaults to
+                           L{StorageDriver.chunk_size})
 
         @rtype: C{tuple}
         @return: First item is a boolean indicator of success, second
@@ -705,7 +1000,7 @@ class StorageDriver(BaseDriver):
                  is the number of transferred bytes.
         """
 
-        chunk_size = chunk_size or CHUNK_SIZE
+        chunk_size = chunk_size or self.chunk_size
 
         data_hash = None
         if calculate_hash:
@@ -781,16 +1076,93 @@ class StorageDriver(BaseDriver):
                  one is the uploaded data MD5 hash and the third one
                  is the number of transferred bytes.
         """
+        sock = None
+        if not chunked:
+            sock = self._get_sendfile_socket(response)
+
+        if sock is not None:
+            return self._sendfile(response=response, sock=sock,
+                                  file_path=file_path,
+                                  calculate_hash=calculate_hash)
+
         with open(file_path, 'rb') as file_handle:
             success, data_hash, bytes_transferred = (
                 self._stream_data(
                     response=response,
-                    iterator=iter(file_handle),
+                    iterator=file_handle,
                     chunked=chunked,
                     calculate_hash=calculate_hash))
 
         return success, data_hash, bytes_transferred
 
+    def _get_sendfile_socket(self, response):
+        """
+        Return the socket of the connection used by the response if file data
+        can be sent over it with sendfile, None otherwise.
+
+        Only plain sockets qualify. TLS encryption happens in user space so
+        the data needs to pass through it anyway.
+        """
+        if not hasattr(os, 'sendfile') or \
+                not hasattr(socket.socket, 'sendfile'):
+            return None
+
+        connection = getattr(response.connection, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+
+        if not isinstance(sock, socket.socket) or \
+                isinstance(sock, ssl.SSLSocket):
+            return None
+
+        return sock
+
+    def _sendfile(self, response, sock, file_path, calculate_hash=True):
+        """
+        Send a file over a socket without copying it to user space.
+
+        The hash is calculated in a separate pass over the file once the
+        data has been sent. If sendfile fails before any data has been sent,
+        the file is sent using L{_stream_data} instead. Errors which occur
+        after that are propagated.
+
+        @rtype: C{tuple}
+        @return: First item is a boolean indicator of success, second
+                 one is the uploaded data MD5 hash and the third one
+                 is the number of transferred bytes.
+        """
+        data_hash = None
+
+        with open(file_path, 'rb') as file_handle:
+            try:
+                bytes_transferred = sock.sendfile(file_handle)
+            except socket.error:
+                # socket.sendfile advances the file position by the number
+                # of bytes which have been sent
+                if file_handle.tell() != 0:
+                    raise
+
+                file_handle.seek(0)
+                return self._stream_data(response=response,
+                                         iterator=file_handle,
+                                         calculate_hash=calculate_hash)
+
+            if calculate_hash:
+                file_handle.seek(0)
+                data_hash = self._get_file_hash(file_handle)
+
+        return True, data_hash, bytes_transferred
+
+    def _get_file_hash(self, file_handle):
+        """
+        Return the hex digest of the data read from a file.
+        """
+        data_hash = self._get_hash_function()
+
+        for data in iter(lambda: file_handle.read(self.chunk_size), b('')):
+            data_hash.update(data)
+
+        return data_hash.hexdigest()
+
     def _get_hash_function(self):
         """
         Return instantiated hash function for the hash type supported by
@@ -803,3 +1175,23 @@ class StorageDriver(BaseDriver):
                                (self.hash_type))
 
         return func
+
+
+def _write_at(file_handle, lock, data, offset):
+    """
+    Write data at the provided offset of a file which is shared between
+    threads.
+    """
+    if hasattr(os, 'pwrite'):
+        fd = file_handle.fileno()
+        view = memoryview(data)
+
+        while len(view):
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        with lock:
+            file_handle.seek(offset)
+            file_handle.write(data)
+            file_handle.flush()
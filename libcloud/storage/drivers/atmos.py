@@ -35,7 +35,7 @@ from libcloud.utils.files import read_in_chunks, guess_file_mime_type
 from libcloud.common.base import ConnectionUserAndKey, XmlResponse
 from libcloud.common.types import LibcloudError
 
-from libcloud.storage.base import Object, Container, StorageDriver, CHUNK_SIZE
+from libcloud.storage.base import Object, Container, StorageDriver
 from libcloud.storage.types import ContainerAlreadyExistsError, \
     ContainerDoesNotExistError, ContainerIsNotEmptyError, \
     ObjectDoesNotExistError
@@ -124,6 +124,7 @@ class AtmosDriver(StorageDriver):
     path = None
     api_name = 'atmos'
     supports_chunked_encoding = True
+    supports_range_requests = True
     website = 'http://atmosonline.com/'
     name = 'atmos'
 
@@ -266,7 +267,7 @@ class AtmosDriver(StorageDriver):
             iterator = iter(iterator)
 
         data_hash = hashlib.md5()
-        generator = read_in_chunks(iterator, CHUNK_SIZE, True)
+        generator = read_in_chunks(iterator, self.chunk_size, True)
         bytes_transferred = 0
         try:
             chunk = next(generator)
@@ -343,7 +344,23 @@ class AtmosDriver(StorageDriver):
                       meta_data, container, self)
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ex_range_concurrency=None):
+        """
+        @inherits: L{StorageDriver.download_object}
+
+        @param ex_range_concurrency: If greater than 1, objects bigger than
+            range_download_part_size are downloaded in byte ranges using this
+            many threads (see L{download_object_in_ranges}). Defaults to
+            range_download_concurrency.
+        @type ex_range_concurrency: C{int}
+        """
+        if self._should_download_in_ranges(obj, ex_range_concurrency):
+            return self.download_object_in_ranges(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing,
+                delete_on_failure=delete_on_failure,
+                concurrency=ex_range_concurrency)
+
         path = self._namespace_path(obj.container.name + '/' + obj.name)
         response = self.connection.request(path, method='GET', raw=True)
 
@@ -358,6 +375,16 @@ class AtmosDriver(StorageDriver):
                                 },
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start, end):
+        path = self._namespace_path(obj.container.name + '/' + obj.name)
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+
+        return self.connection.request(path, method='GET', headers=headers,
+                                       raw=True)
+
+    def _get_object_data_hash(self, obj):
+        return obj.hash or None
+
     def download_object_as_stream(self, obj, chunk_size=None):
         path = self._namespace_path(obj.container.name + '/' + obj.name)
         response = self.connection.request(path, method='GET', raw=True)
@@ -366,7 +393,7 @@ class AtmosDriver(StorageDriver):
                                 response=response,
                                 callback_kwargs={
                                     'iterator': response.response,
-                                    'chunk_size': chunk_size
+                                    'chunk_size': chunk_size or self.chunk_size
                                 },
                                 success_status_code=httplib.OK)
 
@@ -15,12 +15,14 @@
 
 from __future__ import with_statement
 
+import sys
 import time
 import base64
 import hmac
 import re
 import os
 import binascii
+import threading
 
 from hashlib import sha256
 from xml.etree.ElementTree import Element, SubElement
@@ -32,7 +34,9 @@ from libcloud.utils.py3 import tostring
 from libcloud.utils.py3 import b
 
 from libcloud.utils.xml import fixxpath, findtext
+from libcloud.utils.xml import XmlFieldExtractor
 from libcloud.utils.files import read_in_chunks
+from libcloud.utils.concurrency import start_workers
 from libcloud.common.types import LibcloudError
 from libcloud.common.azure import AzureConnection
 
@@ -75,6 +79,18 @@ AZURE_PAGE_CHUNK_SIZE = 512
 # released using the lease_id (which is not exposed to the user)
 AZURE_LEASE_PERIOD = 60
 
+# The interval (in seconds) in which a lease is renewed by a background
+# thread while a chunked upload is in progress
+AZURE_LEASE_RENEW_INTERVAL = AZURE_LEASE_PERIOD // 2
+
+# Default number of blocks (or pages) which are uploaded in parallel during
+# a chunked upload. 1 means blocks are uploaded one after another.
+AZURE_UPLOAD_CONCURRENCY = 1
+
+# Maximum number of bytes which have been read from the source but not yet
+# uploaded during a parallel chunked upload
+AZURE_UPLOAD_BUFFER_SIZE = 8 * AZURE_CHUNK_SIZE
+
 
 class AzureBlobLease(object):
     """
@@ -96,6 +112,9 @@ class AzureBlobLease(object):
         self.use_lease = use_lease
         self.lease_id = None
         self.params = {'comp': 'lease'}
+        self.renewal_error = None
+        self._renewal_thread = None
+        self._renewal_stopped = None
 
     def renew(self):
         """
@@ -116,6 +135,57 @@ class AzureBlobLease(object):
         if response.status != httplib.OK:
             raise LibcloudError('Unable to obtain lease', driver=self)
 
+    def start_renewal(self, interval=AZURE_LEASE_RENEW_INTERVAL):
+        """
+        Start renewing the lease in a background thread every interval
+        seconds until L{stop_renewal} is called. The first error encountered
+        by the thread is kept in renewal_error and stops the renewal.
+
+        @param interval: Number of seconds between the renewals
+        @type interval: C{float}
+        """
+        if self.lease_id is None or self._renewal_thread is not None:
+            return
+
+        stopped = threading.Event()
+
+        def renew():
+            while True:
+                stopped.wait(interval)
+
+                if stopped.is_set():
+                    return
+
+                try:
+                    self.renew()
+                except Exception:
+                    self.renewal_error = sys.exc_info()[1]
+                    return
+
+        self.renewal_error = None
+        self._renewal_stopped = stopped
+        self._renewal_thread = threading.Thread(target=renew)
+        self._renewal_thread.daemon = True
+        self._renewal_thread.start()
+
+    def stop_renewal(self):
+        """
+        Stop the background renewal started by L{start_renewal}
+        """
+        if self._renewal_thread is None:
+            return
+
+        self._renewal_stopped.set()
+        self._renewal_thread.join()
+        self._renewal_thread = None
+
+    def check_renewal(self):
+        """
+        Raise the error encountered by the background renewal (if any)
+        """
+        if self.renewal_error is not None:
+            raise self.renewal_error
+
     def update_headers(self, headers):
         """
         Update the lease id in the headers
@@ -171,7 +241,38 @@ class AzureBlobsStorageDriver(StorageDriver):
     connectionCls = AzureBlobsConnection
     hash_type = 'md5'
     supports_chunked_encoding = False
+    supports_range_requests = True
     ex_blob_type = 'BlockBlob'
+    upload_concurrency = AZURE_UPLOAD_CONCURRENCY
+    upload_buffer_size = AZURE_UPLOAD_BUFFER_SIZE
+
+    # Fields of the Container elements in a container listing
+    _container_fields = XmlFieldExtractor({
+        'name': 'Name',
+        'url': 'Url',
+        'last_modified': 'Last-Modified',
+        'etag': 'Properties/Etag',
+        'lease_status': 'Properties/LeaseStatus',
+        'lease_state': 'Properties/LeaseState',
+        'lease_duration': 'Properties/LeaseDuration'
+    })
+
+    # Fields of the Blob elements in a blob listing
+    _object_fields = XmlFieldExtractor({
+        'name': 'Name',
+        'url': 'Url',
+        'etag': 'Properties/Etag',
+        'size': 'Properties/Content-Length',
+        'content_type': 'Properties/Content-Type',
+        'md5_hash': 'Properties/Content-MD5',
+        'last_modified': 'Properties/Last-Modified',
+        'lease_status': 'Properties/LeaseStatus',
+        'lease_state': 'Properties/LeaseState',
+        'lease_duration': 'Properties/LeaseDuration',
+        'content_encoding': 'Properties/Content-Encoding',
+        'content_language': 'Properties/Content-Language',
+        'blob_type': 'Properties/BlobType'
+    })
 
     def __init__(self, key, secret=None, secure=True, host=None, port=None,
                  **kwargs):
@@ -199,25 +300,25 @@ class AzureBlobsStorageDriver(StorageDriver):
         @rtype: L{Container}
         """
 
-        name = node.findtext(fixxpath(xpath='Name'))
-        props = node.find(fixxpath(xpath='Properties'))
+        values = self._container_fields.extract(node)
         metadata = node.find(fixxpath(xpath='Metadata'))
 
         extra = {
-            'url': node.findtext(fixxpath(xpath='Url')),
-            'last_modified': node.findtext(fixxpath(xpath='Last-Modified')),
-            'etag': props.findtext(fixxpath(xpath='Etag')),
+            'url': values['url'],
+            'last_modified': values['last_modified'],
+            'etag': values['etag'],
             'lease': {
-                'status': props.findtext(fixxpath(xpath='LeaseStatus')),
-                'state': props.findtext(fixxpath(xpath='LeaseState')),
-                'duration': props.findtext(fixxpath(xpath='LeaseDuration')),
+                'status': values['lease_status'],
+                'state': values['lease_state'],
+                'duration': values['lease_duration'],
             },
             'meta_data': {}
         }
 
-        for meta in metadata.getchildren():
+        for meta in metadata:
             extra['meta_data'][meta.tag] = meta.text
 
+        name = values['name']
         return Container(name=name, extra=extra, driver=self)
 
     def _response_to_container(self, container_name, response):
@@ -269,29 +370,27 @@ class AzureBlobsStorageDriver(StorageDriver):
         @rtype: L{Object}
         """
 
-        name = blob.findtext(fixxpath(xpath='Name'))
-        props = blob.find(fixxpath(xpath='Properties'))
+        values = self._object_fields.extract(blob)
         metadata = blob.find(fixxpath(xpath='Metadata'))
-        etag = props.findtext(fixxpath(xpath='Etag'))
-        size = int(props.findtext(fixxpath(xpath='Content-Length')))
+        name = values['name']
+        etag = values['etag']
+        size = int(values['size'])
 
         extra = {
-            'content_type': props.findtext(fixxpath(xpath='Content-Type')),
+            'content_type': values['content_type'],
             'etag': etag,
-            'md5_hash': props.findtext(fixxpath(xpath='Content-MD5')),
-            'last_modified': props.findtext(fixxpath(xpath='Last-Modified')),
-            'url': blob.findtext(fixxpath(xpath='Url')),
-            'hash': props.findtext(fixxpath(xpath='Etag')),
+            'md5_hash': values['md5_hash'],
+            'last_modified': values['last_modified'],
+            'url': values['url'],
+            'hash': etag,
             'lease': {
-                'status': props.findtext(fixxpath(xpath='LeaseStatus')),
-                'state': props.findtext(fixxpath(xpath='LeaseState')),
-                'duration': props.findtext(fixxpath(xpath='LeaseDuration')),
+                'status': values['lease_status'],
+                'state': values['lease_state'],
+                'duration': values['lease_duration'],
             },
-            'content_encoding': props.findtext(fixxpath(
-                                             xpath='Content-Encoding')),
-            'content_language': props.findtext(fixxpath(
-                                             xpath='Content-Language')),
-            'blob_type': props.findtext(fixxpath(xpath='BlobType'))
+            'content_encoding': values['content_encoding'],
+            'content_language': values['content_language'],
+            'blob_type': values['blob_type']
         }
 
         if extra['md5_hash']:
@@ -299,7 +398,7 @@ class AzureBlobsStorageDriver(StorageDriver):
                             base64.b64decode(b(extra['md5_hash'])))
 
         meta_data = {}
-        for meta in metadata.getchildren():
+        for meta in metadata:
             meta_data[meta.tag] = meta.text
 
         return Object(name=name, size=size, hash=etag, meta_data=meta_data,
@@ -393,8 +492,10 @@ class AzureBlobsStorageDriver(StorageDriver):
         container_path = self._get_container_path(container)
 
         while True:
-            response = self.connection.request(container_path,
-                                               params=params)
+            # Blobs are parsed and yielded as they are read from the socket
+            # so a page is never fully kept in memory
+            response = self.connection.request_stream(container_path,
+                                                      params=params)
 
             if response.status == httplib.NOT_FOUND:
                 raise ContainerDoesNotExistError(value=None,
@@ -405,14 +506,16 @@ class AzureBlobsStorageDriver(StorageDriver):
                 raise LibcloudError('Unexpected status code: %s' %
                                     (response.status), driver=self)
 
-            body = response.parse_body()
-            blobs = body.find(fixxpath(xpath='Blobs'))
-            blobs = blobs.findall(fixxpath(xpath='Blob'))
+            try:
+                elements = response.iterparse(xpath='Blobs/Blob')
 
-            for blob in blobs:
-                yield self._xml_to_object(container, blob)
+                for blob in elements:
+                    yield self._xml_to_object(container, blob)
+            finally:
+                response.close()
 
-            params['marker'] = body.findtext('NextMarker')
+            params['marker'] = findtext(element=elements.root,
+                                        xpath='NextMarker')
             if not params['marker']:
                 break
 
@@ -538,10 +641,23 @@ class AzureBlobsStorageDriver(StorageDriver):
         return False
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ex_range_concurrency=None):
         """
         @inherits: L{StorageDriver.download_object}
+
+        @param ex_range_concurrency: If greater than 1, objects bigger than
+            range_download_part_size are downloaded in byte ranges using this
+            many threads (see L{download_object_in_ranges}). Defaults to
+            range_download_concurrency.
+        @type ex_range_concurrency: C{int}
         """
+        if self._should_download_in_ranges(obj, ex_range_concurrency):
+            return self.download_object_in_ranges(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing,
+                delete_on_failure=delete_on_failure,
+                concurrency=ex_range_concurrency)
+
         obj_path = self._get_object_path(obj.container, obj.name)
         response = self.connection.request(obj_path, raw=True, data=None)
 
@@ -555,6 +671,21 @@ class AzureBlobsStorageDriver(StorageDriver):
                                     'delete_on_failure': delete_on_failure},
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start, end):
+        obj_path = self._get_object_path(obj.container, obj.name)
+        headers = {'x-ms-range': 'bytes=%d-%d' % (start, end)}
+
+        return self.connection.request(obj_path, headers=headers, raw=True,
+                                       data=None)
+
+    def _get_object_data_hash(self, obj):
+        md5_hash = obj.extra.get('md5_hash', None)
+
+        if md5_hash:
+            return md5_hash.decode('utf-8')
+
+        return None
+
     def download_object_as_stream(self, obj, chunk_size=None):
         """
         @inherits: L{StorageDriver.download_object_as_stream}
@@ -564,14 +695,24 @@ class AzureBlobsStorageDriver(StorageDriver):
 
         return self._get_object(obj=obj, callback=read_in_chunks,
                                 response=response,
-                                callback_kwargs={'iterator': response.response,
-                                                 'chunk_size': chunk_size},
+                                callback_kwargs={
+                                    'iterator': response.response,
+                                    'chunk_size': chunk_size or self.chunk_size
+                                },
                                 success_status_code=httplib.OK)
 
     def _upload_in_chunks(self, response, data, iterator, object_path,
-                          blob_type, lease, calculate_hash=True):
+                          blob_type, lease, calculate_hash=True,
+                          concurrency=1):
         """
-        Uploads data from an interator in fixed sized chunks to S3
+        Uploads data from an interator in fixed sized chunks to Azure.
+
+        If concurrency is greater than 1, the chunks (blocks or pages) are
+        uploaded by a pool of worker threads. The iterator is still consumed
+        (and the hash calculated) in order by the calling thread, and at most
+        upload_buffer_size bytes are waiting for the upload at any time.
+        The lease (if any) is renewed by a background thread while the
+        upload is in progress.
 
         @param response: Response object from the initial POST request
         @type response: L{RawResponse}
@@ -594,6 +735,9 @@ class AzureBlobsStorageDriver(StorageDriver):
         @keyword calculate_hash: Indicates if we must calculate the data hash
         @type calculate_hash: C{bool}
 
+        @keyword concurrency: Number of chunks to upload in parallel
+        @type concurrency: C{int}
+
         @return: A tuple of (status, checksum, bytes transferred)
         @rtype: C{tuple}
         """
@@ -610,60 +754,47 @@ class AzureBlobsStorageDriver(StorageDriver):
         bytes_transferred = 0
         count = 1
         chunks = []
-        headers = {}
 
-        lease.update_headers(headers)
+        def upload_chunk(count, offset, data):
+            self._upload_chunk(object_path, blob_type, lease, count,
+                               offset, data)
 
-        if blob_type == 'BlockBlob':
-            params = {'comp': 'block'}
-        else:
-            params = {'comp': 'page'}
+        finish = None
 
-        # Read the input data in chunk sizes suitable for AWS
-        for data in read_in_chunks(iterator, AZURE_CHUNK_SIZE):
-            data = b(data)
-            content_length = len(data)
-            offset = bytes_transferred
-            bytes_transferred += content_length
-
-            if calculate_hash:
-                data_hash.update(data)
-
-            chunk_hash = self._get_hash_function()
-            chunk_hash.update(data)
-            chunk_hash = base64.b64encode(b(chunk_hash.digest()))
-
-            headers['Content-MD5'] = chunk_hash.decode('utf-8')
-            headers['Content-Length'] = content_length
-
-            if blob_type == 'BlockBlob':
-                # Block id can be any unique string that is base64 encoded
-                # A 10 digit number can hold the max value of 50000 blocks
-                # that are allowed for azure
-                block_id = base64.b64encode(b('%10d' % (count)))
-                block_id = block_id.decode('utf-8')
-                params['blockid'] = block_id
-
-                # Keep this data for a later commit
-                chunks.append(block_id)
-            else:
-                headers['x-ms-page-write'] = 'update'
-                headers['x-ms-range'] = 'bytes=%d-%d' % \
-                                            (offset, bytes_transferred-1)
+        if concurrency > 1:
+            upload_chunk, finish = start_workers(
+                upload_chunk, concurrency,
+                buffer_size=self.upload_buffer_size,
+                get_size=lambda count, offset, data: len(data))
+
+        lease.start_renewal()
 
-            # Renew lease before updating
-            lease.renew()
+        try:
+            try:
+                # Read the input data in chunk sizes suitable for Azure
+                for data in read_in_chunks(iterator, AZURE_CHUNK_SIZE,
+                                           fill_size=True):
+                    data = b(data)
+                    offset = bytes_transferred
+                    bytes_transferred += len(data)
 
-            resp = self.connection.request(object_path, method='PUT',
-                                           data=data, headers=headers,
-                                           params=params)
+                    if calculate_hash:
+                        data_hash.update(data)
 
-            if resp.status != httplib.CREATED:
-                resp.parse_error()
-                raise LibcloudError('Error uploading chunk %d. Code: %d' %
-                                    (count, resp.status), driver=self)
+                    if blob_type == 'BlockBlob':
+                        # Keep the block ids in order for a later commit
+                        chunks.append(self._get_block_id(count))
 
-            count += 1
+                    lease.check_renewal()
+                    upload_chunk(count, offset, data)
+                    count += 1
+            finally:
+                if finish is not None:
+                    finish()
+        finally:
+            lease.stop_renewal()
+
+        lease.check_renewal()
 
         if calculate_hash:
             data_hash = data_hash.hexdigest()
@@ -677,6 +808,67 @@ class AzureBlobsStorageDriver(StorageDriver):
 
         return (True, data_hash, bytes_transferred)
 
+    def _get_block_id(self, count):
+        """
+        Return the id of the block with the given (1 based) index
+        """
+        # Block id can be any unique string that is base64 encoded
+        # A 10 digit number can hold the max value of 50000 blocks
+        # that are allowed for azure
+        block_id = base64.b64encode(b('%10d' % (count)))
+        return block_id.decode('utf-8')
+
+    def _upload_chunk(self, object_path, blob_type, lease, count, offset,
+                      data):
+        """
+        Uploads a single block of a block blob or a single range of pages
+        of a page blob.
+
+        @param count: The (1 based) index of the chunk
+        @type count: C{int}
+
+        @param offset: The offset of the chunk in the blob
+        @type offset: C{int}
+
+        @param data: The chunk data
+        @type data: C{bytes}
+        """
+        headers = {}
+        lease.update_headers(headers)
+
+        chunk_hash = self._get_hash_function()
+        chunk_hash.update(data)
+        chunk_hash = base64.b64encode(b(chunk_hash.digest()))
+
+        headers['Content-MD5'] = chunk_hash.decode('utf-8')
+        headers['Content-Length'] = len(data)
+
+        if blob_type == 'BlockBlob':
+            params = {'comp': 'block', 'blockid': self._get_block_id(count)}
+        else:
+            params = {'comp': 'page'}
+            headers['x-ms-page-write'] = 'update'
+            headers['x-ms-range'] = 'bytes=%d-%d' % \
+                                        (offset, offset + len(data) - 1)
+
+        resp = self.connection.request(object_path, method='PUT',
+                                       data=data, headers=headers,
+                                       params=params)
+
+        if resp.status != httplib.CREATED:
+            resp.parse_error()
+            raise LibcloudError('Error uploading chunk %d. Code: %d' %
+                                (count, resp.status), driver=self)
+
+    def _get_upload_concurrency(self, concurrency=None):
+        if concurrency is None:
+            concurrency = self.upload_concurrency
+
+        if concurrency < 1:
+            raise ValueError('Upload concurrency must be at least 1')
+
+        return concurrency
+
     def _commit_blocks(self, object_path, chunks, lease):
         """
         Makes a final commit of the data.
@@ -732,7 +924,8 @@ class AzureBlobsStorageDriver(StorageDriver):
                                     'page boundary', driver=self)
 
     def upload_object(self, file_path, container, object_name, extra=None,
-                      verify_hash=True, ex_blob_type=None, ex_use_lease=False):
+                      verify_hash=True, ex_blob_type=None, ex_use_lease=False,
+                      ex_upload_concurrency=None):
         """
         Upload an object currently located on a disk.
 
@@ -743,7 +936,13 @@ class AzureBlobsStorageDriver(StorageDriver):
 
         @param ex_use_lease: Indicates if we must take a lease before upload
         @type ex_use_lease: C{bool}
+
+        @param ex_upload_concurrency: Number of blocks (or pages) to upload
+            in parallel when the object is uploaded in chunks (defaults to
+            upload_concurrency).
+        @type ex_upload_concurrency: C{int}
         """
+        concurrency = self._get_upload_concurrency(ex_upload_concurrency)
 
         if ex_blob_type is None:
             ex_blob_type = self.ex_blob_type
@@ -772,7 +971,8 @@ class AzureBlobsStorageDriver(StorageDriver):
                 upload_func_kwargs = {'iterator': iterator,
                                       'object_path': object_path,
                                       'blob_type': ex_blob_type,
-                                      'lease': None}
+                                      'lease': None,
+                                      'concurrency': concurrency}
             else:
                 upload_func = self._stream_data
                 upload_func_kwargs = {'iterator': iterator,
@@ -792,7 +992,8 @@ class AzureBlobsStorageDriver(StorageDriver):
     def upload_object_via_stream(self, iterator, container, object_name,
                                  verify_hash=False, extra=None,
                                  ex_use_lease=False, ex_blob_type=None,
-                                 ex_page_blob_size=None):
+                                 ex_page_blob_size=None,
+                                 ex_upload_concurrency=None):
         """
         @inherits: L{StorageDriver.upload_object_via_stream}
 
@@ -805,7 +1006,12 @@ class AzureBlobsStorageDriver(StorageDriver):
 
         @param ex_use_lease: Indicates if we must take a lease before upload
         @type ex_use_lease: C{bool}
+
+        @param ex_upload_concurrency: Number of blocks (or pages) to upload
+            in parallel (defaults to upload_concurrency).
+        @type ex_upload_concurrency: C{int}
         """
+        concurrency = self._get_upload_concurrency(ex_upload_concurrency)
 
         if ex_blob_type is None:
             ex_blob_type = self.ex_blob_type
@@ -818,7 +1024,8 @@ class AzureBlobsStorageDriver(StorageDriver):
         upload_func_kwargs = {'iterator': iterator,
                               'object_path': object_path,
                               'blob_type': ex_blob_type,
-                              'lease': None}
+                              'lease': None,
+                              'concurrency': concurrency}
 
         return self._put_object(container=container,
                                 object_name=object_name,
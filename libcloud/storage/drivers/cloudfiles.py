@@ -33,9 +33,11 @@ from libcloud.utils.py3 import urlquote
 if PY3:
     from io import FileIO as file
 
-from libcloud.utils.files import read_in_chunks
+from libcloud.utils.files import read_in_chunks, CHUNK_SIZE
+from libcloud.utils.concurrency import run_concurrently
 from libcloud.common.types import MalformedResponseError, LibcloudError
 from libcloud.common.base import Response, RawResponse
+from libcloud.common.base import ThreadLocalAttribute
 
 from libcloud.storage.providers import Provider
 from libcloud.storage.base import Object, Container, StorageDriver
@@ -55,6 +57,10 @@ from libcloud.common.rackspace import (
 CDN_HOST = 'cdn.clouddrive.com'
 API_VERSION = 'v1.0'
 
+# Default number of segments which are uploaded in parallel by
+# ex_multipart_upload_object. 1 means segments are uploaded one after another.
+MULTIPART_CONCURRENCY = 1
+
 
 class CloudFilesResponse(Response):
     valid_response_codes = [httplib.NOT_FOUND, httplib.CONFLICT]
@@ -106,12 +112,13 @@ class CloudFilesConnection(OpenStackBaseConnection):
     responseCls = CloudFilesResponse
     rawResponseCls = CloudFilesRawResponse
 
+    cdn_request = ThreadLocalAttribute('cdn_request', default=False)
+
     def __init__(self, user_id, key, secure=True, **kwargs):
         super(CloudFilesConnection, self).__init__(user_id, key, secure=secure,
                                                    **kwargs)
         self.api_version = API_VERSION
         self.accept_format = 'application/json'
-        self.cdn_request = False
 
         if self._ex_force_service_region:
             self.service_region = self._ex_force_service_region
@@ -150,6 +157,9 @@ class CloudFilesConnection(OpenStackBaseConnection):
         else:
             raise LibcloudError('Could not find specified endpoint')
 
+    def _get_endpoint_cache_key(self):
+        return self.cdn_request
+
     def request(self, action, params=None, data='', headers=None, method='GET',
                 raw=False, cdn_request=False):
         if not headers:
@@ -169,6 +179,19 @@ class CloudFilesConnection(OpenStackBaseConnection):
             method=method, headers=headers,
             raw=raw)
 
+    def request_stream(self, action, params=None, data='', headers=None,
+                       method='GET'):
+        if not params:
+            params = {}
+
+        self.cdn_request = False
+        params['format'] = 'json'
+
+        return super(CloudFilesConnection, self).request_stream(
+            action=action,
+            params=params, data=data,
+            method=method, headers=headers)
+
 
 class CloudFilesUSConnection(CloudFilesConnection):
     """
@@ -224,24 +247,84 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
     connectionCls = CloudFilesConnection
     hash_type = 'md5'
     supports_chunked_encoding = True
+    supports_range_requests = True
+    multipart_concurrency = MULTIPART_CONCURRENCY
 
     def __init__(self, *args, **kwargs):
         OpenStackDriverMixin.__init__(self, *args, **kwargs)
         super(CloudFilesStorageDriver, self).__init__(*args, **kwargs)
 
     def list_containers(self):
-        response = self.connection.request('')
+        response = self.connection.request_stream('')
 
-        if response.status == httplib.NO_CONTENT:
-            return []
-        elif response.status == httplib.OK:
-            return self._to_container_list(json.loads(response.body))
+        try:
+            # NO_CONTENT is returned if there are no containers
+            if response.status in [httplib.OK, httplib.NO_CONTENT]:
+                return self._to_container_list(response.iterjson())
+        finally:
+            response.close()
 
         raise LibcloudError('Unexpected status code: %s' % (response.status))
 
-    def list_container_objects(self, container):
+    def list_container_objects(self, container, ex_prefetch=False,
+                               ex_max_pages=None):
+        """
+        @inherits: L{StorageDriver.list_container_objects}
+
+        The objects are retrieved page by page as the returned list is
+        consumed.
+
+        @param ex_prefetch: Retrieve the next page in the background while
+                            the current one is consumed.
+        @type ex_prefetch: C{bool}
+
+        @param ex_max_pages: Maximum number of pages kept in memory (all
+                             the pages are kept by default).
+        @type ex_max_pages: C{int}
+        """
         value_dict = {'container': container}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=ex_prefetch, max_pages=ex_max_pages)
+
+    def iterate_container_objects(self, container, ex_prefix=None):
+        """
+        @inherits: L{StorageDriver.iterate_container_objects}
+
+        @param ex_prefix: Only return objects whose name starts with the
+                          prefix.
+        @type ex_prefix: C{str}
+        """
+        container_name_encoded = self._encode_container_name(container.name)
+        params = {}
+
+        if ex_prefix:
+            params['prefix'] = ex_prefix
+
+        while True:
+            # Objects are parsed and yielded as they are read from the socket
+            # so a page (up to 10k objects) is never fully kept in memory
+            response = self.connection.request_stream(
+                '/%s' % (container_name_encoded), params=params)
+
+            try:
+                # NO_CONTENT is returned for empty or inexistent container
+                if response.status not in [httplib.OK, httplib.NO_CONTENT]:
+                    raise LibcloudError('Unexpected status code: %s' %
+                                        (response.status))
+
+                last_key = None
+
+                for obj in self._to_object_list(response.iterjson(),
+                                                container, as_iterator=True):
+                    last_key = obj.name
+                    yield obj
+            finally:
+                response.close()
+
+            if last_key is None:
+                return
+
+            params['marker'] = last_key
 
     def get_container(self, container_name):
         container_name_encoded = self._encode_container_name(container_name)
@@ -350,7 +433,23 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
                                            container_name=name, driver=self)
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ex_range_concurrency=None):
+        """
+        @inherits: L{StorageDriver.download_object}
+
+        @param ex_range_concurrency: If greater than 1, objects bigger than
+            range_download_part_size are downloaded in byte ranges using this
+            many threads (see L{download_object_in_ranges}). Defaults to
+            range_download_concurrency.
+        @type ex_range_concurrency: C{int}
+        """
+        if self._should_download_in_ranges(obj, ex_range_concurrency):
+            return self.download_object_in_ranges(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing,
+                delete_on_failure=delete_on_failure,
+                concurrency=ex_range_concurrency)
+
         container_name = obj.container.name
         object_name = obj.name
         response = self.connection.request('/%s/%s' % (container_name,
@@ -366,6 +465,23 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
                              'delete_on_failure': delete_on_failure},
             success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start, end):
+        container_name = obj.container.name
+        object_name = obj.name
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+
+        return self.connection.request('/%s/%s' % (container_name,
+                                                   object_name),
+                                       method='GET', headers=headers,
+                                       raw=True)
+
+    def _get_object_data_hash(self, obj):
+        # The ETag of a manifest object is a hash of the segment ETags
+        if obj.hash and 'object_manifest' not in obj.extra:
+            return obj.hash.replace('"', '')
+
+        return None
+
     def download_object_as_stream(self, obj, chunk_size=None):
         container_name = obj.container.name
         object_name = obj.name
@@ -375,8 +491,10 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         return self._get_object(obj=obj, callback=read_in_chunks,
                                 response=response,
-                                callback_kwargs={'iterator': response.response,
-                                                 'chunk_size': chunk_size},
+                                callback_kwargs={
+                                    'iterator': response.response,
+                                    'chunk_size': chunk_size or self.chunk_size
+                                },
                                 success_status_code=httplib.OK)
 
     def upload_object(self, file_path, container, object_name, extra=None,
@@ -387,7 +505,8 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
         Note: This will override file with a same name if it already exists.
         """
         upload_func = self._upload_file
-        upload_func_kwargs = {'file_path': file_path}
+        upload_func_kwargs = {'file_path': file_path,
+                              'calculate_hash': verify_hash}
 
         return self._put_object(container=container, object_name=object_name,
                                 upload_func=upload_func,
@@ -470,21 +589,67 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
     def ex_multipart_upload_object(self, file_path, container, object_name,
                                    chunk_size=33554432, extra=None,
-                                   verify_hash=True):
+                                   verify_hash=True, ex_concurrency=None,
+                                   ex_resume=False):
+        """
+        Upload a large object as a set of chunk_size segments named
+        "<object_name>/<segment number>" and a manifest which joins them.
+
+        If verify_hash is True, the MD5 hash of every segment is checked
+        against the ETag returned by the server.
+
+        @param ex_concurrency: Number of segments to upload in parallel
+            (defaults to multipart_concurrency).
+        @type ex_concurrency: C{int}
+
+        @param ex_resume: If True, segments which already exist with the
+            same MD5 hash (e.g. from a previous interrupted upload) are not
+            uploaded again. Existing segments which are not part of the new
+            upload (e.g. uploaded with a smaller chunk_size) are deleted so
+            the manifest doesn't join them.
+        @type ex_resume: C{bool}
+        """
         object_size = os.path.getsize(file_path)
         if object_size < chunk_size:
             return self.upload_object(file_path, container, object_name,
                                       extra=extra, verify_hash=verify_hash)
 
-        iter_chunk_reader = FileChunkReader(file_path, chunk_size)
-
-        for index, iterator in enumerate(iter_chunk_reader):
+        concurrency = self._get_multipart_concurrency(ex_concurrency)
+        segments = []
+        for index, start_block in enumerate(range(0, object_size,
+                                                  chunk_size)):
+            end_block = min(start_block + chunk_size, object_size)
+            segments.append((index, start_block, end_block))
+
+        existing_segments = None
+
+        if ex_resume:
+            existing_segments = self._get_segments(container, object_name)
+            self._delete_stale_segments(existing_segments, object_name,
+                                        len(segments), concurrency)
+
+        def upload_segment(index, start_block, end_block):
+            if existing_segments is not None:
+                segment_name = self._get_segment_name(object_name, index)
+                segment = existing_segments.get(segment_name, None)
+
+                if segment is not None and segment.hash == \
+                        self._get_file_range_hash(file_path, start_block,
+                                                  end_block):
+                    return
+
+            iterator = ChunkStreamReader(file_path=file_path,
+                                         start_block=start_block,
+                                         end_block=end_block,
+                                         chunk_size=8192)
             self._upload_object_part(container=container,
                                      object_name=object_name,
                                      part_number=index,
                                      iterator=iterator,
                                      verify_hash=verify_hash)
 
+        run_concurrently(upload_segment, segments, concurrency)
+
         return self._upload_object_manifest(container=container,
                                             object_name=object_name,
                                             extra=extra,
@@ -599,11 +764,69 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         return temp_url
 
+    def _get_multipart_concurrency(self, concurrency=None):
+        if concurrency is None:
+            concurrency = self.multipart_concurrency
+
+        if concurrency < 1:
+            raise ValueError('Multipart concurrency must be at least 1')
+
+        return concurrency
+
+    def _get_segment_name(self, object_name, part_number):
+        return object_name + '/%08d' % part_number
+
+    def _get_segments(self, container, object_name):
+        """
+        Return a dictionary which maps the names of the existing segments of
+        the object to the L{Object} instances.
+        """
+        prefix = object_name + '/'
+        objects = self.iterate_container_objects(container, ex_prefix=prefix)
+        return dict([(obj.name, obj) for obj in objects])
+
+    def _delete_stale_segments(self, segments, object_name, segment_count,
+                               concurrency):
+        """
+        Delete the existing segments which are numbered beyond the new
+        segment count. Other objects with the segment prefix would be joined
+        by the manifest as well, so they are not touched and an error is
+        raised instead.
+        """
+        names = set([self._get_segment_name(object_name, index)
+                     for index in range(segment_count)])
+        prefix_length = len(object_name) + 1
+        stale = []
+
+        for name, obj in segments.items():
+            if name in names:
+                continue
+
+            if not name[prefix_length:].isdigit():
+                raise LibcloudError('Object %s is not a segment of %s but it '
+                                    'would be included in the manifest' %
+                                    (name, object_name), driver=self)
+
+            stale.append((obj,))
+
+        run_concurrently(self.delete_object, stale, concurrency)
+
+    def _get_file_range_hash(self, file_path, start_block, end_block):
+        data_hash = self._get_hash_function()
+
+        for data in ChunkStreamReader(file_path=file_path,
+                                      start_block=start_block,
+                                      end_block=end_block,
+                                      chunk_size=CHUNK_SIZE):
+            data_hash.update(data)
+
+        return data_hash.hexdigest()
+
     def _upload_object_part(self, container, object_name, part_number,
                             iterator, verify_hash=True):
         upload_func = self._stream_data
         upload_func_kwargs = {'iterator': iterator}
-        part_name = object_name + '/%08d' % part_number
+        part_name = self._get_segment_name(object_name, part_number)
         extra = {'content_type': 'application/octet-stream'}
 
         self._put_object(container=container,
@@ -762,20 +985,22 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         return containers
 
-    def _to_object_list(self, response, container):
-        objects = []
+    def _to_object_list(self, response, container, as_iterator=False):
+        objects = (self._to_object(obj, container) for obj in response)
+
+        if as_iterator:
+            return objects
 
-        for obj in response:
-            name = obj['name']
-            size = int(obj['bytes'])
-            hash = obj['hash']
-            extra = {'content_type': obj['content_type'],
-                     'last_modified': obj['last_modified']}
-            objects.append(Object(
-                name=name, size=size, hash=hash, extra=extra,
-                meta_data=None, container=container, driver=self))
+        return list(objects)
 
-        return objects
+    def _to_object(self, obj, container):
+        name = obj['name']
+        size = int(obj['bytes'])
+        hash = obj['hash']
+        extra = {'content_type': obj['content_type'],
+                 'last_modified': obj['last_modified']}
+        return Object(name=name, size=size, hash=hash, extra=extra,
+                      meta_data=None, container=container, driver=self)
 
     def _headers_to_container(self, name, headers):
         size = int(headers.get('x-container-bytes-used', 0))
@@ -800,6 +1025,9 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         extra = {'content_type': content_type, 'last_modified': last_modified}
 
+        if 'x-object-manifest' in headers:
+            extra['object_manifest'] = headers['x-object-manifest']
+
         obj = Object(name=name, size=size, hash=etag, extra=extra,
                      meta_data=meta_data, container=container, driver=self)
         return obj
@@ -847,36 +1075,6 @@ class CloudFilesUKStorageDriver(CloudFilesStorageDriver):
     connectionCls = CloudFilesUKConnection
 
 
-class FileChunkReader(object):
-    def __init__(self, file_path, chunk_size):
-        self.file_path = file_path
-        self.total = os.path.getsize(file_path)
-        self.chunk_size = chunk_size
-        self.bytes_read = 0
-        self.stop_iteration = False
-
-    def __iter__(self):
-        return self
-
-    def next(self):
-        if self.stop_iteration:
-            raise StopIteration
-
-        start_block = self.bytes_read
-        end_block = start_block + self.chunk_size
-        if end_block >= self.total:
-            end_block = self.total
-            self.stop_iteration = True
-        self.bytes_read += end_block - start_block
-        return ChunkStreamReader(file_path=self.file_path,
-                                 start_block=start_block,
-                                 end_block=end_block,
-                                 chunk_size=8192)
-
-    def __next__(self):
-        return self.next()
-
-
 class ChunkStreamReader(object):
     def __init__(self, file_path, start_block, end_block, chunk_size):
         self.fd = open(file_path, 'rb')
@@ -21,11 +21,13 @@ from email.utils import formatdate
 from hashlib import sha1
 
 from libcloud.utils.py3 import b
+from libcloud.utils.xml import XmlFieldExtractor
 
 from libcloud.common.base import ConnectionUserAndKey
 
 from libcloud.storage.drivers.s3 import S3StorageDriver, S3Response
 from libcloud.storage.drivers.s3 import S3RawResponse
+from libcloud.storage.drivers.s3 import OBJECT_FIELDS, CONTAINER_FIELDS
 
 SIGNATURE_IDENTIFIER = 'GOOG1'
 
@@ -132,5 +134,8 @@ class GoogleStorageDriver(S3StorageDriver):
     connectionCls = GoogleStorageConnection
     hash_type = 'md5'
     namespace = NAMESPACE
+    _object_fields = XmlFieldExtractor(OBJECT_FIELDS, namespace=NAMESPACE)
+    _container_fields = XmlFieldExtractor(CONTAINER_FIELDS,
+                                          namespace=NAMESPACE)
     supports_chunked_encoding = False
     supports_s3_multipart_upload = False
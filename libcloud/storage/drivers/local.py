@@ -406,7 +406,9 @@ class LocalStorageDriver(StorageDriver):
         path = self.get_object_cdn_url(obj)
 
         with open(path) as obj_file:
-            for data in read_in_chunks(obj_file, chunk_size=chunk_size):
+            for data in read_in_chunks(obj_file,
+                                       chunk_size=chunk_size or
+                                       self.chunk_size):
                 yield data
 
     def upload_object(self, file_path, container, object_name, extra=None,
@@ -13,11 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import with_statement
+
 import time
 import copy
 import base64
 import hmac
 import sys
+import threading
 
 from hashlib import sha1
 from xml.etree.ElementTree import Element, SubElement
@@ -28,9 +31,12 @@ from libcloud.utils.py3 import urlquote
 from libcloud.utils.py3 import urlencode
 from libcloud.utils.py3 import b
 from libcloud.utils.py3 import tostring
+from libcloud.utils.py3 import queue
 
-from libcloud.utils.xml import fixxpath, findtext
+from libcloud.utils.xml import fixxpath, findtext, findall
+from libcloud.utils.xml import XmlFieldExtractor
 from libcloud.utils.files import read_in_chunks
+from libcloud.utils.concurrency import start_workers
 from libcloud.common.types import InvalidCredsError, LibcloudError
 from libcloud.common.base import ConnectionUserAndKey, RawResponse
 from libcloud.common.aws import AWSBaseResponse
@@ -59,10 +65,42 @@ NAMESPACE = 'http://s3.amazonaws.com/doc/%s/' % (API_VERSION)
 # AWS multi-part chunks must be minimum 5MB
 CHUNK_SIZE = 5 * 1024 * 1024
 
+# Default number of parts which are uploaded in parallel during a multipart
+# upload. 1 means parts are uploaded one after another.
+MULTIPART_CONCURRENCY = 1
+
+# Default number of seconds for which the containers returned by
+# get_container are cached (0 disables the cache)
+CONTAINER_CACHE_TTL = 0
+
+# Default number of shards (common prefixes) which are listed in parallel by
+# ex_iterate_container_objects_sharded
+LIST_CONCURRENCY = 8
+
+# Maximum number of listing pages of a single shard which are retrieved ahead
+# of the consumer by ex_iterate_container_objects_sharded
+LIST_SHARD_QUEUE_SIZE = 2
+
 # Desired number of items in each response inside a paginated request in
 # ex_iterate_multipart_uploads.
 RESPONSES_PER_REQUEST = 100
 
+# Fields of the Contents elements in a bucket listing
+OBJECT_FIELDS = {
+    'name': 'Key',
+    'size': 'Size',
+    'hash': 'ETag',
+    'last_modified': 'LastModified',
+    'owner_id': 'Owner/ID',
+    'owner_display_name': 'Owner/DisplayName'
+}
+
+# Fields of the Bucket elements in a service listing
+CONTAINER_FIELDS = {
+    'name': 'Name',
+    'creation_date': 'CreationDate'
+}
+
 
 class S3Response(AWSBaseResponse):
 
@@ -214,8 +252,17 @@ class S3StorageDriver(StorageDriver):
     hash_type = 'md5'
     supports_chunked_encoding = False
     supports_s3_multipart_upload = True
+    supports_range_requests = True
+    multipart_concurrency = MULTIPART_CONCURRENCY
+    container_cache_ttl = CONTAINER_CACHE_TTL
     ex_location_name = ''
     namespace = NAMESPACE
+    _container_cache = None
+
+    # Subclasses with a different namespace need to compile their own
+    _object_fields = XmlFieldExtractor(OBJECT_FIELDS, namespace=NAMESPACE)
+    _container_fields = XmlFieldExtractor(CONTAINER_FIELDS,
+                                          namespace=NAMESPACE)
 
     def iterate_containers(self):
         response = self.connection.request('/')
@@ -227,46 +274,319 @@ class S3StorageDriver(StorageDriver):
         raise LibcloudError('Unexpected status code: %s' % (response.status),
                             driver=self)
 
-    def iterate_container_objects(self, container):
+    def iterate_container_objects(self, container, ex_prefix=None,
+                                  ex_delimiter=None):
+        """
+        @inherits: L{StorageDriver.iterate_container_objects}
+
+        @param ex_prefix: Only return objects whose name starts with the
+                          prefix.
+        @type ex_prefix: C{str}
+
+        @param ex_delimiter: Don't return objects whose name contains the
+                             delimiter after the prefix. Those are grouped
+                             into common prefixes instead (see
+                             L{ex_iterate_common_prefixes}).
+        @type ex_delimiter: C{str}
+        """
+        for obj, _ in self._iterate_listing(container, prefix=ex_prefix,
+                                            delimiter=ex_delimiter):
+            if obj is not None:
+                yield obj
+
+    def ex_iterate_common_prefixes(self, container, prefix=None,
+                                   delimiter='/'):
+        """
+        Iterate over the common prefixes of the object names, i.e. the
+        distinct parts of the names from the beginning to the first
+        occurrence of the delimiter after the prefix (e.g. "logs/" for
+        "logs/2013/1.gz" and "logs/2013/2.gz").
+
+        @param container: Container instance
+        @type container: L{Container}
+
+        @param prefix: Only consider objects whose name starts with the
+                       prefix.
+        @type prefix: C{str}
+
+        @param delimiter: The delimiter
+        @type delimiter: C{str}
+
+        @rtype: C{generator} of C{str}
+        """
+        for _, common_prefixes in self._iterate_listing(container,
+                                                        prefix=prefix,
+                                                        delimiter=delimiter):
+            if common_prefixes is not None:
+                for common_prefix in common_prefixes:
+                    yield common_prefix
+
+    def ex_iterate_container_objects_sharded(self, container, prefix=None,
+                                             delimiter='/',
+                                             concurrency=LIST_CONCURRENCY,
+                                             ordered=True):
+        """
+        Iterate over the container objects, listing parts of the key space
+        in parallel.
+
+        The objects under the prefix are listed with the delimiter first.
+        Every common prefix which is found (e.g. "logs/") is a shard which
+        is listed (without the delimiter) by a pool of worker threads.
+
+        @param container: Container instance
+        @type container: L{Container}
+
+        @param prefix: Only return objects whose name starts with the prefix.
+        @type prefix: C{str}
+
+        @param delimiter: The delimiter used to split the key space into
+                          shards.
+        @type delimiter: C{str}
+
+        @param concurrency: Number of shards which are listed in parallel.
+        @type concurrency: C{int}
+
+        @param ordered: If True, the objects are yielded in the same
+                        (lexicographical) order as by
+                        L{iterate_container_objects}. Otherwise the objects
+                        of a shard are yielded as soon as they are retrieved
+                        and the shards don't have to wait for each other.
+        @type ordered: C{bool}
+
+        @rtype: C{generator} of L{Object}
+        """
+        stopped = threading.Event()
+        output = queue.Queue(maxsize=LIST_SHARD_QUEUE_SIZE * concurrency)
+
+        def put(pages, item):
+            # Give up once the consumer has stopped
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def list_shard(shard_prefix, pages):
+            if stopped.is_set():
+                return
+
+            page = []
+
+            try:
+                for obj, _ in self._iterate_listing(container,
+                                                    prefix=shard_prefix):
+                    if obj is not None:
+                        page.append(obj)
+                    elif not put(pages, page):
+                        return
+                    else:
+                        page = []
+            except Exception:
+                put(pages, sys.exc_info()[1])
+            else:
+                put(pages, None)
+
+        def read_pages(pages, shard_count):
+            # Each shard ends with None
+            while shard_count:
+                item = pages.get()
+
+                if item is None:
+                    shard_count -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    for obj in item:
+                        yield obj
+
+        submit, finish = start_workers(list_shard, concurrency)
+
+        shard_count = 0
+        page = []
+
+        try:
+            for obj, common_prefixes in self._iterate_listing(
+                    container, prefix=prefix, delimiter=delimiter):
+                if obj is not None:
+                    if ordered:
+                        page.append((obj.name, obj, None))
+                    else:
+                        yield obj
+
+                    continue
+
+                for common_prefix in common_prefixes:
+                    if ordered:
+                        pages = queue.Queue(maxsize=LIST_SHARD_QUEUE_SIZE)
+                        page.append((common_prefix, None, pages))
+                    else:
+                        pages = output
+                        shard_count += 1
+
+                    submit(common_prefix, pages)
+
+                if not ordered:
+                    continue
+
+                # All the objects of a shard sort between the objects which
+                # sort before and after its common prefix
+                page.sort(key=lambda entry: entry[0])
+
+                for _, obj, pages in page:
+                    if obj is not None:
+                        yield obj
+                    else:
+                        for obj in read_pages(pages, 1):
+                            yield obj
+
+                page = []
+
+            for obj in read_pages(output, shard_count):
+                yield obj
+        finally:
+            stopped.set()
+            finish()
+
+    def _iterate_listing(self, container, prefix=None, delimiter=None):
+        """
+        Iterate over the container listing.
+
+        Yields a (object, None) tuple for every object as it's read from the
+        socket and a (None, common prefixes) tuple at the end of every page,
+        so a page is never fully kept in memory.
+        """
         params = {}
-        last_key = None
-        exhausted = False
         container_path = self._get_container_path(container)
 
-        while not exhausted:
-            if last_key:
-                params['marker'] = last_key
+        if prefix:
+            params['prefix'] = prefix
+
+        if delimiter:
+            params['delimiter'] = delimiter
 
-            response = self.connection.request(container_path,
-                                               params=params)
+        while True:
+            response = self.connection.request_stream(container_path,
+                                                      params=params)
 
             if response.status != httplib.OK:
                 raise LibcloudError('Unexpected status code: %s' %
                                     (response.status), driver=self)
 
-            objects = self._to_objs(obj=response.object,
-                                    xpath='Contents', container=container)
-            is_truncated = response.object.findtext(fixxpath(
-                xpath='IsTruncated', namespace=self.namespace)).lower()
-            exhausted = (is_truncated == 'false')
-
             last_key = None
-            for obj in objects:
-                last_key = obj.name
-                yield obj
+
+            try:
+                elements = response.iterparse(xpath='Contents',
+                                              namespace=self.namespace)
+
+                for element in elements:
+                    obj = self._to_obj(element, container)
+                    last_key = obj.name
+                    yield obj, None
+            finally:
+                response.close()
+
+            root = elements.root
+            common_prefixes = [element.text for element in
+                               findall(element=root,
+                                       xpath='CommonPrefixes/Prefix',
+                                       namespace=self.namespace)]
+
+            yield None, common_prefixes
+
+            is_truncated = findtext(element=root, xpath='IsTruncated',
+                                    namespace=self.namespace)
+
+            if is_truncated.lower() == 'false':
+                return
+
+            # NextMarker is only returned if a delimiter is used
+            marker = findtext(element=root, xpath='NextMarker',
+                              namespace=self.namespace)
+
+            if not marker:
+                marker = max(common_prefixes[-1:] + [last_key or ''])
+
+            if not marker:
+                return
+
+            params['marker'] = marker
 
     def get_container(self, container_name):
-        # This is very inefficient, but afaik it's the only way to do it
-        containers = self.list_containers()
+        """
+        @inherits: L{StorageDriver.get_container}
+
+        The container is looked up with a single HEAD request. If
+        L{container_cache_ttl} is set, the containers which are found are
+        cached for that many seconds.
+
+        Note: Bucket HEAD response doesn't include the creation date, so
+        C{extra} of the returned container is empty.
+
+        Note: S3 answers the HEAD request with 403 if the bucket exists but
+        belongs to a different account. Such buckets can't be used, so
+        L{ContainerDoesNotExistError} is raised for them, same as for the
+        buckets which don't exist at all.
+        """
+        container = self._get_cached_container(container_name)
+
+        if container is not None:
+            return container
 
         try:
-            container = [c for c in containers if c.name == container_name][0]
-        except IndexError:
+            response = self.connection.request('/%s' % (container_name),
+                                               method='HEAD')
+        except InvalidCredsError:
+            self._uncache_container(container_name)
+            raise ContainerDoesNotExistError(value='Access denied',
+                                             driver=self,
+                                             container_name=container_name)
+
+        if response.status == httplib.NOT_FOUND:
+            self._uncache_container(container_name)
             raise ContainerDoesNotExistError(value=None, driver=self,
                                              container_name=container_name)
+        elif response.status != httplib.OK:
+            raise LibcloudError('Unexpected status code: %s' %
+                                (response.status), driver=self)
 
+        container = Container(name=container_name, extra={}, driver=self)
+        self._cache_container(container)
         return container
 
+    def _get_cached_container(self, container_name):
+        if not self.container_cache_ttl or self._container_cache is None:
+            return None
+
+        cached = self._container_cache.get(container_name, None)
+
+        if cached is None:
+            return None
+
+        expires_at, container = cached
+
+        if expires_at <= time.time():
+            self._container_cache.pop(container_name, None)
+            return None
+
+        return container
+
+    def _cache_container(self, container):
+        if not self.container_cache_ttl:
+            return
+
+        if self._container_cache is None:
+            self._container_cache = {}
+
+        expires_at = time.time() + self.container_cache_ttl
+        self._container_cache[container.name] = (expires_at, container)
+
+    def _uncache_container(self, container_name):
+        if self._container_cache is not None:
+            self._container_cache.pop(container_name, None)
+
     def get_object(self, container_name, object_name):
         container = self.get_container(container_name=container_name)
         object_path = self._get_object_path(container, object_name)
@@ -327,6 +647,7 @@ class S3StorageDriver(StorageDriver):
 
         if response.status == httplib.OK:
             container = Container(name=container_name, extra=None, driver=self)
+            self._cache_container(container)
             return container
         elif response.status == httplib.CONFLICT:
             raise InvalidContainerNameError(
@@ -344,6 +665,7 @@ class S3StorageDriver(StorageDriver):
 
     def delete_container(self, container):
         # Note: All the objects in the container must be deleted first
+        self._uncache_container(container.name)
         response = self.connection.request('/%s' % (container.name),
                                            method='DELETE')
         if response.status == httplib.NO_CONTENT:
@@ -360,7 +682,23 @@ class S3StorageDriver(StorageDriver):
         return False
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ex_range_concurrency=None):
+        """
+        @inherits: L{StorageDriver.download_object}
+
+        @param ex_range_concurrency: If greater than 1, objects bigger than
+            range_download_part_size are downloaded in byte ranges using this
+            many threads (see L{download_object_in_ranges}). Defaults to
+            range_download_concurrency.
+        @type ex_range_concurrency: C{int}
+        """
+        if self._should_download_in_ranges(obj, ex_range_concurrency):
+            return self.download_object_in_ranges(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing,
+                delete_on_failure=delete_on_failure,
+                concurrency=ex_range_concurrency)
+
         obj_path = self._get_object_path(obj.container, obj.name)
 
         response = self.connection.request(obj_path, method='GET', raw=True)
@@ -381,20 +719,64 @@ class S3StorageDriver(StorageDriver):
 
         return self._get_object(obj=obj, callback=read_in_chunks,
                                 response=response,
-                                callback_kwargs={'iterator': response.response,
-                                                 'chunk_size': chunk_size},
+                                callback_kwargs={
+                                    'iterator': response.response,
+                                    'chunk_size': chunk_size or self.chunk_size
+                                },
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start, end):
+        obj_path = self._get_object_path(obj.container, obj.name)
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+
+        return self.connection.request(obj_path, method='GET',
+                                       headers=headers, raw=True)
+
+    def _get_object_data_hash(self, obj):
+        # The ETag of an object uploaded using multipart upload is not a MD5
+        # hash of the data and contains a dash
+        if obj.hash and '-' not in obj.hash:
+            return obj.hash
+
+        return None
+
     def upload_object(self, file_path, container, object_name, extra=None,
-                      verify_hash=True, ex_storage_class=None):
+                      verify_hash=True, ex_storage_class=None,
+                      ex_multipart_concurrency=None):
         """
         @inherits: L{StorageDriver.upload_object}
 
         @param ex_storage_class: Storage class
         @type ex_storage_class: C{str}
+
+        @param ex_multipart_concurrency: Number of parts to upload in
+            parallel. If greater than 1, the file is uploaded using the
+            multipart upload mechanism (defaults to multipart_concurrency).
+            Note: The ETag of a multipart upload is not a MD5 hash of the
+            data so verify_hash is ignored in this case.
+        @type ex_multipart_concurrency: C{int}
         """
+        concurrency = self._get_multipart_concurrency(ex_multipart_concurrency)
+
+        if concurrency > 1 and self.supports_s3_multipart_upload:
+            upload_func = self._upload_multipart_file
+            upload_func_kwargs = {'file_path': file_path,
+                                  'container': container,
+                                  'object_name': object_name,
+                                  'concurrency': concurrency}
+
+            return self._put_object(container=container,
+                                    object_name=object_name,
+                                    upload_func=upload_func,
+                                    upload_func_kwargs=upload_func_kwargs,
+                                    extra=extra, method='POST',
+                                    query_args='uploads', file_path=file_path,
+                                    iterator=iter(''), verify_hash=False,
+                                    storage_class=ex_storage_class)
+
         upload_func = self._upload_file
-        upload_func_kwargs = {'file_path': file_path}
+        upload_func_kwargs = {'file_path': file_path,
+                              'calculate_hash': verify_hash}
 
         return self._put_object(container=container, object_name=object_name,
                                 upload_func=upload_func,
@@ -403,8 +785,38 @@ class S3StorageDriver(StorageDriver):
                                 verify_hash=verify_hash,
                                 storage_class=ex_storage_class)
 
+    def _get_multipart_concurrency(self, concurrency=None):
+        if concurrency is None:
+            concurrency = self.multipart_concurrency
+
+        if concurrency < 1:
+            raise ValueError('Multipart concurrency must be at least 1')
+
+        return concurrency
+
+    def _upload_multipart_file(self, response, data, file_path, container,
+                               object_name, calculate_hash=True,
+                               concurrency=1):
+        """
+        Callback invoked for uploading a local file to S3 using Amazon's
+        multipart upload mechanism.
+
+        @param file_path: Path to a local file.
+        @type file_path: C{str}
+
+        See L{_upload_multipart} for the rest of the arguments.
+        """
+        with open(file_path, 'rb') as file_handle:
+            iterator = iter(lambda: file_handle.read(CHUNK_SIZE), b(''))
+            return self._upload_multipart(response=response, data=data,
+                                          iterator=iterator,
+                                          container=container,
+                                          object_name=object_name,
+                                          calculate_hash=calculate_hash,
+                                          concurrency=concurrency)
+
     def _upload_multipart(self, response, data, iterator, container,
-                          object_name, calculate_hash=True):
+                          object_name, calculate_hash=True, concurrency=1):
         """
         Callback invoked for uploading data to S3 using Amazon's
         multipart upload mechanism
@@ -428,6 +840,9 @@ class S3StorageDriver(StorageDriver):
         @keyword calculate_hash: Indicates if we must calculate the data hash
         @type calculate_hash: C{bool}
 
+        @keyword concurrency: Number of parts to upload in parallel
+        @type concurrency: C{int}
+
         @return: A tuple of (status, checksum, bytes transferred)
         @rtype: C{tuple}
         """
@@ -443,7 +858,8 @@ class S3StorageDriver(StorageDriver):
         try:
             # Upload the data through the iterator
             result = self._upload_from_iterator(iterator, object_path,
-                                                upload_id, calculate_hash)
+                                                upload_id, calculate_hash,
+                                                concurrency=concurrency)
             (chunks, data_hash, bytes_transferred) = result
 
             # Commit the chunk info and complete the upload
@@ -461,9 +877,14 @@ class S3StorageDriver(StorageDriver):
         return (True, data_hash, bytes_transferred)
 
     def _upload_from_iterator(self, iterator, object_path, upload_id,
-                              calculate_hash=True):
+                              calculate_hash=True, concurrency=1):
         """
-        Uploads data from an interator in fixed sized chunks to S3
+        Uploads data from an interator in fixed sized chunks to S3.
+
+        If concurrency is greater than 1, the chunks are uploaded by a pool
+        of worker threads. The iterator is still consumed (and the hash
+        calculated) in order by the calling thread, and at most
+        2 * concurrency chunks are held in memory at any time.
 
         @param iterator: The generator for fetching the upload data
         @type iterator: C{generator}
@@ -477,6 +898,9 @@ class S3StorageDriver(StorageDriver):
         @keyword calculate_hash: Indicates if we must calculate the data hash
         @type calculate_hash: C{bool}
 
+        @keyword concurrency: Number of chunks to upload in parallel
+        @type concurrency: C{int}
+
         @return: A tuple of (chunk info, checksum, bytes transferred)
         @rtype: C{tuple}
         """
@@ -488,44 +912,69 @@ class S3StorageDriver(StorageDriver):
         bytes_transferred = 0
         count = 1
         chunks = []
-        params = {'uploadId': upload_id}
-
-        # Read the input data in chunk sizes suitable for AWS
-        for data in read_in_chunks(iterator, chunk_size=CHUNK_SIZE,
-                                   fill_size=True):
-            bytes_transferred += len(data)
-
-            if calculate_hash:
-                data_hash.update(data)
 
-            chunk_hash = self._get_hash_function()
-            chunk_hash.update(data)
-            chunk_hash = base64.b64encode(chunk_hash.digest()).decode('utf-8')
+        def upload_chunk(count, data):
+            server_hash = self._upload_chunk(object_path, upload_id,
+                                             count, data)
+            chunks.append((count, server_hash))
 
-            # This provides an extra level of data check and is recommended
-            # by amazon
-            headers = {'Content-MD5': chunk_hash}
-            params['partNumber'] = count
+        finish = None
 
-            request_path = '?'.join((object_path, urlencode(params)))
+        if concurrency > 1:
+            upload_chunk, finish = start_workers(
+                upload_chunk, concurrency,
+                buffer_size=2 * concurrency * CHUNK_SIZE,
+                get_size=lambda count, data: len(data))
 
-            resp = self.connection.request(request_path, method='PUT',
-                                           data=data, headers=headers)
+        try:
+            # Read the input data in chunk sizes suitable for AWS
+            for data in read_in_chunks(iterator, chunk_size=CHUNK_SIZE,
+                                       fill_size=True):
+                bytes_transferred += len(data)
 
-            if resp.status != httplib.OK:
-                raise LibcloudError('Error uploading chunk', driver=self)
+                if calculate_hash:
+                    data_hash.update(data)
 
-            server_hash = resp.headers['etag']
+                upload_chunk(count, data)
+                count += 1
+        finally:
+            if finish is not None:
+                finish()
 
-            # Keep this data for a later commit
-            chunks.append((count, server_hash))
-            count += 1
+        # Parts may complete out of order but they must be committed in order
+        chunks.sort()
 
         if calculate_hash:
             data_hash = data_hash.hexdigest()
 
         return (chunks, data_hash, bytes_transferred)
 
+    def _upload_chunk(self, object_path, upload_id, count, data):
+        """
+        Uploads a single part of a multipart upload.
+
+        @return: The server's ETag for the uploaded part.
+        @rtype: C{str}
+        """
+        chunk_hash = self._get_hash_function()
+        chunk_hash.update(data)
+        chunk_hash = base64.b64encode(chunk_hash.digest()).decode('utf-8')
+
+        # This provides an extra level of data check and is recommended
+        # by amazon
+        headers = {'Content-MD5': chunk_hash}
+        params = {'uploadId': upload_id, 'partNumber': count}
+
+        request_path = '?'.join((object_path, urlencode(params)))
+
+        resp = self.connection.request(request_path, method='PUT',
+                                       data=data, headers=headers)
+
+        if resp.status != httplib.OK:
+            raise LibcloudError('Error uploading chunk', driver=self)
+
+        return resp.headers['etag']
+
     def _commit_multipart(self, object_path, upload_id, chunks):
         """
         Makes a final commit of the data.
@@ -586,12 +1035,17 @@ class S3StorageDriver(StorageDriver):
                                 (resp.status), driver=self)
 
     def upload_object_via_stream(self, iterator, container, object_name,
-                                 extra=None, ex_storage_class=None):
+                                 extra=None, ex_storage_class=None,
+                                 ex_multipart_concurrency=None):
         """
         @inherits: L{StorageDriver.upload_object_via_stream}
 
         @param ex_storage_class: Storage class
         @type ex_storage_class: C{str}
+
+        @param ex_multipart_concurrency: Number of parts to upload in
+            parallel (defaults to multipart_concurrency).
+        @type ex_multipart_concurrency: C{int}
         """
 
         method = 'PUT'
@@ -603,9 +1057,12 @@ class S3StorageDriver(StorageDriver):
         if self.supports_s3_multipart_upload:
             # Initiate the multipart request and get an upload id
             upload_func = self._upload_multipart
-            upload_func_kwargs = {'iterator': iterator,
-                                  'container': container,
-                                  'object_name': object_name}
+            upload_func_kwargs = {
+                'iterator': iterator,
+                'container': container,
+                'object_name': object_name,
+                'concurrency': self._get_multipart_concurrency(
+                    ex_multipart_concurrency)}
             method = 'POST'
             iterator = iter('')
             params = 'uploads'
@@ -807,13 +1264,12 @@ class S3StorageDriver(StorageDriver):
                 obj.findall(fixxpath(xpath=xpath, namespace=self.namespace))]
 
     def _to_container(self, element):
+        values = self._container_fields.extract(element)
         extra = {
-            'creation_date': findtext(element=element, xpath='CreationDate',
-                                      namespace=self.namespace)
+            'creation_date': values['creation_date']
         }
 
-        container = Container(name=findtext(element=element, xpath='Name',
-                                            namespace=self.namespace),
+        container = Container(name=values['name'],
                               extra=extra,
                               driver=self
                               )
@@ -844,24 +1300,14 @@ class S3StorageDriver(StorageDriver):
         return obj
 
     def _to_obj(self, element, container):
-        owner_id = findtext(element=element, xpath='Owner/ID',
-                            namespace=self.namespace)
-        owner_display_name = findtext(element=element,
-                                      xpath='Owner/DisplayName',
-                                      namespace=self.namespace)
-        meta_data = {'owner': {'id': owner_id,
-                               'display_name': owner_display_name}}
-        last_modified = findtext(element=element,
-                                 xpath='LastModified',
-                                 namespace=self.namespace)
-        extra = {'last_modified': last_modified}
-
-        obj = Object(name=findtext(element=element, xpath='Key',
-                                   namespace=self.namespace),
-                     size=int(findtext(element=element, xpath='Size',
-                                       namespace=self.namespace)),
-                     hash=findtext(element=element, xpath='ETag',
-                                   namespace=self.namespace).replace('"', ''),
+        values = self._object_fields.extract(element)
+        meta_data = {'owner': {'id': values['owner_id'],
+                               'display_name': values['owner_display_name']}}
+        extra = {'last_modified': values['last_modified']}
+
+        obj = Object(name=values['name'],
+                     size=int(values['size']),
+                     hash=values['hash'].replace('"', ''),
                      extra=extra,
                      meta_data=meta_data,
                      container=container,
@@ -47,8 +47,46 @@ class CloudStackNodeDriverTest(unittest.TestCase, TestCaseMixin):
         self.driver.path = '/test/path'
         self.driver.type = -1
         CloudStackMockHttp.fixture_tag = 'default'
+        CloudStackMockHttp.max_page_size = None
         self.driver.connection.poll_interval = 0.0
 
+    def test_ex_iterate_nodes_paged(self):
+        expected = [node.id for node in self.driver.list_nodes()]
+        self.assertEqual(len(expected), 2)
+
+        nodes = list(self.driver.ex_iterate_nodes(ex_page_size=1))
+        self.assertEqual([node.id for node in nodes], expected)
+
+        nodes = list(self.driver.ex_iterate_nodes(ex_page_size=1,
+                                                  ex_concurrency=4))
+        self.assertEqual([node.id for node in nodes], expected)
+
+    def test_list_nodes_by_ids(self):
+        nodes = self.driver._list_nodes_by_ids([2601, 1234])
+        self.assertEqual([node.id for node in nodes], ['2601'])
+
+    def test_sync_request_pages(self):
+        connection = self.driver.connection
+
+        for page_size in [1, 2, 3, 100]:
+            for concurrency in [1, 2]:
+                addrs = connection._sync_request_pages(
+                    'listPublicIpAddresses', 'publicipaddress',
+                    page_size=page_size, concurrency=concurrency)
+                self.assertEqual([addr['id'] for addr in addrs],
+                                 [34000, 33999, 33998, 33970])
+
+    def test_sync_request_pages_server_page_size_cap(self):
+        connection = self.driver.connection
+        CloudStackMockHttp.max_page_size = 3
+
+        for concurrency in [1, 2]:
+            addrs = connection._sync_request_pages(
+                'listPublicIpAddresses', 'publicipaddress',
+                page_size=100, concurrency=concurrency)
+            self.assertEqual([addr['id'] for addr in addrs],
+                             [34000, 33999, 33998, 33970])
+
     def test_user_must_provide_host_and_path(self):
         expected_msg = 'When instantiating CloudStack driver directly ' + \
                        'you also need to provide host and path argument'
@@ -248,6 +286,7 @@ class CloudStackNodeDriverTest(unittest.TestCase, TestCaseMixin):
 class CloudStackMockHttp(MockHttpTestCase):
     fixtures = ComputeFileFixtures('cloudstack')
     fixture_tag = 'default'
+    max_page_size = None
 
     def _load_fixture(self, fixture):
         body = self.fixtures.load(fixture)
@@ -276,6 +315,44 @@ class CloudStackMockHttp(MockHttpTestCase):
             body, obj = self._load_fixture(fixture)
             return (httplib.OK, body, obj, httplib.responses[httplib.OK])
 
+    def _cmd_listVirtualMachines(self, id=None, **kwargs):
+        if id is not None:
+            fixture = 'listVirtualMachines_' + self.fixture_tag + '.json'
+            body, obj = self._load_fixture(fixture)
+            response = obj['listvirtualmachinesresponse']
+            response['virtualmachine'] = [vm for vm in
+                                          response['virtualmachine']
+                                          if str(vm['id']) == id]
+            body = json.dumps(obj)
+            return (httplib.OK, body, obj, httplib.responses[httplib.OK])
+
+        return self._paged_response('listVirtualMachines', 'virtualmachine',
+                                    **kwargs)
+
+    def _cmd_listPublicIpAddresses(self, **kwargs):
+        return self._paged_response('listPublicIpAddresses',
+                                    'publicipaddress', **kwargs)
+
+    def _paged_response(self, command, key, page=None, pagesize=None):
+        fixture = command + '_' + self.fixture_tag + '.json'
+        body, obj = self._load_fixture(fixture)
+
+        if page is not None:
+            response = obj[command.lower() + 'response']
+            items = response[key]
+            pagesize = int(pagesize)
+
+            # Server side default.page.size cap
+            if self.max_page_size is not None:
+                pagesize = min(pagesize, self.max_page_size)
+
+            start = (int(page) - 1) * pagesize
+            response[key] = items[start:start + pagesize]
+            response['count'] = len(items)
+            body = json.dumps(obj)
+
+        return (httplib.OK, body, obj, httplib.responses[httplib.OK])
+
     def _cmd_queryAsyncJobResult(self, jobid):
         fixture = 'queryAsyncJobResult' + '_' + str(jobid) + '.json'
         body, obj = self._load_fixture(fixture)
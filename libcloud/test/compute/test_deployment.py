@@ -54,6 +54,11 @@ class MockClient(BaseSSHClient):
     def put(self, path, contents, chmod=755, mode='w'):
         return contents
 
+    def put_many(self, files):
+        self.put_many_calls = getattr(self, 'put_many_calls', [])
+        self.put_many_calls.append(files)
+        return super(MockClient, self).put_many(files)
+
     def run(self, name):
         return self.stdout, self.stderr, self.exit_status
 
@@ -86,6 +91,26 @@ class DeploymentTests(unittest.TestCase):
 
         self.assertEqual(self.node, msd.run(node=self.node, client=None))
 
+    def test_multi_step_deployment_batches_file_steps(self):
+        target1 = os.path.join('/tmp', 'file1')
+        target2 = os.path.join('/tmp', 'file2')
+        target3 = os.path.join('/tmp', 'file3')
+
+        msd = MultiStepDeployment()
+        msd.add(FileDeployment(__file__, target1))
+        msd.add(FileDeployment(__file__, target2))
+        msd.add(ScriptDeployment(script='foobar', delete=False))
+        msd.add(FileDeployment(__file__, target3))
+
+        client = MockClient(hostname='localhost')
+        self.assertEqual(self.node, msd.run(node=self.node, client=client))
+
+        # Consecutive file steps are uploaded in a single batch, a single
+        # file step uses a regular put
+        self.assertEqual(len(client.put_many_calls), 1)
+        self.assertEqual([f['path'] for f in client.put_many_calls[0]],
+                         [target1, target2])
+
     def test_ssh_key_deployment(self):
         sshd = SSHKeyDeployment(key='1234')
 
@@ -250,6 +275,49 @@ class DeploymentTests(unittest.TestCase):
         self.assertEqual(['67.23.21.33'], nodes[0][1])
         self.assertEqual(['67.23.21.34'], nodes[1][1])
 
+    @patch('libcloud.compute.base.time.sleep')
+    def test_wait_until_running_polls_pending_nodes_with_backoff(self, sleep):
+        pending = Node(id=12345, name='test', state=NodeState.PENDING,
+                       public_ips=[], private_ips=[], driver=Rackspace)
+        pending2 = Node(id=123456, name='test', state=NodeState.PENDING,
+                        public_ips=[], private_ips=[], driver=Rackspace)
+        self.driver._list_nodes_by_ids = Mock()
+        self.driver._list_nodes_by_ids.side_effect = [
+            [pending, pending2], [pending, self.node2], [pending],
+            [self.node]]
+
+        nodes = self.driver.wait_until_running(nodes=[self.node, self.node2],
+                                               wait_period=2,
+                                               max_wait_period=6)
+        self.assertEqual([node.id for node, _ in nodes], ['12345', '123456'])
+        self.assertEqual(nodes[0][1], ['1.2.3.4'])
+
+        # Running nodes are not polled anymore
+        calls = self.driver._list_nodes_by_ids.call_args_list
+        self.assertEqual(sorted(calls[0][0][0]), ['12345', '123456'])
+        self.assertEqual(sorted(calls[1][0][0]), ['12345', '123456'])
+        self.assertEqual(calls[2][0][0], ['12345'])
+        self.assertEqual(calls[3][0][0], ['12345'])
+
+        delays = [args[0][0] for args in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+
+        for delay, max_delay in zip(delays, [2, 4, 6]):
+            self.assertTrue(max_delay / 2.0 <= delay <= max_delay)
+
+    @patch('libcloud.compute.base.time.sleep')
+    def test_wait_until_running_waits_for_ip_address(self, sleep):
+        no_address = Node(id=12345, name='test', state=NodeState.RUNNING,
+                          public_ips=[], private_ips=[], driver=Rackspace)
+        self.driver._list_nodes_by_ids = Mock()
+        self.driver._list_nodes_by_ids.side_effect = [[no_address],
+                                                      [self.node]]
+
+        nodes = self.driver.wait_until_running(nodes=[self.node],
+                                               wait_period=1)
+        self.assertEqual(nodes[0][1], ['1.2.3.4'])
+        self.assertEqual(self.driver._list_nodes_by_ids.call_count, 2)
+
     def test_ssh_client_connect_success(self):
         mock_ssh_client = Mock()
         mock_ssh_client.return_value = None
@@ -351,6 +419,58 @@ class DeploymentTests(unittest.TestCase):
         else:
             self.fail('Exception was not thrown')
 
+    @patch('libcloud.compute.base.SSHClient')
+    @patch('libcloud.compute.ssh')
+    def test_deploy_nodes(self, mock_ssh_module, _):
+        mock_ssh_module.have_paramiko = True
+        nodes = {}
+
+        def create_node(name, **kwargs):
+            if name == 'fail-create':
+                raise Exception('create failed')
+
+            node = Node(id=name, name=name, state=NodeState.RUNNING,
+                        public_ips=['1.2.3.4'], private_ips=[],
+                        driver=Rackspace)
+            nodes[name] = node
+            return node
+
+        def run(node, client):
+            if node.name == 'fail-deploy':
+                raise Exception('deploy failed')
+            return node
+
+        def list_nodes_by_ids(node_ids):
+            return [nodes[node_id] for node_id in node_ids
+                    if node_id != 'fail-timeout']
+
+        self.driver.create_node = Mock(side_effect=create_node)
+        self.driver._list_nodes_by_ids = Mock(side_effect=list_nodes_by_ids)
+        deploy = Mock()
+        deploy.run = Mock(side_effect=run)
+
+        names = ['ok-1', 'fail-create', 'fail-deploy', 'fail-timeout', 'ok-2']
+        results = self.driver.deploy_nodes(
+            node_kwargs=[{'name': name} for name in names],
+            deploy=deploy, max_tries=1, timeout=0.1, concurrency=2)
+
+        self.assertEqual(self.driver.create_node.call_count, 5)
+
+        # All the nodes are polled at once
+        node_ids = self.driver._list_nodes_by_ids.call_args_list[0][0][0]
+        self.assertEqual(sorted(node_ids),
+                         ['fail-deploy', 'fail-timeout', 'ok-1', 'ok-2'])
+        self.assertEqual(len(results), 5)
+
+        self.assertEqual(results[0].name, 'ok-1')
+        self.assertEqual(str(results[1]), 'create failed')
+        self.assertTrue(isinstance(results[2], DeploymentError))
+        self.assertEqual(results[2].node.name, 'fail-deploy')
+        self.assertTrue(isinstance(results[3], DeploymentError))
+        self.assertEqual(results[3].node.name, 'fail-timeout')
+        self.assertTrue(results[3].value.value.find('Timed out') != -1)
+        self.assertEqual(results[4].name, 'ok-2')
+
     @patch('libcloud.compute.ssh')
     def test_deploy_node_depoy_node_not_implemented(self, mock_ssh_module):
         self.driver.features = {'create_node': []}
@@ -144,6 +144,32 @@ class EC2Tests(LibcloudTestCase, TestCaseMixin):
         self.assertEqual(node.id, 'i-8474834a')
         self.assertEqual(node.name, 'foobar1')
 
+    def test_ex_iterate_nodes_pagination(self):
+        EC2MockHttp.type = 'paginated'
+        nodes = list(self.driver.ex_iterate_nodes(ex_page_size=5))
+        self.assertEqual([node.id for node in nodes],
+                         ['i-4382922a', 'i-8474834a', 'i-4382922b'])
+
+    def test_ex_iterate_nodes_without_elastic_ips(self):
+        EC2MockHttp.type = 'paginated'
+        nodes = list(self.driver.ex_iterate_nodes(ex_page_size=5,
+                                                  ex_elastic_ips=False))
+        self.assertEqual(nodes[0].public_ips, ['1.2.3.5'])
+
+    def test_list_nodes_with_filters(self):
+        EC2MockHttp.type = 'filters'
+        nodes = self.driver.list_nodes(ex_filters={
+            'instance-state-name': ['pending', 'running'],
+            'tag:Name': 'foobar1'})
+        self.assertEqual(len(nodes), 1)
+        self.assertEqual(nodes[0].name, 'foobar1')
+
+    def test_list_nodes_by_ids(self):
+        EC2MockHttp.type = 'by_ids'
+        nodes = self.driver._list_nodes_by_ids(['i-4382922a', 'i-8474834a'])
+        self.assertEqual([node.id for node in nodes],
+                         ['i-4382922a', 'i-8474834a'])
+
     def test_list_location(self):
         locations = self.driver.list_locations()
         self.assertTrue(len(locations) > 0)
@@ -244,6 +270,13 @@ class EC2Tests(LibcloudTestCase, TestCaseMixin):
                     'ec2-public-images/fedora-8-i386-base-v1.04.manifest.xml')
         self.assertEqual(image.id, 'ami-be3adfd7')
 
+    def test_list_images_with_filters(self):
+        EC2MockHttp.type = 'filters'
+        images = list(self.driver.ex_iterate_images(
+            ex_filters={'architecture': 'i386'}, ex_page_size=100))
+        self.assertEqual(len(images), 1)
+        self.assertEqual(images[0].id, 'ami-be3adfd7')
+
     def test_list_images_with_image_ids(self):
         images = self.driver.list_images(ex_image_ids=['ami-be3adfd7'])
         self.assertEqual(len(images), 1)
@@ -405,6 +438,56 @@ class EC2MockHttp(MockHttpTestCase):
         body = self.fixtures.load('describe_instances_with_tags.xml')
         return (httplib.OK, body, {}, httplib.responses[httplib.OK])
 
+    def _paginated_DescribeInstances(self, method, url, body, headers):
+        params = dict(parse_qsl(url[2:]))
+        self.assertEqual(params.get('MaxResults'), '5')
+
+        if 'NextToken' not in params:
+            body = self.fixtures.load('describe_instances_paginated_1.xml')
+        else:
+            self.assertEqual(params['NextToken'], 'page-2')
+            body = self.fixtures.load('describe_instances_paginated_2.xml')
+
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+    def _paginated_DescribeAddresses(self, method, url, body, headers):
+        # Addresses are retrieved for the nodes on a single page
+        params = dict(parse_qsl(url[2:]))
+        self.assertEqual(params['Filter.0.Name'], 'instance-id')
+        self.assertTrue('Filter.0.Value.0' in params)
+        self.assertFalse('Filter.0.Value.2' in params)
+        return self._DescribeAddresses(method, url, body, headers)
+
+    def _filters_DescribeInstances(self, method, url, body, headers):
+        params = dict(parse_qsl(url[2:]))
+        self.assertEqual(params['Filter.1.Name'], 'instance-state-name')
+        self.assertEqual(params['Filter.1.Value.1'], 'pending')
+        self.assertEqual(params['Filter.1.Value.2'], 'running')
+        self.assertEqual(params['Filter.2.Name'], 'tag:Name')
+        self.assertEqual(params['Filter.2.Value.1'], 'foobar1')
+        return self._WITH_TAGS_DescribeInstances(method, url, body, headers)
+
+    def _by_ids_DescribeInstances(self, method, url, body, headers):
+        params = dict(parse_qsl(url[2:]))
+        self.assertEqual(params['Filter.1.Name'], 'instance-id')
+        self.assertEqual(params['Filter.1.Value.1'], 'i-4382922a')
+        self.assertEqual(params['Filter.1.Value.2'], 'i-8474834a')
+        self.assertFalse('InstanceId.1' in params)
+        return self._DescribeInstances(method, url, body, headers)
+
+    def _by_ids_DescribeAddresses(self, method, url, body, headers):
+        return self._DescribeAddresses(method, url, body, headers)
+
+    def _filters_DescribeAddresses(self, method, url, body, headers):
+        return self._DescribeAddresses(method, url, body, headers)
+
+    def _filters_DescribeImages(self, method, url, body, headers):
+        params = dict(parse_qsl(url[2:]))
+        self.assertEqual(params['Filter.1.Name'], 'architecture')
+        self.assertEqual(params['Filter.1.Value.1'], 'i386')
+        self.assertEqual(params['MaxResults'], '100')
+        return self._DescribeImages(method, url, body, headers)
+
     def _DescribeAvailabilityZones(self, method, url, body, headers):
         body = self.fixtures.load('describe_availability_zones.xml')
         return (httplib.OK, body, {}, httplib.responses[httplib.OK])
@@ -576,6 +659,11 @@ class NimbusTests(EC2Tests):
         self.assertEqual(len(nodes_elastic_ips), 1)
         self.assertEqual(len(nodes_elastic_ips[node.id]), 0)
 
+    def test_list_nodes_by_ids(self):
+        # overridden from EC2Tests -- filters are not used with Nimbus.
+        nodes = self.driver._list_nodes_by_ids(['i-8474834a', 'i-1234'])
+        self.assertEqual([node.id for node in nodes], ['i-8474834a'])
+
     def test_list_sizes(self):
         sizes = self.driver.list_sizes()
 
@@ -13,7 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
+import time
+import shutil
+import tempfile
 import unittest
 import datetime
 
@@ -32,7 +36,11 @@ from libcloud.common.types import InvalidCredsError, MalformedResponseError, \
                                   LibcloudError
 from libcloud.common.openstack import OpenStackBaseConnection
 from libcloud.common.openstack import OpenStackAuthConnection
+from libcloud.common.openstack import OpenStackServiceCatalog
 from libcloud.common.openstack import AUTH_TOKEN_EXPIRES_GRACE_SECONDS
+from libcloud.common.openstack import AUTH_TOKEN_REFRESH_SECONDS
+from libcloud.common.openstack import OpenStackMemoryAuthCache
+from libcloud.common.openstack import OpenStackFileAuthCache
 from libcloud.compute.types import Provider
 from libcloud.compute.providers import get_driver
 from libcloud.compute.drivers.openstack import (
@@ -100,6 +108,36 @@ class OpenStackServiceCatalogTests(unittest.TestCase):
         self.assertEqual(len(endpoints), len(expected_urls))
         self.assertEqual(public_urls, expected_urls)
 
+    def test_get_endpoint_auth_2_0(self):
+        fixtures = OpenStackFixtures()
+        body = json.loads(fixtures.load('_v2_0__auth.json'))
+        catalog = OpenStackServiceCatalog(body['access']['serviceCatalog'],
+                                          ex_force_auth_version='2.0')
+
+        endpoint = catalog.get_endpoint(service_type='compute',
+                                        name='cloudServersOpenStack',
+                                        region='ORD')
+        self.assertEqual(endpoint['publicURL'],
+                         'https://ord.servers.api.rackspacecloud.com/v2/1337')
+
+        endpoint = catalog.get_endpoint(service_type='compute',
+                                        name='cloudServers')
+        self.assertEqual(endpoint['publicURL'],
+                         'https://servers.api.rackspacecloud.com/v1.0/1337')
+
+        self.assertEqual(catalog.get_endpoint(service_type='compute',
+                                              name='cloudServersOpenStack',
+                                              region='LON'), {})
+        self.assertEqual(catalog.get_endpoint(service_type='object-store',
+                                              name='cloudServers'), {})
+
+        endpoints = catalog.get_endpoints(service_type='compute',
+                                          name='cloudServersOpenStack')
+        self.assertEqual(sorted([ep['region'] for ep in endpoints]),
+                         ['DFW', 'ORD'])
+        self.assertEqual(catalog.get_endpoints(service_type='compute',
+                                               name='unknown'), [])
+
 
 class OpenStackAuthConnectionTests(unittest.TestCase):
     # TODO refactor and move into libcloud/test/common
@@ -759,6 +797,26 @@ class OpenStack_1_1_Tests(unittest.TestCase, TestCaseMixin):
         self.assertEqual(self.driver.connection.port, '1555')
         self.assertEqual(self.driver.connection.request_path, '/service_url')
 
+    def test_endpoint_is_resolved_once_per_auth_token(self):
+        connection = self.driver.connection
+        connection.get_endpoint = Mock(wraps=connection.get_endpoint)
+        connection.auth_token = None
+        connection._populate_hosts_and_request_paths()
+
+        self.driver.list_nodes()
+        self.driver.list_sizes()
+        self.assertEqual(connection.get_endpoint.call_count, 1)
+
+        expected = connection._tuple_from_url(connection.get_endpoint())
+        self.assertEqual((connection.host, connection.port,
+                          connection.secure, connection.request_path),
+                         expected)
+
+        # New token (and service catalog), endpoint is resolved again
+        connection.auth_token = None
+        connection._populate_hosts_and_request_paths()
+        self.assertEqual(connection.get_endpoint.call_count, 3)
+
     def test_set_auth_token_populates_host_port_and_request_path(self):
         # change base url and trash the current auth token so we can re-authenticate
         self.driver.connection._ex_force_base_url = 'http://some_other_ex_force_base_url.com:1222/some-service'
@@ -975,6 +1033,10 @@ class OpenStack_1_1_Tests(unittest.TestCase, TestCaseMixin):
         self.assertEqual(node.id, '12064')
         self.assertEqual(node.name, 'lc-test')
 
+    def test_list_nodes_by_ids(self):
+        nodes = self.driver._list_nodes_by_ids(['12064'])
+        self.assertEqual([node.id for node in nodes], ['12064'])
+
     def test_ex_get_size(self):
         size_id = '7'
         size = self.driver.ex_get_size(size_id)
@@ -1330,5 +1392,148 @@ class OpenStack_1_1_Auth_2_0_Tests(OpenStack_1_1_Tests):
                         'name': 'identity:default'}]})
 
 
+class OpenStackAuthCacheTests(unittest.TestCase):
+    driver_klass = OpenStack_1_1_NodeDriver
+
+    def setUp(self):
+        self.driver_klass.connectionCls.conn_classes = \
+            (OpenStack_2_0_MockHttp, OpenStack_2_0_MockHttp)
+        self.driver_klass.connectionCls.auth_url = \
+            "https://auth.api.example.com/v2.0/"
+        OpenStack_2_0_MockHttp.type = None
+
+        # Auth info as returned by the fixture, used to pre-fill the caches
+        driver = self.driver_klass(*OPENSTACK_PARAMS,
+                                   **{'ex_force_auth_version': '2.0'})
+        self.auth_info = driver.connection._get_auth_info()
+        self.tempdir = None
+
+    def tearDown(self):
+        if self.tempdir:
+            shutil.rmtree(self.tempdir)
+
+    def _get_driver(self, cache):
+        driver = self.driver_klass(*OPENSTACK_PARAMS,
+                                   **{'ex_force_auth_version': '2.0',
+                                      'ex_auth_cache': cache})
+        driver.connection._get_auth_info = Mock(
+            wraps=driver.connection._get_auth_info)
+        return driver
+
+    def _get_info(self, expires_in, token='cached-token'):
+        expires = datetime.datetime.utcnow() + \
+            datetime.timedelta(seconds=expires_in)
+        info = dict(self.auth_info)
+        info['auth_token'] = token
+        info['auth_token_expires'] = expires.isoformat() + 'Z'
+        return info
+
+    def test_cached_token_is_used(self):
+        cache = OpenStackMemoryAuthCache()
+        driver = self._get_driver(cache)
+        key = driver.connection._get_auth_cache_key()
+        cache.put(key, self._get_info(3600))
+
+        driver.connection._populate_hosts_and_request_paths()
+
+        self.assertEqual(driver.connection.auth_token, 'cached-token')
+        self.assertEqual(driver.connection._get_auth_info.call_count, 0)
+        self.assertEqual(len(driver.list_nodes()), 2)
+
+    def test_cache_is_shared_between_connections(self):
+        cache = OpenStackMemoryAuthCache()
+        driver1 = self._get_driver(cache)
+        driver2 = self._get_driver(cache)
+        key = driver1.connection._get_auth_cache_key()
+        self.assertEqual(key, driver2.connection._get_auth_cache_key())
+
+        # Token from the fixture has already expired so it's always
+        # refreshed
+        driver1.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver1.connection._get_auth_info.call_count, 1)
+        self.assertEqual(cache.get(key)['auth_token'],
+                         'aaaaaaaaaaaa-bbb-cccccccccccccc')
+
+        cache.put(key, self._get_info(3600))
+        driver2.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver2.connection.auth_token, 'cached-token')
+        self.assertEqual(driver2.connection._get_auth_info.call_count, 0)
+
+    def test_token_is_refreshed_before_it_expires(self):
+        cache = OpenStackMemoryAuthCache()
+        driver = self._get_driver(cache)
+        key = driver.connection._get_auth_cache_key()
+        cache.put(key, self._get_info(AUTH_TOKEN_REFRESH_SECONDS - 10))
+
+        driver.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver.connection._get_auth_info.call_count, 1)
+        self.assertEqual(driver.connection.auth_token,
+                         'aaaaaaaaaaaa-bbb-cccccccccccccc')
+
+        # Refreshed token is stored in the cache and used by the connection
+        # until it needs to be refreshed again
+        cache.put(key, self._get_info(3600, token='refreshed-token'))
+        driver.connection._auth_refresh_at = time.time() - 1
+        driver.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver.connection._get_auth_info.call_count, 1)
+        self.assertEqual(driver.connection.auth_token, 'refreshed-token')
+
+        driver.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver.connection._get_auth_info.call_count, 1)
+
+    def test_usable_token_is_used_while_other_connection_refreshes(self):
+        cache = OpenStackMemoryAuthCache()
+        driver = self._get_driver(cache)
+        key = driver.connection._get_auth_cache_key()
+        cache.put(key, self._get_info(AUTH_TOKEN_REFRESH_SECONDS - 10))
+
+        lock = cache.get_lock(key)
+        lock.acquire()
+
+        try:
+            driver.connection._populate_hosts_and_request_paths()
+        finally:
+            lock.release()
+
+        self.assertEqual(driver.connection.auth_token, 'cached-token')
+        self.assertEqual(driver.connection._get_auth_info.call_count, 0)
+
+    def test_file_cache(self):
+        self.tempdir = tempfile.mkdtemp()
+        path = os.path.join(self.tempdir, 'auth')
+        cache = OpenStackFileAuthCache(path)
+        info = self._get_info(3600)
+
+        self.assertEqual(cache.get('key'), None)
+        cache.put('key', info)
+        cache.put('key', info)
+        self.assertEqual(cache.get('key'), info)
+        self.assertEqual(os.stat(path).st_mode & 0x1ff, 0x1c0)
+
+        # Other cache instance (e.g. in another process)
+        lock1 = cache.get_lock('key')
+        lock2 = OpenStackFileAuthCache(path).get_lock('key')
+        self.assertTrue(lock1.acquire(False))
+
+        try:
+            self.assertFalse(lock2.acquire(False))
+        finally:
+            lock1.release()
+
+        self.assertTrue(lock2.acquire(False))
+        lock2.release()
+
+    def test_file_cache_is_used_by_connection(self):
+        self.tempdir = tempfile.mkdtemp()
+        cache = OpenStackFileAuthCache(self.tempdir)
+        driver = self._get_driver(cache)
+        key = driver.connection._get_auth_cache_key()
+        cache.put(key, self._get_info(3600))
+
+        driver.connection._populate_hosts_and_request_paths()
+        self.assertEqual(driver.connection.auth_token, 'cached-token')
+        self.assertEqual(driver.connection._get_auth_info.call_count, 0)
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
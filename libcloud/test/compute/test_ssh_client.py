@@ -107,9 +107,9 @@ class ParamikoSSHClientTests(unittest.TestCase):
 
         mock.put(sd)
         # Make assertions over 'put' method
-        mock_cli.open_sftp().chdir.assert_called_with('root')
-        mock_cli.open_sftp().file.assert_called_once_with('random_script.sh',
-                                                          mode='w')
+        mock_cli.open_sftp().mkdir.assert_called_once_with('/root')
+        mock_cli.open_sftp().file.assert_called_once_with(
+            '/root/random_script.sh', mode='w')
 
         mock.run(sd)
         # Make assertions over 'run' method
@@ -134,6 +134,71 @@ class ParamikoSSHClientTests(unittest.TestCase):
 
         mock.close()
 
+    def test_sftp_session_is_reused(self):
+        mock = self.ssh_cli
+        mock.connect()
+        sftp = mock.client.open_sftp.return_value
+        sftp.normalize.return_value = '/home/ubuntu'
+
+        path1 = mock.put('scripts/a.sh', contents='a', chmod=493)
+        path2 = mock.put('scripts/b.sh', contents='b')
+        paths = mock.put_many([{'path': '/etc/app/a.conf', 'contents': 'c'},
+                               {'path': '/etc/app/b.conf', 'contents': 'd'}])
+        mock.delete(path1)
+
+        self.assertEqual(path1, '/home/ubuntu/scripts/a.sh')
+        self.assertEqual(path2, '/home/ubuntu/scripts/b.sh')
+        self.assertEqual(paths, ['/etc/app/a.conf', '/etc/app/b.conf'])
+        self.assertEqual(mock.client.open_sftp.call_count, 1)
+
+        # Every directory is only created once
+        mkdirs = [args[0][0] for args in sftp.mkdir.call_args_list]
+        self.assertEqual(mkdirs, ['/home/ubuntu/scripts', '/etc',
+                                  '/etc/app'])
+
+        sftp.file.return_value.set_pipelined.assert_called_with(True)
+        sftp.unlink.assert_called_once_with('/home/ubuntu/scripts/a.sh')
+
+        mock.close()
+        sftp.close.assert_called_once_with()
+        self.assertEqual(mock.sftp, None)
+
+    def test_put_many_writes_before_closing(self):
+        mock = self.ssh_cli
+        mock.connect()
+        sftp = mock.client.open_sftp.return_value
+        sftp.normalize.return_value = '/home/ubuntu'
+
+        calls = []
+        files = {}
+
+        def open_file(path, mode):
+            remote_file = Mock()
+            remote_file.write.side_effect = \
+                lambda contents: calls.append(('write', path))
+            remote_file.chmod.side_effect = \
+                lambda chmod: calls.append(('chmod', path))
+            remote_file.close.side_effect = \
+                lambda: calls.append(('close', path))
+            files[path] = remote_file
+            return remote_file
+
+        sftp.file.side_effect = open_file
+
+        paths = mock.put_many([{'path': 'a.sh', 'contents': 'a',
+                                'chmod': 493},
+                               {'path': 'b.sh', 'contents': 'b'}])
+
+        self.assertEqual(paths, ['/home/ubuntu/a.sh', '/home/ubuntu/b.sh'])
+        self.assertEqual(calls, [('write', '/home/ubuntu/a.sh'),
+                                 ('write', '/home/ubuntu/b.sh'),
+                                 ('chmod', '/home/ubuntu/a.sh'),
+                                 ('close', '/home/ubuntu/a.sh'),
+                                 ('close', '/home/ubuntu/b.sh')])
+
+        # Home directory is never created
+        self.assertEqual(sftp.mkdir.call_count, 0)
+
 
 if not ParamikoSSHClient:
     class ParamikoSSHClientTests(unittest.TestCase):
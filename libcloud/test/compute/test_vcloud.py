@@ -242,6 +242,42 @@ class VCloud_1_5_Tests(unittest.TestCase, TestCaseMixin):
     def test_ex_list_nodes(self):
         self.assertEqual(len(self.driver.ex_list_nodes()), len(self.driver.list_nodes()))
 
+    def test_ex_list_nodes_conditional_get(self):
+        nodes = self.driver.ex_list_nodes(ex_concurrency=2)
+        path = '/api/vApp/vapp-8c57a5b6-e61b-48ca-8a78-3b70ee65ef6a'
+        etag, last_modified, elm = self.driver._document_cache[path]
+        self.assertEqual(etag, '"vapp-etag"')
+
+        # Unchanged vApp is not downloaded again
+        cached_nodes = self.driver.ex_list_nodes(ex_concurrency=2)
+        self.assertTrue(self.driver._document_cache[path][2] is elm)
+        self.assertEqual([n.id for n in nodes], [n.id for n in cached_nodes])
+        self.assertEqual(nodes[0].name, cached_nodes[0].name)
+        self.assertEqual(nodes[0].state, cached_nodes[0].state)
+
+        # Documents without validators are not cached
+        self.assertEqual(list(self.driver._document_cache.keys()), [path])
+
+    def test_document_cache_is_bounded(self):
+        self.driver.document_cache_max_size = 2
+        self.driver._init_document_cache()
+
+        for path in ['/a', '/b', '/c']:
+            self.driver._cache_document(path, (None, None, path))
+            # '/a' is the most recently used document
+            self.driver._get_cached_document('/a')
+
+        self.assertEqual(sorted(self.driver._document_cache.keys()),
+                         ['/a', '/c'])
+
+    def test_destroy_node_removes_cached_document(self):
+        node = self.driver.list_nodes()[0]
+        path = '/api/vApp/vapp-8c57a5b6-e61b-48ca-8a78-3b70ee65ef6a'
+        self.assertTrue(path in self.driver._document_cache)
+
+        self.driver.destroy_node(node)
+        self.assertFalse(path in self.driver._document_cache)
+
     def test_ex_list_nodes__masked_exception(self):
         """
         Test that we don't mask other exceptions.
@@ -477,7 +513,11 @@ class VCloud_1_5_MockHttp(MockHttp, unittest.TestCase):
     def _api_vApp_vapp_8c57a5b6_e61b_48ca_8a78_3b70ee65ef6a(self, method, url, body, headers):
         status = httplib.OK
         if method == 'GET':
+            if headers.get('If-None-Match') == '"vapp-etag"':
+                return (httplib.NOT_MODIFIED, '', {'etag': '"vapp-etag"'},
+                        httplib.responses[httplib.NOT_MODIFIED])
             body = self.fixtures.load('api_vApp_vapp_8c57a5b6_e61b_48ca_8a78_3b70ee65ef6a.xml')
+            headers = {'etag': '"vapp-etag"'}
             status = httplib.OK
         elif method == 'DELETE':
             body = self.fixtures.load('api_task_b034df55_fe81_4798_bc81_1f0fd0ead450.xml')
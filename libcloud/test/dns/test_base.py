@@ -0,0 +1,129 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+import unittest
+
+from libcloud.common.types import LibcloudError
+from libcloud.dns.base import DNSDriver, Zone, Record
+from libcloud.dns.types import RecordType
+
+
+class RecordingDNSDriver(DNSDriver):
+    """
+    Driver which keeps the records in memory and records the calls.
+    """
+
+    name = 'Recording DNS Provider'
+
+    def __init__(self, records):
+        super(RecordingDNSDriver, self).__init__(key='key')
+        self.zone = Zone(id='1', domain='example.com', type='master',
+                         ttl=None, driver=self)
+        self.records = [Record(id=str(index), name=name, type=type,
+                               data=data, zone=self.zone, driver=self,
+                               extra=extra)
+                        for index, (name, type, data, extra) in
+                        enumerate(records)]
+        self.calls = []
+        self.fail_on = None
+        self._lock = threading.Lock()
+
+    def list_records(self, zone):
+        return list(self.records)
+
+    def create_record(self, name, zone, type, data, extra=None):
+        self._call('create', name, data)
+
+    def update_record(self, record, name, type, data, extra):
+        self._call('update', record.id, data)
+
+    def delete_record(self, record):
+        self._call('delete', record.id, record.data)
+
+    def _call(self, *args):
+        with self._lock:
+            self.calls.append(args)
+
+        if args[2] == self.fail_on:
+            raise LibcloudError('Failed', driver=self)
+
+
+class DNSDriverSyncRecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.driver = RecordingDNSDriver([
+            ('', RecordType.NS, 'ns1.example.com', {}),
+            ('www', RecordType.A, '10.0.0.1', {'ttl': '300'}),
+            ('www', RecordType.A, '10.0.0.2', {'ttl': '300'}),
+            ('mail', RecordType.A, '10.0.0.3', {'ttl': '300'}),
+            ('old', RecordType.CNAME, 'www.example.com', {'ttl': '300'})
+        ])
+        self.zone = self.driver.zone
+
+    def test_sync_records_minimal_changes(self):
+        changes = self.driver.sync_records(zone=self.zone, records=[
+            ('www', RecordType.A, '10.0.0.1', {'ttl': 300}),
+            ('www', RecordType.A, '10.0.0.4'),
+            ('mail', RecordType.A, '10.0.0.3', {'ttl': 60}),
+            ('new', RecordType.A, '10.0.0.5')
+        ])
+
+        self.assertEqual([(action, record and record.id, data) for
+                          action, record, _, _, data, _ in changes],
+                         [('DELETE', '4', 'www.example.com'),
+                          ('UPDATE', '2', '10.0.0.4'),
+                          ('UPDATE', '3', '10.0.0.3'),
+                          ('CREATE', None, '10.0.0.5')])
+        self.assertEqual(sorted(self.driver.calls),
+                         [('create', 'new', '10.0.0.5'),
+                          ('delete', '4', 'www.example.com'),
+                          ('update', '2', '10.0.0.4'),
+                          ('update', '3', '10.0.0.3')])
+
+    def test_sync_records_without_delete(self):
+        changes = self.driver.sync_records(zone=self.zone, records=[
+            ('www', RecordType.A, '10.0.0.1')
+        ], delete=False)
+        self.assertEqual(changes, [])
+
+    def test_sync_records_dry_run(self):
+        changes = self.driver.sync_records(zone=self.zone, records=[],
+                                           dry_run=True)
+        self.assertEqual(len(changes), 4)
+        self.assertEqual(self.driver.calls, [])
+
+    def test_sync_records_error(self):
+        self.driver.fail_on = '10.0.0.2'
+
+        try:
+            self.driver.sync_records(zone=self.zone, records=[
+                ('www', RecordType.A, '10.0.0.1'),
+                ('mail', RecordType.A, '10.0.0.3'),
+                ('new', RecordType.A, '10.0.0.5')
+            ], concurrency=2)
+        except LibcloudError:
+            pass
+        else:
+            self.fail('Exception was not thrown')
+
+        # Creations are not attempted after a failed deletion
+        self.assertTrue(('delete', '2', '10.0.0.2') in self.driver.calls)
+        self.assertEqual([call for call in self.driver.calls
+                          if call[0] != 'delete'], [])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -16,11 +16,16 @@
 import sys
 import unittest
 
+from xml.etree import ElementTree as ET
+
 from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import urlparse
+from libcloud.utils.py3 import parse_qs
 
 from libcloud.dns.types import RecordType, ZoneDoesNotExistError
 from libcloud.dns.types import RecordDoesNotExistError
-from libcloud.dns.drivers.route53 import Route53DNSDriver
+from libcloud.dns.drivers.route53 import Route53DNSDriver, NAMESPACE
+from libcloud.dns.drivers.route53 import MAX_CHANGES_PER_BATCH
 from libcloud.test import MockHttp
 from libcloud.test.file_fixtures import DNSFileFixtures
 from libcloud.test.secrets import DNS_PARAMS_ROUTE53
@@ -31,6 +36,7 @@ class Route53Tests(unittest.TestCase):
         Route53DNSDriver.connectionCls.conn_classes = (
             Route53MockHttp, Route53MockHttp)
         Route53MockHttp.type = None
+        Route53MockHttp.changesets = []
         self.driver = Route53DNSDriver(*DNS_PARAMS_ROUTE53)
 
     def test_list_record_types(self):
@@ -58,6 +64,15 @@ class Route53Tests(unittest.TestCase):
         self.assertEqual(record.type, RecordType.A)
         self.assertEqual(record.data, '208.111.35.173')
 
+    def test_iterate_records_paginated(self):
+        zone = self.driver.list_zones()[0]
+        Route53MockHttp.type = 'PAGINATED'
+        records = list(self.driver.iterate_records(zone=zone))
+
+        self.assertEqual([record.id for record in records],
+                         ['CNAME:wibble', 'A:www', 'A:blahblah'])
+        self.assertEqual(records[2].data, '208.111.35.174')
+
     def test_get_zone(self):
         zone = self.driver.get_zone(zone_id='47234')
         self.assertEqual(zone.id, '47234')
@@ -157,6 +172,77 @@ class Route53Tests(unittest.TestCase):
         self.assertEqual(updated_record.type, RecordType.A)
         self.assertEqual(updated_record.data, '::1')
 
+    def test_change_batch(self):
+        zone = self.driver.list_zones()[0]
+        record = self.driver.list_records(zone=zone)[1]
+        Route53MockHttp.type = 'BATCH'
+
+        with self.driver.ex_create_change_batch(zone=zone) as batch:
+            created = batch.create_record(name='test', type=RecordType.A,
+                                          data='127.0.0.1',
+                                          extra={'ttl': 300})
+            updated = batch.update_record(record=record, name='www',
+                                          type=RecordType.A,
+                                          data='127.0.0.2',
+                                          extra={'ttl': 300})
+            batch.delete_record(record=created)
+            self.assertEqual(len(batch), 3)
+            self.assertEqual(Route53MockHttp.changesets, [])
+
+        self.assertEqual(created.id, 'A:test')
+        self.assertEqual(updated.data, '127.0.0.2')
+        self.assertEqual(Route53MockHttp.changesets,
+                         [['CREATE', 'DELETE', 'CREATE', 'DELETE']])
+
+    def test_change_batch_is_split(self):
+        zone = self.driver.list_zones()[0]
+        record = self.driver.list_records(zone=zone)[1]
+        Route53MockHttp.type = 'BATCH'
+
+        batch = self.driver.ex_create_change_batch(zone=zone)
+        for index in range(MAX_CHANGES_PER_BATCH - 1):
+            batch.create_record(name='test%d' % (index), type=RecordType.A,
+                                data='127.0.0.1', extra={'ttl': 300})
+
+        # DELETE and CREATE of an update are never split
+        batch.update_record(record=record, name='www', type=RecordType.A,
+                            data='127.0.0.2', extra={'ttl': 300})
+
+        self.assertEqual(batch.commit(), 2)
+        self.assertEqual([len(changes) for changes in
+                          Route53MockHttp.changesets],
+                         [MAX_CHANGES_PER_BATCH - 1, 2])
+        self.assertEqual(len(batch), 0)
+
+    def test_change_batch_discarded_on_error(self):
+        zone = self.driver.list_zones()[0]
+        Route53MockHttp.type = 'BATCH'
+
+        try:
+            with self.driver.ex_create_change_batch(zone=zone) as batch:
+                batch.create_record(name='test', type=RecordType.A,
+                                    data='127.0.0.1', extra={'ttl': 300})
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(Route53MockHttp.changesets, [])
+
+    def test_sync_records_uses_change_batch(self):
+        zone = self.driver.list_zones()[0]
+        Route53MockHttp.type = 'BATCH'
+
+        changes = self.driver.sync_records(zone=zone, records=[
+            ('wibble', RecordType.CNAME, 't.com'),
+            ('www', RecordType.A, '208.111.35.174'),
+            ('test', RecordType.A, '127.0.0.1', {'ttl': 300})
+        ])
+
+        self.assertEqual([change[0] for change in changes],
+                         ['DELETE', 'UPDATE', 'CREATE'])
+        self.assertEqual(Route53MockHttp.changesets,
+                         [['DELETE', 'DELETE', 'CREATE', 'CREATE']])
+
     def test_delete_zone(self):
         zone = self.driver.list_zones()[0]
         status = self.driver.delete_zone(zone=zone)
@@ -219,6 +305,39 @@ class Route53MockHttp(MockHttp):
         return (httplib.NOT_FOUND, body,
                 {}, httplib.responses[httplib.NOT_FOUND])
 
+    def _2012_02_29_hostedzone_47234_rrset_PAGINATED(self, method, url, body,
+                                                    headers):
+        params = parse_qs(urlparse.urlparse(url).query)
+
+        if params.get('name') == ['blahblah.t.com'] and \
+                params.get('type') == ['A']:
+            body = self.fixtures.load('list_records_paginated_2.xml')
+        elif not params:
+            body = self.fixtures.load('list_records_paginated_1.xml')
+        else:
+            raise ValueError('Unexpected pagination parameters')
+
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+    def _2012_02_29_hostedzone_47234_rrset_BATCH(self, method, url, body,
+                                                headers):
+        if method == 'GET':
+            body = self.fixtures.load('list_records.xml')
+            return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+        actions = ET.XML(body).findall(
+            './/{%s}Change/{%s}Action' % (NAMESPACE, NAMESPACE))
+        self.changesets.append([action.text for action in actions])
+
+        body = self.fixtures.load('list_records.xml')
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+    def _2012_02_29_hostedzone_47234_BATCH(self, method, url, body, headers):
+        body = self.fixtures.load('get_zone.xml')
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+    _2012_02_29_hostedzone_47234_PAGINATED = _2012_02_29_hostedzone_47234_BATCH
+
     def _2012_02_29_hostedzone_4444_ZONE_DOES_NOT_EXIST(self, method,
                                               url, body, headers):
         body = self.fixtures.load('zone_does_not_exist.xml')
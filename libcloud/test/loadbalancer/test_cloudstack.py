@@ -84,6 +84,15 @@ class CloudStackLBTests(unittest.TestCase):
             self.assertTrue(isinstance(member, Member))
             self.assertEquals(member.balancer, balancer)
 
+    def test_ex_iterate_balancers(self):
+        expected = [balancer.id for balancer in self.driver.list_balancers()]
+
+        for concurrency in [1, 2]:
+            balancers = self.driver.ex_iterate_balancers(
+                ex_page_size=1, ex_concurrency=concurrency)
+            self.assertEqual([balancer.id for balancer in balancers],
+                             expected)
+
 class CloudStackMockHttp(MockHttpTestCase):
     fixtures = LoadBalancerFileFixtures('cloudstack')
     fixture_tag = 'default'
@@ -115,6 +124,21 @@ class CloudStackMockHttp(MockHttpTestCase):
             body, obj = self._load_fixture(fixture)
             return (httplib.OK, body, obj, httplib.responses[httplib.OK])
 
+    def _cmd_listLoadBalancerRules(self, page=None, pagesize=None,
+                                   **kwargs):
+        fixture = 'listLoadBalancerRules_' + self.fixture_tag + '.json'
+        body, obj = self._load_fixture(fixture)
+
+        if page is not None:
+            response = obj['listloadbalancerrulesresponse']
+            items = response['loadbalancerrule']
+            start = (int(page) - 1) * int(pagesize)
+            response['loadbalancerrule'] = items[start:start + int(pagesize)]
+            response['count'] = len(items)
+            body = json.dumps(obj)
+
+        return (httplib.OK, body, obj, httplib.responses[httplib.OK])
+
     def _cmd_queryAsyncJobResult(self, jobid):
         fixture = 'queryAsyncJobResult' + '_' + str(jobid) + '.json'
         body, obj = self._load_fixture(fixture)
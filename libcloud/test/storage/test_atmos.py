@@ -45,6 +45,9 @@ class AtmosTests(unittest.TestCase):
         AtmosMockHttp.type = None
         AtmosMockHttp.upload_created = False
         AtmosMockRawResponse.type = None
+        # Mock connections keep per-upload state so make sure a fresh one is
+        # used for each test
+        AtmosDriver.connectionCls.pool.clear()
         self.driver = AtmosDriver('dummy', base64.b64encode(b('dummy')))
         self._remove_test_file()
 
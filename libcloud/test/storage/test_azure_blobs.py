@@ -17,6 +17,7 @@ from __future__ import with_statement
 
 import os
 import sys
+import time
 import unittest
 import tempfile
 
@@ -35,6 +36,8 @@ from libcloud.storage.types import InvalidContainerNameError
 from libcloud.storage.types import ObjectDoesNotExistError
 from libcloud.storage.types import ObjectHashMismatchError
 from libcloud.storage.drivers.azure_blobs import AzureBlobsStorageDriver
+from libcloud.storage.drivers.azure_blobs import AzureBlobLease
+from libcloud.storage.drivers.azure_blobs import AZURE_CHUNK_SIZE
 from libcloud.storage.drivers.azure_blobs import AZURE_BLOCK_MAX_SIZE
 from libcloud.storage.drivers.azure_blobs import AZURE_PAGE_CHUNK_SIZE
 from libcloud.storage.drivers.dummy import DummyIterator
@@ -912,6 +915,115 @@ class AzureBlobsTests(unittest.TestCase):
         self.assertEqual(obj.name, object_name)
         self.assertEqual(obj.size, blob_size)
 
+    def _upload_via_stream_concurrently(self, blob_type, data):
+        self.mock_response_klass.use_param = 'comp'
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        uploaded = []
+        committed = []
+        upload_chunk = self.driver._upload_chunk
+        commit_blocks = self.driver._commit_blocks
+
+        def _upload_chunk(object_path, blob_type, lease, count, offset,
+                          data):
+            # The first chunk finishes last
+            if count == 1:
+                time.sleep(0.1)
+
+            upload_chunk(object_path, blob_type, lease, count, offset, data)
+            uploaded.append((count, offset, len(data)))
+
+        def _commit_blocks(object_path, chunks, lease):
+            committed.extend(chunks)
+            commit_blocks(object_path, chunks, lease)
+
+        self.driver._upload_chunk = _upload_chunk
+        self.driver._commit_blocks = _commit_blocks
+        self.driver.upload_buffer_size = 2 * AZURE_CHUNK_SIZE
+
+        try:
+            obj = self.driver.upload_object_via_stream(
+                container=container, object_name='foo_test_upload',
+                iterator=DummyIterator(data=data),
+                extra={'content_type': 'text/plain'}, ex_blob_type=blob_type,
+                ex_page_blob_size=sum([len(d) for d in data]),
+                ex_upload_concurrency=3)
+        finally:
+            self.mock_response_klass.use_param = None
+
+        return obj, uploaded, committed
+
+    def test_upload_blob_object_via_stream_concurrently(self):
+        data = ['a' * AZURE_CHUNK_SIZE, 'b' * AZURE_CHUNK_SIZE, 'c' * 10]
+        obj, uploaded, committed = self._upload_via_stream_concurrently(
+            'BlockBlob', data)
+
+        self.assertEqual(obj.size, 2 * AZURE_CHUNK_SIZE + 10)
+        self.assertEqual(uploaded[-1][0], 1)
+        self.assertEqual(sorted(uploaded),
+                         [(1, 0, AZURE_CHUNK_SIZE),
+                          (2, AZURE_CHUNK_SIZE, AZURE_CHUNK_SIZE),
+                          (3, 2 * AZURE_CHUNK_SIZE, 10)])
+
+        # Blocks are committed in order even if they complete out of order
+        self.assertEqual(committed, [self.driver._get_block_id(i)
+                                     for i in range(1, 4)])
+
+    def test_upload_page_object_via_stream_concurrently(self):
+        data = ['1' * AZURE_CHUNK_SIZE, '2' * AZURE_PAGE_CHUNK_SIZE]
+        obj, uploaded, committed = self._upload_via_stream_concurrently(
+            'PageBlob', data)
+
+        self.assertEqual(obj.size, AZURE_CHUNK_SIZE + AZURE_PAGE_CHUNK_SIZE)
+        self.assertEqual(sorted(uploaded),
+                         [(1, 0, AZURE_CHUNK_SIZE),
+                          (2, AZURE_CHUNK_SIZE, AZURE_PAGE_CHUNK_SIZE)])
+        self.assertEqual(committed, [])
+
+    def test_upload_object_invalid_concurrency(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        self.assertRaises(ValueError, self.driver.upload_object_via_stream,
+                          container=container, object_name='foo_test_upload',
+                          iterator=DummyIterator(data=['1']),
+                          ex_upload_concurrency=0)
+
+    def test_lease_renewal(self):
+        lease = AzureBlobLease(self.driver, '/foo_bar_container/foo', True)
+        renewals = []
+        lease.renew = lambda: renewals.append(time.time())
+
+        # Nothing to renew without a lease
+        lease.start_renewal(interval=0.01)
+        time.sleep(0.05)
+        lease.stop_renewal()
+        self.assertEqual(renewals, [])
+
+        lease.lease_id = 'someleaseid'
+        lease.start_renewal(interval=0.01)
+        time.sleep(0.1)
+        lease.stop_renewal()
+
+        count = len(renewals)
+        self.assertTrue(count > 0)
+        time.sleep(0.05)
+        self.assertEqual(len(renewals), count)
+        lease.check_renewal()
+
+    def test_lease_renewal_error(self):
+        lease = AzureBlobLease(self.driver, '/foo_bar_container/foo', True)
+        lease.lease_id = 'someleaseid'
+
+        def renew():
+            raise LibcloudError('Unable to obtain lease')
+
+        lease.renew = renew
+        lease.start_renewal(interval=0.01)
+        time.sleep(0.1)
+        lease.stop_renewal()
+
+        self.assertRaises(LibcloudError, lease.check_renewal)
+
     def test_delete_object_not_found(self):
         self.mock_response_klass.type = 'NOT_FOUND'
         container = Container(name='foo_bar_container', extra={},
@@ -13,7 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import with_statement
+
+import os
 import sys
+import shutil
+import socket
+import tempfile
+import threading
 import unittest
 import hashlib
 
@@ -26,9 +33,13 @@ from libcloud.utils.py3 import b
 if PY3:
     from io import FileIO as file
 
-from libcloud.storage.base import StorageDriver
+from libcloud.utils.py3 import httplib
+from libcloud.common.types import LibcloudError
+from libcloud.storage.base import StorageDriver, Container, Object
+from libcloud.storage.types import ObjectHashMismatchError
 
 from libcloud.test import StorageMockHttp # pylint: disable-msg=E0611
+from libcloud.test import MockResponse # pylint: disable-msg=E0611
 
 
 class BaseStorageTests(unittest.TestCase):
@@ -131,6 +142,119 @@ class BaseStorageTests(unittest.TestCase):
         self.assertEqual(bytes_transferred, (len(data)))
         self.assertEqual(self.send_called, 1)
 
+    def _create_test_file(self, data):
+        fd, file_path = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+        self.addCleanup(os.unlink, file_path)
+        return file_path
+
+    def test__upload_file_sendfile(self):
+        if not hasattr(os, 'sendfile') or \
+                not hasattr(socket.socket, 'sendfile'):
+            return
+
+        data = b('1234567890') * 100000
+        file_path = self._create_test_file(data)
+
+        sender, receiver = socket.socketpair()
+        self.addCleanup(receiver.close)
+        received = []
+
+        def receive():
+            while True:
+                chunk = receiver.recv(65536)
+                if not chunk:
+                    break
+                received.append(chunk)
+
+        thread = threading.Thread(target=receive)
+        thread.start()
+
+        response = Mock()
+        response.connection.connection.sock = sender
+        response.connection.connection.send.side_effect = AssertionError()
+
+        success, data_hash, bytes_transferred = \
+            self.driver1._upload_file(response=response, file_path=file_path)
+
+        sender.close()
+        thread.join()
+
+        self.assertTrue(success)
+        self.assertEqual(data_hash, hashlib.md5(data).hexdigest())
+        self.assertEqual(bytes_transferred, len(data))
+        self.assertEqual(b('').join(received), data)
+
+        # Hash computation is optional
+        sender, receiver = socket.socketpair()
+        self.addCleanup(receiver.close)
+        response.connection.connection.sock = sender
+        thread = threading.Thread(target=receive)
+        thread.start()
+
+        success, data_hash, bytes_transferred = \
+            self.driver1._upload_file(response=response, file_path=file_path,
+                                      calculate_hash=False)
+
+        sender.close()
+        thread.join()
+
+        self.assertTrue(success)
+        self.assertEqual(data_hash, None)
+
+    def test__upload_file_sendfile_failure(self):
+        data = b('1234567890') * 10
+        file_path = self._create_test_file(data)
+
+        response = Mock()
+        sent = []
+        response.connection.connection.send = sent.append
+
+        # Nothing has been sent yet, the file is streamed instead
+        sock = Mock()
+        sock.sendfile.side_effect = socket.error('sendfile failed')
+
+        success, data_hash, bytes_transferred = \
+            self.driver1._sendfile(response=response, sock=sock,
+                                   file_path=file_path)
+
+        self.assertTrue(success)
+        self.assertEqual(data_hash, hashlib.md5(data).hexdigest())
+        self.assertEqual(bytes_transferred, len(data))
+        self.assertEqual(b('').join(sent), data)
+
+        # Part of the data has been sent, the error is propagated
+        def partial_sendfile(file_handle):
+            file_handle.seek(10)
+            raise socket.error('connection reset')
+
+        sent[:] = []
+        sock.sendfile.side_effect = partial_sendfile
+
+        self.assertRaises(socket.error, self.driver1._sendfile,
+                          response=response, sock=sock, file_path=file_path)
+        self.assertEqual(sent, [])
+
+    def test__upload_file_without_socket(self):
+        def mock_send(data):
+            self.send_called += 1
+
+        data = b('1234567890') * 10
+        file_path = self._create_test_file(data)
+
+        # Mock connection which doesn't expose a real socket
+        response = Mock()
+        response.connection.connection.send = mock_send
+
+        success, data_hash, bytes_transferred = \
+            self.driver1._upload_file(response=response, file_path=file_path)
+
+        self.assertTrue(success)
+        self.assertEqual(data_hash, hashlib.md5(data).hexdigest())
+        self.assertEqual(bytes_transferred, len(data))
+        self.assertEqual(self.send_called, 1)
+
     def test__get_hash_function(self):
         self.driver1.hash_type = 'md5'
         func = self.driver1._get_hash_function()
@@ -148,5 +272,169 @@ class BaseStorageTests(unittest.TestCase):
         else:
             self.fail('Invalid hash type but exception was not thrown')
 
+
+class RangedDownloadTests(unittest.TestCase):
+    data = '0123456789' * 100
+
+    def setUp(self):
+        StorageDriver.connectionCls.conn_classes = (None, StorageMockHttp)
+
+        self.driver = StorageDriver('username', 'key', host='localhost')
+        self.driver.supports_range_requests = True
+        self.driver._get_object_range = self._get_object_range
+        self.driver._get_object_data_hash = lambda obj: obj.hash
+
+        self.requested_ranges = []
+        self.failing_ranges = []
+        self.lock = threading.Lock()
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        self.obj = Object(name='foo_bar_object', size=len(self.data),
+                          hash=hashlib.md5(b(self.data)).hexdigest(),
+                          extra={}, meta_data=None, container=container,
+                          driver=self.driver)
+
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'foo_bar_object')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _get_object_range(self, obj, start, end):
+        with self.lock:
+            self.requested_ranges.append((start, end))
+
+        response = Mock()
+
+        if (start, end) in self.failing_ranges:
+            response.status = httplib.INTERNAL_SERVER_ERROR
+        else:
+            response.status = httplib.PARTIAL_CONTENT
+            response.response = MockResponse(httplib.PARTIAL_CONTENT,
+                                             self.data[start:end + 1])
+
+        return response
+
+    def _read_file(self):
+        with open(self.file_path, 'rb') as fp:
+            return fp.read()
+
+    def test_download_object_in_ranges(self):
+        result = self.driver.download_object_in_ranges(
+            obj=self.obj, destination_path=self.file_path, concurrency=4,
+            part_size=128)
+
+        self.assertTrue(result)
+        self.assertEqual(self._read_file(), b(self.data))
+        self.assertEqual(len(self.requested_ranges), 8)
+        self.assertTrue((896, 999) in self.requested_ranges)
+        self.assertEqual(os.listdir(self.directory), ['foo_bar_object'])
+
+    def test_download_object_in_ranges_hash_mismatch(self):
+        self.obj.hash = hashlib.md5(b('foo')).hexdigest()
+
+        self.assertRaises(ObjectHashMismatchError,
+                          self.driver.download_object_in_ranges,
+                          obj=self.obj, destination_path=self.file_path,
+                          part_size=128, delete_on_failure=False)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_download_object_in_ranges_resume(self):
+        self.failing_ranges = [(256, 383)]
+
+        self.assertRaises(LibcloudError,
+                          self.driver.download_object_in_ranges,
+                          obj=self.obj, destination_path=self.file_path,
+                          concurrency=1, part_size=128,
+                          delete_on_failure=False)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertTrue(os.path.exists(self.file_path + '.partial'))
+        self.assertEqual(self.requested_ranges,
+                         [(0, 127), (128, 255), (256, 383)])
+
+        self.failing_ranges = []
+        self.requested_ranges = []
+
+        result = self.driver.download_object_in_ranges(
+            obj=self.obj, destination_path=self.file_path, concurrency=1,
+            part_size=128, resume=True)
+
+        self.assertTrue(result)
+        self.assertEqual(self._read_file(), b(self.data))
+        self.assertEqual(self.requested_ranges[0], (256, 383))
+        self.assertEqual(len(self.requested_ranges), 6)
+        self.assertEqual(os.listdir(self.directory), ['foo_bar_object'])
+
+    def test_download_object_in_ranges_resume_different_part_size(self):
+        self.failing_ranges = [(256, 383)]
+
+        self.assertRaises(LibcloudError,
+                          self.driver.download_object_in_ranges,
+                          obj=self.obj, destination_path=self.file_path,
+                          concurrency=1, part_size=128,
+                          delete_on_failure=False)
+
+        self.failing_ranges = []
+        self.requested_ranges = []
+
+        result = self.driver.download_object_in_ranges(
+            obj=self.obj, destination_path=self.file_path, part_size=500,
+            resume=True)
+
+        self.assertTrue(result)
+        self.assertEqual(self._read_file(), b(self.data))
+        self.assertEqual(sorted(self.requested_ranges),
+                         [(0, 499), (500, 999)])
+
+    def test_download_object_in_ranges_failure_cleanup(self):
+        self.failing_ranges = [(0, 127)]
+
+        self.assertRaises(LibcloudError,
+                          self.driver.download_object_in_ranges,
+                          obj=self.obj, destination_path=self.file_path,
+                          part_size=128)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_download_object_in_ranges_existing_file(self):
+        with open(self.file_path, 'wb') as fp:
+            fp.write(b('foo'))
+
+        self.assertRaises(LibcloudError,
+                          self.driver.download_object_in_ranges,
+                          obj=self.obj, destination_path=self.file_path)
+
+        result = self.driver.download_object_in_ranges(
+            obj=self.obj, destination_path=self.file_path,
+            overwrite_existing=True, part_size=300)
+
+        self.assertTrue(result)
+        self.assertEqual(self._read_file(), b(self.data))
+
+    def test_download_object_in_ranges_not_supported(self):
+        self.driver.supports_range_requests = False
+        self.driver.download_object = Mock(return_value=True)
+
+        result = self.driver.download_object_in_ranges(
+            obj=self.obj, destination_path=self.file_path)
+
+        self.assertTrue(result)
+        self.assertEqual(self.requested_ranges, [])
+        self.assertTrue(self.driver.download_object.called)
+
+    def test_should_download_in_ranges(self):
+        self.driver.range_download_part_size = 100
+
+        # Ranged downloads are opt-in
+        self.assertFalse(self.driver._should_download_in_ranges(self.obj))
+        self.assertTrue(self.driver._should_download_in_ranges(self.obj, 4))
+
+        self.driver.range_download_concurrency = 4
+        self.assertTrue(self.driver._should_download_in_ranges(self.obj))
+        self.assertFalse(self.driver._should_download_in_ranges(self.obj, 1))
+
+        self.driver.range_download_part_size = 1000
+        self.assertFalse(self.driver._should_download_in_ranges(self.obj))
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
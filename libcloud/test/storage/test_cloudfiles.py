@@ -30,6 +30,8 @@ from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import b
 from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import urlquote
+from libcloud.utils.py3 import urlparse
+from libcloud.utils.py3 import parse_qs
 
 if PY3:
     from io import FileIO as file
@@ -147,6 +149,17 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(container.extra['object_count'], 120)
         self.assertEqual(container.extra['size'], 340084450)
 
+    def test_list_containers_not_found(self):
+        CloudFilesMockHttp.type = 'LIST_NOT_FOUND'
+
+        try:
+            self.driver.list_containers()
+        except LibcloudError:
+            e = sys.exc_info()[1]
+            self.assertTrue('404' in str(e))
+        else:
+            self.fail('Exception was not thrown')
+
     def test_list_container_objects(self):
         CloudFilesMockHttp.type = 'EMPTY'
         container = Container(
@@ -175,6 +188,43 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(obj.size, 1160520)
         self.assertEqual(obj.container.name, 'test_container')
 
+    def test_list_container_objects_prefetch(self):
+        CloudFilesMockHttp.type = 'ITERATOR'
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = self.driver.list_container_objects(container=container,
+                                                     ex_prefetch=True,
+                                                     ex_max_pages=1)
+
+        names = [obj.name for obj in objects]
+        self.assertEqual(names, ['foo-test-%d' % (i) for i in range(1, 6)])
+        self.assertEqual(len(objects._pages), 1)
+
+    def test_iterate_container_objects(self):
+        CloudFilesMockHttp.type = 'ITERATOR'
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = self.driver.iterate_container_objects(container=container)
+        self.assertTrue(not isinstance(objects, list))
+
+        names = [obj.name for obj in objects]
+        self.assertEqual(len(names), 5)
+        self.assertTrue('foo-test-1' in names)
+
+    def test_iterate_container_objects_not_found(self):
+        CloudFilesMockHttp.type = 'LIST_NOT_FOUND'
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = self.driver.iterate_container_objects(container=container)
+
+        try:
+            list(objects)
+        except LibcloudError:
+            e = sys.exc_info()[1]
+            self.assertTrue('404' in str(e))
+        else:
+            self.fail('Exception was not thrown')
+
     def test_get_container(self):
         container = self.driver.get_container(container_name='test_container')
         self.assertEqual(container.name, 'test_container')
@@ -564,6 +614,122 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(mocked__upload_object_part.call_count, parts)
         self.assertTrue(mocked__upload_object_manifest.call_count, 1)
 
+    def _multipart_upload_object(self, **kwargs):
+        uploaded = []
+
+        def _upload_object_part(container, object_name, part_number,
+                                iterator, verify_hash=True):
+            data = b('').join([b(data) for data in iterator])
+            uploaded.append((part_number, data))
+
+        self.driver._upload_object_part = _upload_object_part
+        self.driver._upload_object_manifest = mock.Mock(
+            return_value='test_manifest')
+
+        file_path = os.path.abspath(__file__)
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        obj = self.driver.ex_multipart_upload_object(
+            file_path=file_path, container=container,
+            object_name='foo_test_upload', **kwargs)
+
+        self.assertEqual(obj, 'test_manifest')
+        return sorted(uploaded)
+
+    def test_ex_multipart_upload_object_concurrently(self):
+        file_path = os.path.abspath(__file__)
+
+        with open(file_path, 'rb') as fp:
+            content = fp.read()
+
+        chunk_size = int(math.ceil(len(content) / 5.0))
+        uploaded = self._multipart_upload_object(chunk_size=chunk_size,
+                                                 ex_concurrency=3)
+
+        self.assertEqual([part_number for part_number, _ in uploaded],
+                         list(range(5)))
+        self.assertEqual(b('').join([data for _, data in uploaded]), content)
+        self.assertEqual(len(uploaded[0][1]), chunk_size)
+
+    def test_ex_multipart_upload_object_resume(self):
+        file_path = os.path.abspath(__file__)
+
+        with open(file_path, 'rb') as fp:
+            content = fp.read()
+
+        chunk_size = int(math.ceil(len(content) / 3.0))
+        hash_function = self.driver._get_hash_function()
+        hash_function.update(content[:chunk_size])
+
+        def segment(name):
+            return Object(name=name, size=chunk_size,
+                          hash=hash_function.hexdigest(), extra={},
+                          meta_data={}, container=None, driver=self.driver)
+
+        # First segment is complete, second one has a different content and
+        # the last one is left over from an upload with a smaller chunk size
+        segments = [segment('foo_test_upload/%08d' % (index))
+                    for index in [0, 1, 3]]
+        self.driver._get_segments = mock.Mock(return_value=dict(
+            [(obj.name, obj) for obj in segments]))
+        self.driver.delete_object = mock.Mock(return_value=True)
+
+        uploaded = self._multipart_upload_object(chunk_size=chunk_size,
+                                                 ex_concurrency=2,
+                                                 ex_resume=True)
+
+        self.assertEqual([part_number for part_number, _ in uploaded],
+                         [1, 2])
+        self.assertEqual(uploaded[0][1], content[chunk_size:2 * chunk_size])
+        self.driver.delete_object.assert_called_once_with(segments[2])
+
+    def test_ex_multipart_upload_object_resume_foreign_object(self):
+        foreign = Object(name='foo_test_upload/notes.txt', size=1, hash='',
+                         extra={}, meta_data={}, container=None,
+                         driver=self.driver)
+        self.driver._get_segments = mock.Mock(
+            return_value={foreign.name: foreign})
+        self.driver._upload_object_part = mock.Mock()
+
+        file_path = os.path.abspath(__file__)
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        chunk_size = int(math.ceil(os.path.getsize(file_path) / 3.0))
+
+        self.assertRaises(LibcloudError,
+                          self.driver.ex_multipart_upload_object,
+                          file_path=file_path, container=container,
+                          object_name='foo_test_upload',
+                          chunk_size=chunk_size, ex_resume=True)
+        self.assertFalse(self.driver._upload_object_part.called)
+
+    def test_ex_multipart_upload_object_part_failure(self):
+        self.driver._upload_object_part = mock.Mock(
+            side_effect=LibcloudError('segment failed'))
+        self.driver._upload_object_manifest = mock.Mock()
+
+        file_path = os.path.abspath(__file__)
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        chunk_size = int(math.ceil(os.path.getsize(file_path) / 5.0))
+
+        self.assertRaises(LibcloudError,
+                          self.driver.ex_multipart_upload_object,
+                          file_path=file_path, container=container,
+                          object_name='foo_test_upload',
+                          chunk_size=chunk_size, ex_concurrency=2)
+        self.assertFalse(self.driver._upload_object_manifest.called)
+
+    def test_get_segments(self):
+        CloudFilesMockHttp.type = 'PREFIX'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+        segments = self.driver._get_segments(container, 'foo_test_upload')
+
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(segments['foo test 1'].hash,
+                         '16265549b5bda64ecdaa5156de4c97cc')
+
     def test__upload_object_part(self):
         _put_object = CloudFilesStorageDriver._put_object
         mocked__put_object = mock.Mock(return_value="test")
@@ -763,6 +929,16 @@ class CloudFilesMockHttp(StorageMockHttp, MockHttpTestCase):
             status_code = httplib.NO_CONTENT
         return (status_code, body, headers, httplib.responses[httplib.OK])
 
+    def _v1_MossoCloudFS_LIST_NOT_FOUND(self, method, url, body, headers):
+        # test_list_containers_not_found
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
+    _v1_MossoCloudFS_test_container_LIST_NOT_FOUND = \
+        _v1_MossoCloudFS_LIST_NOT_FOUND
+
     def _v1_MossoCloudFS_not_found(self, method, url, body, headers):
         # test_get_object_not_found
         if method == 'HEAD':
@@ -801,6 +977,22 @@ class CloudFilesMockHttp(StorageMockHttp, MockHttpTestCase):
                            })
         return (status_code, body, headers, httplib.responses[httplib.OK])
 
+    def _v1_MossoCloudFS_test_container_PREFIX(self, method, url, body,
+                                               headers):
+        # test_get_segments
+        params = parse_qs(urlparse.urlparse(url).query)
+        self.assertEqual(params['prefix'], ['foo_test_upload/'])
+        headers = copy.deepcopy(self.base_headers)
+
+        if url.find('marker') == -1:
+            body = self.fixtures.load('list_container_objects.json')
+            status_code = httplib.OK
+        else:
+            body = ''
+            status_code = httplib.NO_CONTENT
+
+        return (status_code, body, headers, httplib.responses[httplib.OK])
+
     def _v1_MossoCloudFS_test_container_ITERATOR(self, method, url, body, headers):
         headers = copy.deepcopy(self.base_headers)
         # list_container_objects
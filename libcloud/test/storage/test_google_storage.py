@@ -17,6 +17,7 @@ import sys
 import unittest
 
 from libcloud.storage.drivers.google_storage import GoogleStorageDriver
+from libcloud.storage.drivers.google_storage import NAMESPACE
 from libcloud.test.storage.test_s3 import S3Tests, S3MockHttp
 
 from libcloud.test.file_fixtures import StorageFileFixtures
@@ -25,6 +26,7 @@ from libcloud.test.secrets import STORAGE_GOOGLE_STORAGE_PARAMS
 
 class GoogleStorageMockHttp(S3MockHttp):
     fixtures = StorageFileFixtures('google_storage')
+    namespace = NAMESPACE
 
 
 class GoogleStorageTests(S3Tests):
@@ -13,14 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import with_statement
+
 import os
 import sys
 import unittest
 
 from xml.etree import ElementTree as ET
 from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
 from libcloud.utils.py3 import urlparse
 from libcloud.utils.py3 import parse_qs
+from libcloud.utils.py3 import next
 
 from libcloud.common.types import InvalidCredsError
 from libcloud.common.types import LibcloudError
@@ -43,10 +47,23 @@ from libcloud.test.file_fixtures import StorageFileFixtures # pylint: disable-ms
 from libcloud.test.secrets import STORAGE_S3_PARAMS
 
 
+# Object names in the test_container used by _test_container_SHARDED
+SHARDED_KEYS = ['a', 'b/1', 'b/2', 'b/3', 'ba', 'c/d/1', 'c/d/2', 'c/e',
+                'd', 'e/1']
+
+
 class S3MockHttp(StorageMockHttp, MockHttpTestCase):
 
     fixtures = StorageFileFixtures('s3')
+    namespace = 'http://s3.amazonaws.com/doc/2006-03-01/'
     base_headers = {}
+    aborted_upload_ids = []
+
+    def putrequest(self, method, action):
+        self.request_headers = {}
+
+    def putheader(self, key, value):
+        self.request_headers[key] = value
 
     def _UNAUTHORIZED(self, method, url, body, headers):
         return (httplib.UNAUTHORIZED,
@@ -101,6 +118,82 @@ class S3MockHttp(StorageMockHttp, MockHttpTestCase):
                 self.base_headers,
                 httplib.responses[httplib.OK])
 
+    def _test_container_SHARDED(self, method, url, body, headers):
+        # Generated listing of SHARDED_KEYS which supports prefix, delimiter
+        # and marker parameters with at most two keys per page
+        params = parse_qs(urlparse.urlparse(url).query)
+        prefix = params.get('prefix', [''])[0]
+        delimiter = params.get('delimiter', [None])[0]
+        marker = params.get('marker', [''])[0]
+
+        entries = []
+        for key in SHARDED_KEYS:
+            if not key.startswith(prefix):
+                continue
+
+            index = -1
+            if delimiter:
+                index = key.find(delimiter, len(prefix))
+
+            if index == -1:
+                entry = ('Contents', key)
+            else:
+                entry = ('CommonPrefixes', key[:index + len(delimiter)])
+
+            if entry[1] > marker and entry not in entries:
+                entries.append(entry)
+
+        page = entries[:2]
+        contents = []
+
+        for tag, name in page:
+            if tag == 'Contents':
+                contents.append('<Contents><Key>%s</Key>'
+                                '<LastModified>2011-04-09T19:05:18.000Z'
+                                '</LastModified><ETag>"hash"</ETag>'
+                                '<Size>1</Size><Owner><ID>1</ID></Owner>'
+                                '</Contents>' % (name))
+            else:
+                contents.append('<CommonPrefixes><Prefix>%s</Prefix>'
+                                '</CommonPrefixes>' % (name))
+
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult xmlns="%s">'
+                '<Name>test_container</Name><Prefix>%s</Prefix>'
+                '<IsTruncated>%s</IsTruncated>%s</ListBucketResult>' %
+                (self.namespace, prefix, str(len(entries) > 2).lower(),
+                 ''.join(contents)))
+        return (httplib.OK,
+                body,
+                self.base_headers,
+                httplib.responses[httplib.OK])
+
+    def _test1_list_containers(self, method, url, body, headers):
+        # test_get_container
+        return (httplib.OK,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.OK])
+
+    _test2_list_containers = _test1_list_containers
+
+    def _container1_list_containers(self, method, url, body, headers):
+        # test_get_container
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
+    _test_inexistent_list_containers = _container1_list_containers
+    _test1_NOT_FOUND = _container1_list_containers
+
+    def _test1_FORBIDDEN(self, method, url, body, headers):
+        # test_get_container_forbidden
+        return (httplib.FORBIDDEN,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.FORBIDDEN])
+
     def _test2_test_list_containers(self, method, url, body, headers):
         # test_get_object
         body = self.fixtures.load('list_containers.xml')
@@ -250,6 +343,24 @@ class S3MockHttp(StorageMockHttp, MockHttpTestCase):
                     headers,
                     httplib.responses[httplib.OK])
 
+    def _foo_bar_container_foo_test_stream_data_MULTIPART_FAIL(self, method,
+                                                               url, body,
+                                                               headers):
+        query_string = urlparse.urlsplit(url).query
+        query = parse_qs(query_string)
+
+        if method == 'PUT' and query['partNumber'][0] == '2':
+            return (httplib.BAD_REQUEST,
+                    '',
+                    {},
+                    httplib.responses[httplib.BAD_REQUEST])
+
+        if method == 'DELETE':
+            S3MockHttp.aborted_upload_ids.append(query['uploadId'][0])
+
+        return self._foo_bar_container_foo_test_stream_data_MULTIPART(
+            method, url, body, headers)
+
     def _foo_bar_container_LIST_MULTIPART(self, method, url, body, headers):
         query_string = urlparse.urlsplit(url).query
         query = parse_qs(query_string)
@@ -284,6 +395,7 @@ class S3MockHttp(StorageMockHttp, MockHttpTestCase):
 class S3MockRawResponse(MockRawResponse):
 
     fixtures = StorageFileFixtures('s3')
+    range_data = '0123456789' * 100
 
     def parse_body(self):
         if len(self.body) == 0 and not self.parse_zero_length_body:
@@ -343,6 +455,17 @@ class S3MockRawResponse(MockRawResponse):
                 headers,
                 httplib.responses[httplib.OK])
 
+    def _foo_bar_container_foo_bar_object_RANGE(self, method, url, body,
+                                                headers):
+        # test_download_object_in_ranges
+        range_header = self.connection.connection.request_headers['Range']
+        start, end = range_header.split('=')[1].split('-')
+        body = self.range_data[int(start):int(end) + 1]
+        return (httplib.PARTIAL_CONTENT,
+                body,
+                {},
+                httplib.responses[httplib.PARTIAL_CONTENT])
+
     def _foo_bar_container_foo_bar_object_INVALID_SIZE(self, method, url,
                                                        body, headers):
         # test_upload_object_invalid_file_size
@@ -379,6 +502,9 @@ class S3MockRawResponse(MockRawResponse):
                     headers,
                     httplib.responses[httplib.BAD_REQUEST])
 
+    _foo_bar_container_foo_test_stream_data_MULTIPART_FAIL = \
+        _foo_bar_container_foo_test_stream_data_MULTIPART
+
 
 class S3Tests(unittest.TestCase):
     driver_type = S3StorageDriver
@@ -476,6 +602,66 @@ class S3Tests(unittest.TestCase):
         self.assertTrue(obj in objects)
         self.assertEqual(len(objects), 5)
 
+    def test_iterate_container_objects_prefix_and_delimiter(self):
+        self.mock_response_klass.type = 'SHARDED'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.iterate_container_objects(
+            container=container, ex_prefix='b')
+        self.assertEqual([obj.name for obj in objects],
+                         ['b/1', 'b/2', 'b/3', 'ba'])
+
+        objects = self.driver.iterate_container_objects(
+            container=container, ex_prefix='c/', ex_delimiter='/')
+        self.assertEqual([obj.name for obj in objects], ['c/e'])
+
+        common_prefixes = self.driver.ex_iterate_common_prefixes(
+            container=container)
+        self.assertEqual(list(common_prefixes), ['b/', 'c/', 'e/'])
+
+    def test_ex_iterate_container_objects_sharded_ordered(self):
+        self.mock_response_klass.type = 'SHARDED'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.ex_iterate_container_objects_sharded(
+            container=container, concurrency=2)
+        self.assertEqual([obj.name for obj in objects], SHARDED_KEYS)
+
+        objects = self.driver.ex_iterate_container_objects_sharded(
+            container=container, prefix='c/', concurrency=2)
+        self.assertEqual([obj.name for obj in objects],
+                         ['c/d/1', 'c/d/2', 'c/e'])
+
+    def test_ex_iterate_container_objects_sharded_unordered(self):
+        self.mock_response_klass.type = 'SHARDED'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.ex_iterate_container_objects_sharded(
+            container=container, concurrency=3, ordered=False)
+        names = [obj.name for obj in objects]
+        self.assertEqual(sorted(names), SHARDED_KEYS)
+
+    def test_ex_iterate_container_objects_sharded_abandoned(self):
+        self.mock_response_klass.type = 'SHARDED'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.ex_iterate_container_objects_sharded(
+            container=container, concurrency=2)
+        self.assertEqual(next(objects).name, 'a')
+        self.assertEqual(next(objects).name, 'b/1')
+        objects.close()
+
+    def test_ex_iterate_container_objects_sharded_invalid_concurrency(self):
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+        objects = self.driver.ex_iterate_container_objects_sharded(
+            container=container, concurrency=0)
+        self.assertRaises(ValueError, list, objects)
+
     def test_get_container_doesnt_exist(self):
         self.mock_response_klass.type = 'list_containers'
         try:
@@ -490,6 +676,34 @@ class S3Tests(unittest.TestCase):
         container = self.driver.get_container(container_name='test1')
         self.assertTrue(container.name, 'test1')
 
+    def test_get_container_forbidden(self):
+        self.mock_response_klass.type = 'FORBIDDEN'
+        self.assertRaises(ContainerDoesNotExistError,
+                          self.driver.get_container, container_name='test1')
+
+    def test_get_container_cache(self):
+        self.mock_response_klass.type = 'list_containers'
+        self.driver.container_cache_ttl = 60
+        container = self.driver.get_container(container_name='test1')
+
+        # Cached container is returned without a request
+        self.mock_response_klass.type = 'NOT_FOUND'
+        self.assertTrue(self.driver.get_container(container_name='test1')
+                        is container)
+
+        # Expired containers are looked up again
+        self.driver._container_cache['test1'] = (0, container)
+        self.assertRaises(ContainerDoesNotExistError,
+                          self.driver.get_container, container_name='test1')
+
+    def test_get_container_cache_disabled(self):
+        self.mock_response_klass.type = 'list_containers'
+        self.driver.get_container(container_name='test1')
+
+        self.mock_response_klass.type = 'NOT_FOUND'
+        self.assertRaises(ContainerDoesNotExistError,
+                          self.driver.get_container, container_name='test1')
+
     def test_get_object_container_doesnt_exist(self):
         # This method makes two requests which makes mocking the response a bit
         # trickier
@@ -602,6 +816,43 @@ class S3Tests(unittest.TestCase):
                                              delete_on_failure=True)
         self.assertTrue(result)
 
+    def test_download_object_in_ranges(self):
+        self.mock_raw_response_klass.type = 'RANGE'
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        data = self.mock_raw_response_klass.range_data
+        obj = Object(name='foo_bar_object', size=len(data), hash=None,
+                     extra={}, container=container, meta_data=None,
+                     driver=self.driver_type)
+        destination_path = os.path.abspath(__file__) + '.temp'
+        result = self.driver.download_object_in_ranges(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=True, concurrency=3, part_size=300)
+
+        self.assertTrue(result)
+
+        with open(destination_path, 'rb') as fp:
+            self.assertEqual(fp.read(), b(data))
+
+    def test_download_object_ex_range_concurrency(self):
+        self.mock_raw_response_klass.type = 'RANGE'
+        self.driver.range_download_part_size = 300
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        data = self.mock_raw_response_klass.range_data
+        obj = Object(name='foo_bar_object', size=len(data), hash=None,
+                     extra={}, container=container, meta_data=None,
+                     driver=self.driver_type)
+        destination_path = os.path.abspath(__file__) + '.temp'
+        result = self.driver.download_object(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=True, ex_range_concurrency=3)
+
+        self.assertTrue(result)
+
+        with open(destination_path, 'rb') as fp:
+            self.assertEqual(fp.read(), b(data))
+
     def test_download_object_invalid_file_size(self):
         self.mock_raw_response_klass.type = 'INVALID_SIZE'
         container = Container(name='foo_bar_container', extra={},
@@ -784,6 +1035,80 @@ class S3Tests(unittest.TestCase):
         self.assertEqual(obj.name, object_name)
         self.assertEqual(obj.size, CHUNK_SIZE*2 + 1)
 
+    def test_upload_big_object_via_stream_concurrently(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_raw_response_klass.type = 'MULTIPART'
+        self.mock_response_klass.type = 'MULTIPART'
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        object_name = 'foo_test_stream_data'
+        iterator = DummyIterator(data=['2' * CHUNK_SIZE, '3' * CHUNK_SIZE,
+                                       '4' * CHUNK_SIZE, '5'])
+        extra = {'content_type': 'text/plain'}
+        obj = self.driver.upload_object_via_stream(container=container,
+                                                   object_name=object_name,
+                                                   iterator=iterator,
+                                                   extra=extra,
+                                                   ex_multipart_concurrency=3)
+
+        self.assertEqual(obj.name, object_name)
+        self.assertEqual(obj.size, CHUNK_SIZE * 3 + 1)
+
+    def test_upload_object_multipart_concurrently(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_raw_response_klass.type = 'MULTIPART'
+        self.mock_response_klass.type = 'MULTIPART'
+
+        file_path = os.path.abspath(__file__) + '.temp'
+        with open(file_path, 'wb') as fp:
+            fp.write(b('1') * (CHUNK_SIZE * 2 + 10))
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        object_name = 'foo_test_stream_data'
+        extra = {'content_type': 'text/plain'}
+        obj = self.driver.upload_object(file_path=file_path,
+                                        container=container,
+                                        object_name=object_name,
+                                        extra=extra,
+                                        ex_multipart_concurrency=2)
+
+        self.assertEqual(obj.name, object_name)
+        self.assertEqual(obj.size, CHUNK_SIZE * 2 + 10)
+
+    def test_upload_object_via_stream_concurrently_abort(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_raw_response_klass.type = 'MULTIPART_FAIL'
+        self.mock_response_klass.type = 'MULTIPART_FAIL'
+        S3MockHttp.aborted_upload_ids = []
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        object_name = 'foo_test_stream_data'
+        iterator = DummyIterator(data=['2' * CHUNK_SIZE] * 4)
+        extra = {'content_type': 'text/plain'}
+
+        try:
+            self.driver.upload_object_via_stream(container=container,
+                                                 object_name=object_name,
+                                                 iterator=iterator,
+                                                 extra=extra,
+                                                 ex_multipart_concurrency=2)
+        except LibcloudError:
+            e = sys.exc_info()[1]
+            self.assertTrue('Error uploading chunk' in str(e))
+        else:
+            self.fail('Exception was not thrown')
+
+        self.assertEqual(len(S3MockHttp.aborted_upload_ids), 1)
+
     def test_upload_object_via_stream_abort(self):
         if not self.driver.supports_s3_multipart_upload:
             return
@@ -0,0 +1,409 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+
+from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
+
+from libcloud.common.base import Connection
+from libcloud.compute.base import NodeImage, NodeSize
+from libcloud.compute.drivers.ec2 import EC2NodeDriver
+from libcloud.compute.drivers.dummy import DummyNodeDriver
+from libcloud.storage.base import Container, Object
+from libcloud.storage.drivers.s3 import S3StorageDriver
+from libcloud.dns.drivers.route53 import Route53DNSDriver
+
+from libcloud.test import unittest
+from libcloud.test import MockHttp
+from libcloud.test.compute.test_ec2 import EC2MockHttp
+from libcloud.test.storage.test_s3 import S3MockHttp
+from libcloud.test.dns.test_route53 import Route53MockHttp
+from libcloud.test.secrets import EC2_PARAMS, STORAGE_S3_PARAMS
+from libcloud.test.secrets import DNS_PARAMS_ROUTE53
+
+ASYNCIO_AVAILABLE = sys.version_info >= (3, 6)
+
+if ASYNCIO_AVAILABLE:
+    import asyncio
+
+    from libcloud.aio.base import AsyncConnection, AsyncHTTPConnection
+    from libcloud.aio.compute import AsyncNodeDriver, AsyncEC2NodeDriver
+    from libcloud.aio.compute import get_async_driver as get_async_node_driver
+    from libcloud.aio.storage import AsyncS3StorageDriver
+    from libcloud.aio.storage import get_async_driver as \
+        get_async_storage_driver
+    from libcloud.aio.dns import AsyncRoute53DNSDriver
+    from libcloud.aio.dns import get_async_driver as get_async_dns_driver
+
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class KeepAliveHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.server.client_addresses.add(self.client_address)
+
+            if self.path == '/chunked':
+                self.send_response(200)
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                for chunk in [b('hello '), b('chunked '), b('world')]:
+                    self.wfile.write(b('%X\r\n' % (len(chunk))))
+                    self.wfile.write(chunk + b('\r\n'))
+
+                self.wfile.write(b('0\r\n\r\n'))
+                return
+
+            body = b('hello world')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class KeepAliveServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+
+def completed(value):
+    future = asyncio.get_event_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+class MockAsyncResponse(object):
+    will_close = False
+
+    def __init__(self, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.version = 11
+        self._headers = list(response.headers.items())
+        self._body = b(response.body.read())
+        self._callbacks = []
+
+    def getheaders(self):
+        return self._headers
+
+    def getheader(self, name, default=None):
+        return dict(self._headers).get(name, default)
+
+    def isclosed(self):
+        return not self._body
+
+    def add_done_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def read(self, amt=None):
+        if amt is None:
+            amt = len(self._body)
+
+        data, self._body = self._body[:amt], self._body[amt:]
+
+        if not self._body:
+            for callback in self._callbacks:
+                callback(self)
+            self._callbacks = []
+
+        return completed(data)
+
+
+class MockAsyncHTTPConnection(object):
+    """
+    Async transport which dispatches requests to a MockHttp class.
+    """
+    mock_cls = None
+
+    def __init__(self, host, port, secure=True, timeout=None):
+        self.mock = self.mock_cls(host, port)
+
+    def request(self, method, url, body=None, headers=None):
+        self.mock.request(method, url, body, headers)
+        return completed(MockAsyncResponse(self.mock.getresponse()))
+
+    def is_idle(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class StaleAsyncHTTPConnection(MockAsyncHTTPConnection):
+    """
+    Async transport whose keep-alive connection has been closed by the
+    server after the request was sent.
+    """
+
+    def request(self, method, url, body=None, headers=None):
+        self.request_written = True
+        raise httplib.BadStatusLine('')
+
+
+class AsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._transport_cls = AsyncConnection.transport_cls
+
+    def tearDown(self):
+        AsyncConnection.transport_cls = self._transport_cls
+        self.loop.close()
+
+    def use_mock(self, mock_cls):
+        MockAsyncHTTPConnection.mock_cls = mock_cls
+        AsyncConnection.transport_cls = MockAsyncHTTPConnection
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def collect(self, generator):
+        items = []
+
+        while True:
+            try:
+                items.append(self.run_coroutine(generator.__anext__()))
+            except StopAsyncIteration:
+                break
+
+        return items
+
+
+@unittest.skipIf(not ASYNCIO_AVAILABLE, 'asyncio front-end requires 3.6+')
+class AsyncHTTPConnectionTestCase(AsyncTestCase):
+    def setUp(self):
+        super(AsyncHTTPConnectionTestCase, self).setUp()
+        self.server = KeepAliveServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.server.client_addresses = set()
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(AsyncHTTPConnectionTestCase, self).tearDown()
+
+    def _request(self, connection, path):
+        response = self.run_coroutine(connection.request('GET', path, headers={
+            'Host': '127.0.0.1'}))
+        body = self.run_coroutine(response.read())
+        return response, body
+
+    def test_content_length_keep_alive(self):
+        connection = AsyncHTTPConnection('127.0.0.1', self.port, secure=False)
+
+        for _ in range(3):
+            response, body = self._request(connection, '/')
+            self.assertEqual(response.status, httplib.OK)
+            self.assertEqual(body, b('hello world'))
+            self.assertTrue(response.isclosed())
+            self.assertTrue(connection.is_idle())
+
+        connection.close()
+        self.assertEqual(len(self.server.client_addresses), 1)
+
+    def test_chunked_response(self):
+        connection = AsyncHTTPConnection('127.0.0.1', self.port, secure=False)
+        response, body = self._request(connection, '/chunked')
+        self.assertEqual(body, b('hello chunked world'))
+        self.assertTrue(connection.is_idle())
+        connection.close()
+
+    def test_read_in_chunks(self):
+        connection = AsyncHTTPConnection('127.0.0.1', self.port, secure=False)
+        response = self.run_coroutine(connection.request('GET', '/chunked'))
+
+        chunks = []
+        while True:
+            data = self.run_coroutine(response.read(4))
+            if not data:
+                break
+            self.assertTrue(len(data) <= 4)
+            chunks.append(data)
+
+        self.assertEqual(b('').join(chunks), b('hello chunked world'))
+        connection.close()
+
+
+class ConnectionMockHttp(MockHttp):
+    def _test(self, method, url, body, headers):
+        return (httplib.OK, 'ok', {}, httplib.responses[httplib.OK])
+
+
+@unittest.skipIf(not ASYNCIO_AVAILABLE, 'asyncio front-end requires 3.6+')
+class AsyncConnectionTestCase(AsyncTestCase):
+    def setUp(self):
+        super(AsyncConnectionTestCase, self).setUp()
+        self.use_mock(ConnectionMockHttp)
+        self.connection = AsyncConnection(Connection(host='127.0.0.1',
+                                                     port=80))
+
+    def _add_stale_transport(self):
+        StaleAsyncHTTPConnection.mock_cls = ConnectionMockHttp
+        key = ('127.0.0.1', 80, self.connection.connection.secure)
+        self.connection._idle[key] = [StaleAsyncHTTPConnection(*key)]
+
+    def test_stale_connection_is_replaced(self):
+        self._add_stale_transport()
+        response = self.run_coroutine(self.connection.request('/test'))
+        self.assertEqual(response.body, 'ok')
+
+    def test_stale_connection_non_idempotent_request_is_not_retried(self):
+        self._add_stale_transport()
+        # POST might have been processed before the connection failed
+        self.assertRaises(httplib.BadStatusLine, self.run_coroutine,
+                          self.connection.request('/test', method='POST',
+                                                  data='body'))
+
+
+@unittest.skipIf(not ASYNCIO_AVAILABLE, 'asyncio front-end requires 3.6+')
+class AsyncNodeDriverTestCase(AsyncTestCase):
+    def setUp(self):
+        super(AsyncNodeDriverTestCase, self).setUp()
+        EC2MockHttp.test = None
+        EC2NodeDriver.connectionCls.conn_classes = (None, EC2MockHttp)
+        EC2MockHttp.use_param = 'Action'
+        EC2MockHttp.type = None
+        self.use_mock(EC2MockHttp)
+        self.driver = get_async_node_driver(EC2NodeDriver(*EC2_PARAMS))
+
+    def test_get_async_driver(self):
+        self.assertTrue(isinstance(self.driver, AsyncEC2NodeDriver))
+
+        driver = get_async_node_driver(DummyNodeDriver(0))
+        self.assertEqual(type(driver), AsyncNodeDriver)
+
+    def test_list_nodes(self):
+        nodes = self.run_coroutine(self.driver.list_nodes())
+        self.assertEqual(nodes[0].id, 'i-4382922a')
+        self.assertEqual(sorted(nodes[0].public_ips), ['1.2.3.4', '1.2.3.5'])
+        self.assertEqual([node.id for node in nodes],
+                         [node.id for node in self.driver.driver.list_nodes()])
+
+    def test_create_node(self):
+        image = NodeImage(id='ami-be3adfd7', name='image',
+                          driver=self.driver.driver)
+        size = NodeSize('m1.small', 'Small Instance', None, None, None, None,
+                        driver=self.driver.driver)
+        node = self.run_coroutine(self.driver.create_node(name='foo',
+                                                          image=image,
+                                                          size=size))
+        self.assertEqual(node.id, 'i-2ba64342')
+        self.assertEqual(node.name, 'foo')
+        self.assertEqual(node.extra['tags'], {'Name': 'foo'})
+
+    def test_fallback_to_executor(self):
+        driver = get_async_node_driver(DummyNodeDriver(0))
+        nodes = self.run_coroutine(driver.list_nodes())
+        self.assertEqual(len(nodes), 2)
+
+
+class S3AsyncMockHttp(S3MockHttp):
+    def _foo_bar_container_foo_bar_object(self, method, url, body, headers):
+        return (httplib.OK, 'a' * 1000, {}, httplib.responses[httplib.OK])
+
+    def _foo_bar_container_not_found(self, method, url, body, headers):
+        return (httplib.NOT_FOUND, '', {},
+                httplib.responses[httplib.NOT_FOUND])
+
+
+@unittest.skipIf(not ASYNCIO_AVAILABLE, 'asyncio front-end requires 3.6+')
+class AsyncStorageDriverTestCase(AsyncTestCase):
+    def setUp(self):
+        super(AsyncStorageDriverTestCase, self).setUp()
+        S3StorageDriver.connectionCls.conn_classes = (None, S3AsyncMockHttp)
+        S3AsyncMockHttp.type = None
+        self.use_mock(S3AsyncMockHttp)
+        self.driver = get_async_storage_driver(
+            S3StorageDriver(*STORAGE_S3_PARAMS))
+        self.container = Container(name='foo_bar_container', extra={},
+                                   driver=self.driver.driver)
+
+    def test_get_async_driver(self):
+        self.assertTrue(isinstance(self.driver, AsyncS3StorageDriver))
+
+    def test_iterate_container_objects(self):
+        container = Container(name='test_container', extra={},
+                              driver=self.driver.driver)
+        objects = self.collect(
+            self.driver.iterate_container_objects(container))
+        expected = list(
+            self.driver.driver.iterate_container_objects(container))
+
+        self.assertEqual(len(objects), 1)
+        self.assertEqual([obj.name for obj in objects],
+                         [obj.name for obj in expected])
+        self.assertEqual(objects[0].hash, expected[0].hash)
+
+    def test_download_object_as_stream(self):
+        obj = Object(name='foo_bar_object', size=1000, hash=None, extra={},
+                     container=self.container, meta_data=None,
+                     driver=self.driver.driver)
+        chunks = self.collect(
+            self.driver.download_object_as_stream(obj, chunk_size=300))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [300, 300, 300,
+                                                            100])
+        self.assertEqual(b('').join(chunks), b('a' * 1000))
+
+    def test_download_object_as_stream_not_found(self):
+        obj = Object(name='not_found', size=1000, hash=None, extra={},
+                     container=self.container, meta_data=None,
+                     driver=self.driver.driver)
+        generator = self.driver.download_object_as_stream(obj)
+
+        from libcloud.storage.types import ObjectDoesNotExistError
+        self.assertRaises(ObjectDoesNotExistError, self.collect, generator)
+
+
+@unittest.skipIf(not ASYNCIO_AVAILABLE, 'asyncio front-end requires 3.6+')
+class AsyncDNSDriverTestCase(AsyncTestCase):
+    def setUp(self):
+        super(AsyncDNSDriverTestCase, self).setUp()
+        Route53DNSDriver.connectionCls.conn_classes = (Route53MockHttp,
+                                                       Route53MockHttp)
+        Route53MockHttp.type = None
+        self.use_mock(Route53MockHttp)
+        self.driver = get_async_dns_driver(
+            Route53DNSDriver(*DNS_PARAMS_ROUTE53))
+
+    def test_list_records(self):
+        self.assertTrue(isinstance(self.driver, AsyncRoute53DNSDriver))
+
+        zone = self.driver.driver.list_zones()[0]
+        records = self.run_coroutine(self.driver.list_records(zone))
+
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[1].name, 'www')
+        self.assertEqual(records[1].data, '208.111.35.173')
+
+    def test_list_records_paginated(self):
+        zone = self.driver.driver.list_zones()[0]
+        Route53MockHttp.type = 'PAGINATED'
+        records = self.run_coroutine(self.driver.list_records(zone))
+
+        self.assertEqual([record.id for record in records],
+                         ['CNAME:wibble', 'A:www', 'A:blahblah'])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
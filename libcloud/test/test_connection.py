@@ -18,8 +18,13 @@ import sys
 
 from mock import Mock, call
 
+from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
 from libcloud.test import unittest
-from libcloud.common.base import Connection
+from libcloud.test import MockHttp
+from libcloud.common.base import Connection, ConnectionPool
+from libcloud.common.base import LibcloudHTTPConnection
+from libcloud.common.types import MalformedResponseError
 
 
 class ConnectionClassTestCase(unittest.TestCase):
@@ -32,7 +37,7 @@ class ConnectionClassTestCase(unittest.TestCase):
 
     def tearDown(self):
         Connection.connect = self.originalConnect
-        Connection.responseCls = Connection.responseCls
+        Connection.responseCls = self.originalResponseCls
 
     def test_content_length(self):
         con = Connection()
@@ -89,5 +94,219 @@ class ConnectionClassTestCase(unittest.TestCase):
             self.assertEqual(call_kwargs['headers']['Content-Length'], '1')
 
 
+class FakeConnection(object):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2, idle_timeout=60)
+
+    def test_acquire_empty_pool(self):
+        self.assertEqual(self.pool.acquire('key'), None)
+
+    def test_release_and_acquire(self):
+        connection = FakeConnection()
+        self.pool.release('key', connection)
+
+        self.assertEqual(self.pool.acquire('other'), None)
+        self.assertEqual(self.pool.acquire('key'), connection)
+        self.assertEqual(self.pool.acquire('key'), None)
+        self.assertFalse(connection.closed)
+
+    def test_max_size(self):
+        connections = [FakeConnection(), FakeConnection(), FakeConnection()]
+
+        for connection in connections:
+            self.pool.release('key', connection)
+
+        self.assertFalse(connections[0].closed)
+        self.assertFalse(connections[1].closed)
+        self.assertTrue(connections[2].closed)
+
+    def test_idle_timeout(self):
+        self.pool.idle_timeout = -1
+        connection = FakeConnection()
+        self.pool.release('key', connection)
+
+        self.assertEqual(self.pool.acquire('key'), None)
+        self.assertTrue(connection.closed)
+
+    def test_release_busy_connection(self):
+        connection = httplib.HTTPConnection('127.0.0.1', 80)
+        connection.close = Mock()
+        connection._HTTPConnection__state = 'Request-sent'
+        self.pool.release('key', connection)
+
+        self.assertEqual(self.pool.acquire('key'), None)
+        self.assertTrue(connection.close.called)
+
+    def test_discard(self):
+        connection = FakeConnection()
+        self.pool.release('key', connection)
+        self.pool.discard('key')
+
+        self.assertEqual(self.pool.acquire('key'), None)
+        self.assertTrue(connection.closed)
+
+
+class PooledConnectionMockHttp(MockHttp):
+    pooled = True
+    instances = 0
+    fail_next = False
+
+    def __init__(self, *args, **kwargs):
+        PooledConnectionMockHttp.instances += 1
+        super(PooledConnectionMockHttp, self).__init__(*args, **kwargs)
+
+    def getresponse(self):
+        if PooledConnectionMockHttp.fail_next:
+            PooledConnectionMockHttp.fail_next = False
+            raise httplib.BadStatusLine('')
+
+        return super(PooledConnectionMockHttp, self).getresponse()
+
+    def _test(self, method, url, body, headers):
+        return (httplib.OK, 'ok', {}, httplib.responses[httplib.OK])
+
+    def _items(self, method, url, body, headers):
+        body = ('\n  <?xml version="1.0" encoding="UTF-8"?>\n'
+                '<Result><Items><Item>1</Item><Item>2</Item></Items>'
+                '<More>false</More></Result>')
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
+    def _malformed(self, method, url, body, headers):
+        return (httplib.OK, '<Result><Item>', {},
+                httplib.responses[httplib.OK])
+
+    def _not_found(self, method, url, body, headers):
+        return (httplib.NOT_FOUND, 'not found', {},
+                httplib.responses[httplib.NOT_FOUND])
+
+
+class ConnectionKeepAliveTestCase(unittest.TestCase):
+    def setUp(self):
+        PooledConnectionMockHttp.instances = 0
+        PooledConnectionMockHttp.fail_next = False
+        self.con = Connection(host='127.0.0.1', port=80)
+        self.con.conn_classes = (PooledConnectionMockHttp,
+                                 PooledConnectionMockHttp)
+        self.con.pool = ConnectionPool()
+
+    def test_connection_is_reused(self):
+        for _ in range(5):
+            response = self.con.request('/test')
+            self.assertEqual(response.body, 'ok')
+
+        self.assertEqual(PooledConnectionMockHttp.instances, 1)
+
+    def test_connection_pool_disabled(self):
+        self.con.pool = None
+
+        for _ in range(3):
+            self.con.request('/test')
+
+        self.assertEqual(PooledConnectionMockHttp.instances, 3)
+
+    def test_mock_connections_are_not_pooled(self):
+        self.assertTrue(self.con._is_pooled(LibcloudHTTPConnection))
+        self.assertTrue(self.con._is_pooled(PooledConnectionMockHttp))
+
+        # Mock connections store the response on the instance
+        self.assertFalse(self.con._is_pooled(MockHttp))
+        self.con.conn_classes = (MockHttp, MockHttp)
+        self.con.connect()
+        connection = self.con.connection
+        self.con.connect()
+        self.assertFalse(self.con.connection is connection)
+
+    def test_stale_connection_is_replaced(self):
+        self.con.request('/test')
+        PooledConnectionMockHttp.fail_next = True
+
+        response = self.con.request('/test')
+        self.assertEqual(response.body, 'ok')
+        self.assertEqual(PooledConnectionMockHttp.instances, 2)
+
+    def test_stale_connection_non_idempotent_request_is_not_retried(self):
+        self.con.request('/test')
+        PooledConnectionMockHttp.fail_next = True
+
+        # POST might have been processed before the connection failed
+        self.assertRaises(httplib.BadStatusLine, self.con.request, '/test',
+                          method='POST', data='body')
+        self.assertEqual(PooledConnectionMockHttp.instances, 1)
+
+        self.con.request('/test')
+        PooledConnectionMockHttp.fail_next = True
+        response = self.con.request('/test', method='PUT', data='body')
+        self.assertEqual(response.body, 'ok')
+        self.assertEqual(PooledConnectionMockHttp.instances, 3)
+
+    def test_can_resend_request(self):
+        self.con._request_written = True
+        self.assertTrue(self.con._can_resend_request('GET', None, False))
+        self.assertTrue(self.con._can_resend_request('PUT', 'body', False))
+        self.assertFalse(self.con._can_resend_request('POST', 'body', False))
+        self.assertFalse(self.con._can_resend_request('PUT', iter(['body']),
+                                                      False))
+
+        # Raw requests only send the headers
+        self.assertTrue(self.con._can_resend_request('POST', None, True))
+
+        # Nothing has been written to the stale connection
+        self.con._request_written = False
+        self.assertTrue(self.con._can_resend_request('POST', 'body', False))
+
+    def test_new_connection_failure_is_not_retried(self):
+        PooledConnectionMockHttp.fail_next = True
+
+        self.assertRaises(httplib.BadStatusLine, self.con.request, '/test')
+        self.assertEqual(PooledConnectionMockHttp.instances, 1)
+
+    def test_request_stream_iterparse(self):
+        response = self.con.request_stream('/items')
+        items = response.iterparse(xpath='Items/Item')
+
+        values = []
+        for item in items:
+            values.append(item.text)
+            # Requests performed while the body is being consumed must use
+            # a different connection
+            self.assertEqual(self.con.request('/test').body, 'ok')
+
+        self.assertEqual(values, ['1', '2'])
+        self.assertEqual(items.root.findtext('More'), 'false')
+        self.assertEqual(len(items.root.find('Items')), 0)
+        self.assertEqual(PooledConnectionMockHttp.instances, 2)
+
+        # Both connections have been returned to the pool
+        self.con.request('/test')
+        self.con.request('/test')
+        self.assertEqual(PooledConnectionMockHttp.instances, 2)
+
+    def test_request_stream_close_before_end(self):
+        response = self.con.request_stream('/items')
+        response.close()
+
+        self.assertEqual(response.read(), b(''))
+        self.con.request('/test')
+        self.assertEqual(PooledConnectionMockHttp.instances, 2)
+
+    def test_request_stream_malformed_response(self):
+        response = self.con.request_stream('/malformed')
+        items = response.iterparse(xpath='Item')
+
+        self.assertRaises(MalformedResponseError, list, items)
+
+    def test_request_stream_unsuccessful_response(self):
+        self.assertRaises(Exception, self.con.request_stream, '/not_found')
+        self.con.request('/test')
+        self.assertEqual(PooledConnectionMockHttp.instances, 1)
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
@@ -0,0 +1,119 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import threading
+
+from libcloud.utils.py3 import httplib
+from libcloud.common.base import Connection, ConnectionPool
+from libcloud.compute.drivers.openstack import OpenStack_1_1_NodeDriver
+from libcloud.storage.drivers.cloudfiles import CloudFilesStorageDriver
+
+from libcloud.test import unittest
+from libcloud.test import MockHttp
+from libcloud.test.compute.test_openstack import OpenStack_2_0_MockHttp
+from libcloud.test.storage.test_cloudfiles import CloudFilesMockHttp
+from libcloud.test.secrets import OPENSTACK_PARAMS
+
+
+class ActionMockHttp(MockHttp):
+    def request(self, method, url, body=None, headers=None, raw=False):
+        # Give other threads a chance to run in between sending the request
+        # and reading the response
+        time.sleep(0.001)
+        return super(ActionMockHttp, self).request(method, url, body,
+                                                   headers, raw)
+
+    def _action(self, method, url, body, headers):
+        return (httplib.OK, url.split('?')[1], {},
+                httplib.responses[httplib.OK])
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    thread_count = 10
+    iterations = 20
+
+    def _run_concurrently(self, func):
+        errors = []
+
+        def worker(index):
+            try:
+                for iteration in range(self.iterations):
+                    func(index, iteration)
+            except Exception:
+                errors.append(sys.exc_info()[1])
+
+        threads = [threading.Thread(target=worker, args=(index,))
+                   for index in range(self.thread_count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_per_request_state_is_thread_local(self):
+        con = Connection(host='127.0.0.1', port=80)
+        con.conn_classes = (ActionMockHttp, ActionMockHttp)
+        con.pool = ConnectionPool()
+
+        def request(index, iteration):
+            value = '%s-%s' % (index, iteration)
+            con.set_context({'value': value})
+
+            response = con.request('/action', params={'value': value},
+                                   method='GET')
+
+            self.assertEqual(response.body, 'value=%s' % (value))
+            self.assertEqual(con.action, '/action')
+            self.assertEqual(con.context['value'], value)
+
+        self._run_concurrently(request)
+
+    def test_list_nodes_concurrently(self):
+        OpenStack_1_1_NodeDriver.connectionCls.conn_classes = (
+            OpenStack_2_0_MockHttp, OpenStack_2_0_MockHttp)
+        OpenStack_1_1_NodeDriver.connectionCls.auth_url = \
+            'https://auth.api.example.com/v2.0/'
+        OpenStack_2_0_MockHttp.type = None
+        driver = OpenStack_1_1_NodeDriver(*OPENSTACK_PARAMS,
+                                          **{'ex_force_auth_version': '2.0'})
+
+        def list_nodes(index, iteration):
+            nodes = driver.list_nodes()
+            self.assertEqual(len(nodes), 2)
+
+        self._run_concurrently(list_nodes)
+
+    def test_get_object_concurrently(self):
+        CloudFilesStorageDriver.connectionCls.conn_classes = (
+            None, CloudFilesMockHttp)
+        CloudFilesMockHttp.type = None
+        driver = CloudFilesStorageDriver('dummy', 'dummy')
+
+        def get_object(index, iteration):
+            obj = driver.get_object(container_name='test_container',
+                                    object_name='test_object')
+            self.assertEqual(obj.size, 555)
+            self.assertEqual(obj.meta_data['foo-bar'], 'test 1')
+
+        self._run_concurrently(get_object)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
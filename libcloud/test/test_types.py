@@ -23,6 +23,7 @@ class TestLazyList(unittest.TestCase):
     def setUp(self):
         super(TestLazyList, self).setUp
         self._get_more_counter = 0
+        self._get_more_calls = []
 
     def tearDown(self):
         super(TestLazyList, self).tearDown
@@ -92,6 +93,88 @@ class TestLazyList(unittest.TestCase):
         self.assertEqual(repr(ll2), '[1, 2, 3, 4, 5]')
         self.assertEqual(repr(ll3), '[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]')
 
+    def test_iteration_is_lazy(self):
+        ll = LazyList(get_more=self._get_more_pages)
+        iterator = iter(ll)
+
+        self.assertEqual(self._get_more_calls, [])
+        self.assertEqual(next(iterator), 1)
+        self.assertEqual(self._get_more_calls, [None])
+        self.assertEqual(list(iterator), list(range(2, 11)))
+        self.assertEqual(self._get_more_calls, [None, 3, 6, 9])
+
+    def test_indexing_is_lazy(self):
+        ll = LazyList(get_more=self._get_more_pages)
+
+        self.assertEqual(ll[4], 5)
+        self.assertEqual(self._get_more_calls, [None, 3])
+        self.assertEqual(ll[0], 1)
+        self.assertEqual(self._get_more_calls, [None, 3])
+        self.assertEqual(ll[-2], 9)
+        self.assertEqual(self._get_more_calls, [None, 3, 6, 9])
+        self.assertRaises(IndexError, ll.__getitem__, 10)
+        self.assertRaises(IndexError, ll.__getitem__, -11)
+
+    def test_slicing(self):
+        ll = LazyList(get_more=self._get_more_pages)
+
+        self.assertEqual(ll[1:5], [2, 3, 4, 5])
+        self.assertEqual(self._get_more_calls, [None, 3])
+        self.assertEqual(ll[:6:2], [1, 3, 5])
+        self.assertEqual(ll[5:2], [])
+        self.assertEqual(ll[8:], [9, 10])
+        self.assertEqual(ll[-3:], [8, 9, 10])
+        self.assertEqual(ll[::-3], [10, 7, 4, 1])
+        self.assertEqual(ll[:], list(range(1, 11)))
+
+    def test_max_pages(self):
+        ll = LazyList(get_more=self._get_more_pages, max_pages=2)
+
+        self.assertEqual([item for item in ll], list(range(1, 11)))
+        self.assertEqual(len(ll), 10)
+        self.assertEqual(sorted(ll._pages.keys()), [2, 3])
+        self.assertEqual(self._get_more_calls, [None, 3, 6, 9])
+
+        # Dropped page is retrieved again
+        self.assertEqual(ll[4], 5)
+        self.assertEqual(self._get_more_calls, [None, 3, 6, 9, 3])
+        self.assertEqual(sorted(ll._pages.keys()), [1, 3])
+
+        self.assertRaises(ValueError, LazyList,
+                          get_more=self._get_more_pages, max_pages=0)
+
+    def test_prefetch(self):
+        ll = LazyList(get_more=self._get_more_pages, prefetch=True)
+        iterator = iter(ll)
+
+        self.assertEqual(next(iterator), 1)
+
+        # Next page is retrieved while the current one is consumed
+        ll._prefetching[1].join()
+        self.assertEqual(self._get_more_calls, [None, 3])
+        self.assertEqual(list(iterator), list(range(2, 11)))
+        self.assertEqual(self._get_more_calls, [None, 3, 6, 9])
+        self.assertEqual(ll._prefetching, None)
+
+    def test_prefetch_error(self):
+        def get_more(last_key, value_dict):
+            if last_key:
+                raise ValueError('page error')
+
+            return [1, 2, 3], 3, False
+
+        ll = LazyList(get_more=get_more, prefetch=True)
+        iterator = iter(ll)
+
+        self.assertEqual([next(iterator) for _ in range(3)], [1, 2, 3])
+        self.assertRaises(ValueError, next, iterator)
+
+    def _get_more_pages(self, last_key, value_dict):
+        self._get_more_calls.append(last_key)
+        start = last_key or 0
+        data = list(range(start + 1, min(start + 3, 10) + 1))
+        return data, data[-1], data[-1] == 10
+
     def _get_more_empty(self, last_key, value_dict):
         return [], None, True
 
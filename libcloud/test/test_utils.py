@@ -14,21 +14,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import with_statement
+
 import sys
+import time
+import zlib
 import unittest
 import warnings
+import threading
 import os.path
 
+from xml.etree import ElementTree as ET
+
 # In Python > 2.7 DeprecationWarnings are disabled by default
 warnings.simplefilter('default')
 
 import libcloud.utils.files
 
 from libcloud.utils.misc import get_driver, set_driver
+from libcloud.utils.xml import XmlItemIterator, XmlFieldExtractor
+from libcloud.utils.xml import fixxpath
+from libcloud.utils.jsonstream import JsonItemIterator
+from libcloud.utils.compression import DecompressingReader
+from libcloud.utils.concurrency import run_concurrently, start_workers
 
 from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import StringIO
 from libcloud.utils.py3 import b
+from libcloud.utils.py3 import u
 from libcloud.compute.types import Provider
 from libcloud.compute.providers import DRIVERS
 
@@ -180,6 +193,32 @@ class TestUtils(unittest.TestCase):
 
             self.assertEqual(index, 548)
 
+    def test_read_in_chunks_fill_size_uneven_chunks(self):
+        sizes = [1, 25, 3, 10, 10, 0, 7, 100, 4]
+        chunks = [b(str(index % 10) * size)
+                  for index, size in enumerate(sizes)]
+        data = b('').join(chunks)
+
+        for fill in [libcloud.utils.files._fill_chunks,
+                     libcloud.utils.files._fill_chunks_joined]:
+            result = list(fill(iter(chunks), 10))
+
+            self.assertEqual(b('').join(result), data)
+            self.assertEqual([len(chunk) for chunk in result],
+                             [10] * 16)
+
+            result = list(fill(iter(chunks + [b('x')]), 10))
+            self.assertEqual(len(result[-1]), 1)
+
+    def test_read_in_chunks_fill_size_passes_through_full_chunks(self):
+        chunks = [b('a' * 10), b('b' * 10)]
+        result = list(libcloud.utils.files.read_in_chunks(iter(chunks),
+                                                          chunk_size=10,
+                                                          fill_size=True))
+
+        self.assertEqual(result, chunks)
+        self.assertTrue(result[0] is chunks[0])
+
     def test_exhaust_iterator(self):
         def iterator_func():
             for x in range(0, 1000):
@@ -204,6 +243,188 @@ class TestUtils(unittest.TestCase):
         result = libcloud.utils.files.exhaust_iterator(iterator=iterator)
         self.assertEqual(result, b(data))
 
+    def test_xml_item_iterator(self):
+        ns = 'http://example.com/ns'
+        data = ('<Result xmlns="%s"><Marker>m</Marker>'
+                '<Set><item><id>1</id></item><item><id>2</id></item>'
+                '<other /></Set><item><id>3</id></item></Result>' % (ns))
+        items = XmlItemIterator(StringIO(data), xpath='Set/item',
+                                namespace=ns)
+
+        ids = [item.findtext('{%s}id' % (ns)) for item in items]
+        self.assertEqual(ids, ['1', '2'])
+
+        # Yielded items are removed from the tree, the rest is kept
+        self.assertEqual(items.root.findtext('{%s}Marker' % (ns)), 'm')
+        self.assertEqual(len(items.root.find('{%s}Set' % (ns))), 1)
+        self.assertEqual(len(items.root.findall('{%s}item' % (ns))), 1)
+
+    def test_fixxpath(self):
+        self.assertEqual(fixxpath('a/b'), 'a/b')
+        self.assertEqual(fixxpath('a/b', 'ns'), '{ns}a/{ns}b')
+        # Cached value
+        self.assertEqual(fixxpath('a/b', 'ns'), '{ns}a/{ns}b')
+        self.assertEqual(fixxpath('a/b', 'ns2'), '{ns2}a/{ns2}b')
+
+    def test_xml_field_extractor(self):
+        ns = 'http://example.com/ns'
+        extractor = XmlFieldExtractor({'id': 'id', 'state': 'state/name',
+                                       'missing': 'missing',
+                                       'empty': 'empty'}, namespace=ns)
+        element = ET.XML('<item xmlns="%s"><id>1</id><empty />'
+                         '<state><name>running</name></state></item>' % (ns))
+
+        self.assertEqual(extractor.extract(element),
+                         {'id': '1', 'state': 'running', 'missing': None,
+                          'empty': ''})
+
+        values = {'foo': 'bar'}
+        extractor.extract(element, values=values)
+        self.assertEqual(values['foo'], 'bar')
+        self.assertEqual(values['id'], '1')
+
+    def test_json_item_iterator(self):
+        if PY3:
+            from io import BytesIO
+        else:
+            BytesIO = StringIO
+
+        data = b('{"listvmsresponse": {"count": 3, "vm": [{"id": 1, '
+                 '"name": "\\u017e\\"]"}, 12345, [1, 2]], "page": 1}, '
+                 '"version": "1.0"}')
+        items = JsonItemIterator(BytesIO(data),
+                                 path='listvmsresponse/vm', chunk_size=3)
+
+        name = b('\\u017e"]').decode('unicode_escape')
+        self.assertEqual(list(items), [{'id': 1, 'name': name},
+                                       12345, [1, 2]])
+        self.assertEqual(items.root, {'listvmsresponse': {'count': 3,
+                                                          'page': 1},
+                                      'version': '1.0'})
+
+    def test_json_item_iterator_top_level_array(self):
+        if PY3:
+            from io import BytesIO
+        else:
+            BytesIO = StringIO
+
+        # Multi-byte characters split across the chunks
+        value = b('\\u017elu\\u0165ou\\u010dk\\u00fd').decode(
+            'unicode_escape')
+        data = b(' [ "') + value.encode('utf-8') + b('" , 1.5 ] ')
+        items = JsonItemIterator(BytesIO(data), chunk_size=1)
+        self.assertEqual(list(items), [value, 1.5])
+
+        self.assertEqual(list(JsonItemIterator(BytesIO(b('')))), [])
+        self.assertEqual(list(JsonItemIterator(BytesIO(b('[]')))), [])
+
+    def test_json_item_iterator_malformed_document(self):
+        if PY3:
+            from io import BytesIO
+        else:
+            BytesIO = StringIO
+
+        for data in ['[1, 2', '[1 2]', '{"a": [1]', '[1] x', 'broken']:
+            items = JsonItemIterator(BytesIO(b(data)), chunk_size=2)
+            self.assertRaises(ValueError, list, items)
+
+    def test_decompressing_reader(self):
+        if PY3:
+            from io import BytesIO
+        else:
+            BytesIO = StringIO
+
+        data = b('libcloud ' * 10000)
+
+        fp = BytesIO(zlib.compress(data))
+        reader = DecompressingReader(fp, 'zlib', chunk_size=100)
+        chunks = []
+        chunk = reader.read(1000)
+        while chunk:
+            self.assertTrue(len(chunk) <= 1000)
+            chunks.append(chunk)
+            chunk = reader.read(1000)
+
+        self.assertEqual(b('').join(chunks), data)
+
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        gzipped = compressor.compress(data) + compressor.flush()
+        reader = DecompressingReader(BytesIO(gzipped), 'gzip')
+        self.assertEqual(reader.read(), data)
+
+    def test_run_concurrently(self):
+        results = []
+
+        for concurrency in [1, 3]:
+            del results[:]
+            run_concurrently(lambda value: results.append(value * 2),
+                             [(i,) for i in range(10)], concurrency)
+            self.assertEqual(sorted(results), [i * 2 for i in range(10)])
+
+        self.assertRaises(ValueError, run_concurrently, results.append,
+                          [(1,)], 0)
+
+    def test_start_workers_error(self):
+        calls = []
+
+        def func(value):
+            calls.append(value)
+
+            if value == 0:
+                raise ValueError('failed')
+
+        # With a single thread, the calls after the failed one are skipped
+        submit, finish = start_workers(func, 1)
+        for value in range(5):
+            submit(value)
+
+        self.assertRaises(ValueError, finish)
+        self.assertEqual(calls, [0])
+
+    def test_start_workers_buffer_size(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def func(size):
+            with lock:
+                running[0] += size
+                running[1] = max(running)
+
+            time.sleep(0.01)
+
+            with lock:
+                running[0] -= size
+
+        submit, finish = start_workers(func, 5, buffer_size=2,
+                                       get_size=lambda size: size)
+        for _ in range(10):
+            submit(1)
+
+        finish()
+        self.assertTrue(running[1] <= 2)
+
+        # A call which doesn't fit in the buffer is accepted once the
+        # buffer is empty
+        submit, finish = start_workers(func, 5, buffer_size=2,
+                                       get_size=lambda size: size)
+        submit(1)
+        submit(3)
+        finish()
+        self.assertEqual(running, [0, 3])
+
+        self.assertRaises(ValueError, start_workers, func, 5, buffer_size=2)
+
+    def test_start_workers_buffer_size_error(self):
+        def func(value):
+            raise ValueError('failed')
+
+        # The second call waits for the first one which fails
+        submit, finish = start_workers(func, 2, buffer_size=1,
+                                       get_size=lambda value: 1)
+        submit(0)
+        self.assertRaises(ValueError, submit, 1)
+        self.assertRaises(ValueError, finish)
+
 
 if __name__ == '__main__':
     sys.exit(unittest.main())
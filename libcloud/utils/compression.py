@@ -18,10 +18,12 @@ import gzip
 
 from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import StringIO
+from libcloud.utils.py3 import b
 
 
 __all__ = [
-    'decompress_data'
+    'decompress_data',
+    'DecompressingReader'
 ]
 
 
@@ -40,3 +42,60 @@ def decompress_data(compression_type, data):
     else:
         raise Exception('Invalid or onsupported compression type: %s' %
                         (compression_type))
+
+
+class DecompressingReader(object):
+    """
+    File-like object which decompresses the data read from the wrapped
+    file-like object on the fly.
+    """
+
+    def __init__(self, fp, compression_type, chunk_size=16 * 1024):
+        """
+        @param fp: File-like object with the compressed data.
+        @type fp: C{object}
+
+        @param compression_type: Compression type (zlib or gzip).
+        @type compression_type: C{str}
+
+        @param chunk_size: Size of the compressed chunks which are read from
+                           the wrapped object.
+        @type chunk_size: C{int}
+        """
+        if compression_type == 'zlib':
+            self._decompressor = zlib.decompressobj()
+        elif compression_type == 'gzip':
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            raise Exception('Invalid or onsupported compression type: %s' %
+                            (compression_type))
+
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self._buffer = b('')
+        self._eof = False
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            chunks = [self._buffer]
+            self._buffer = b('')
+
+            while not self._eof:
+                chunks.append(self._read_chunk())
+
+            return b('').join(chunks)
+
+        while len(self._buffer) < amt and not self._eof:
+            self._buffer += self._read_chunk()
+
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def _read_chunk(self):
+        data = self.fp.read(self.chunk_size)
+
+        if not data:
+            self._eof = True
+            return self._decompressor.flush()
+
+        return self._decompressor.decompress(data)
@@ -0,0 +1,159 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import with_statement
+
+import sys
+import threading
+
+from libcloud.utils.py3 import queue
+
+__all__ = [
+    'start_workers',
+    'run_concurrently'
+]
+
+
+def start_workers(func, concurrency, buffer_size=None, get_size=None):
+    """
+    Start a pool of worker threads which call func.
+
+    Returns a tuple of (submit, finish) functions. submit queues a call with
+    the provided arguments and finish waits until all the queued calls are
+    done.
+
+    Once a call has raised an exception, the queued calls which haven't
+    started yet are skipped and finish re-raises the first exception. Callers
+    which need the result of every call should handle the errors in func.
+
+    If buffer_size is given, submit blocks while the queued and running
+    calls hold more than buffer_size (as reported by get_size) so the caller
+    doesn't read its input faster than it can be processed. A call is always
+    accepted if nothing else is queued so a buffer smaller than a single call
+    doesn't block forever. In this mode submit also re-raises the first
+    exception straight away so the caller stops producing more calls.
+
+    @param func: Function to call.
+    @type func: C{callable}
+
+    @param concurrency: Maximum number of threads.
+    @type concurrency: C{int}
+
+    @param buffer_size: Maximum total size of the queued and running calls.
+    @type buffer_size: C{int}
+
+    @param get_size: Function which is called with the arguments of a call
+                     and returns its size. Required if buffer_size is given.
+    @type get_size: C{callable}
+
+    @rtype: C{tuple}
+    """
+    if concurrency < 1:
+        raise ValueError('Concurrency must be at least 1')
+
+    if buffer_size is not None and get_size is None:
+        raise ValueError('get_size is required with buffer_size')
+
+    pending = queue.Queue()
+    threads = []
+    errors = []
+    buffered = threading.Condition()
+    buffered_size = [0]
+
+    def worker():
+        while True:
+            args = pending.get()
+
+            if args is None:
+                return
+
+            if not errors:
+                try:
+                    func(*args)
+                except Exception:
+                    errors.append(sys.exc_info()[1])
+
+            if buffer_size is not None:
+                with buffered:
+                    buffered_size[0] -= get_size(*args)
+                    buffered.notify_all()
+
+    def submit(*args):
+        if buffer_size is not None:
+            size = get_size(*args)
+
+            with buffered:
+                while (not errors and buffered_size[0] and
+                       buffered_size[0] + size > buffer_size):
+                    buffered.wait()
+
+                if errors:
+                    raise errors[0]
+
+                buffered_size[0] += size
+
+        # Threads are started lazily so no more threads than calls are
+        # started
+        if len(threads) < concurrency:
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        pending.put(args)
+
+    def finish():
+        for _ in threads:
+            pending.put(None)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+    return submit, finish
+
+
+def run_concurrently(func, args_list, concurrency):
+    """
+    Call func with each of the argument tuples using at most concurrency
+    threads and wait until all the calls are done.
+
+    Error handling is the same as with L{start_workers}. With concurrency of
+    1, the calls are made in the current thread.
+
+    @param func: Function to call.
+    @type func: C{callable}
+
+    @param args_list: Argument tuples.
+    @type args_list: C{iterable} of C{tuple}
+
+    @param concurrency: Maximum number of threads.
+    @type concurrency: C{int}
+    """
+    if concurrency == 1:
+        for args in args_list:
+            func(*args)
+
+        return
+
+    submit, finish = start_workers(func, concurrency)
+
+    try:
+        for args in args_list:
+            submit(*args)
+    finally:
+        finish()
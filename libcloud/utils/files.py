@@ -21,10 +21,22 @@ from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import next
 from libcloud.utils.py3 import b
 
-CHUNK_SIZE = 8096
+CHUNK_SIZE = 64 * 1024
 
 if PY3:
-    from io import FileIO as file
+    from io import IOBase as file
+
+try:
+    bytearray
+except NameError:
+    # Python 2.5
+    bytearray = None
+
+try:
+    memoryview
+except NameError:
+    # Python 2.5 and 2.6
+    memoryview = None
 
 
 def read_in_chunks(iterator, chunk_size=None, fill_size=False):
@@ -41,9 +53,6 @@ def read_in_chunks(iterator, chunk_size=None, fill_size=False):
     @type fill_size: C{bool}
     @param fill_size: If True, make sure chunks are chunk_size in length
                       (except for last chunk).
-
-    TODO: At some point in the future we could use byte arrays here if version
-    >= Python 3. This should speed things up a bit and reduce memory usage.
     """
     chunk_size = chunk_size or CHUNK_SIZE
 
@@ -54,30 +63,111 @@ def read_in_chunks(iterator, chunk_size=None, fill_size=False):
         get_data = next
         args = (iterator, )
 
-    data = b('')
-    empty = False
+    chunks = _iterate_data(get_data, args)
+
+    if not fill_size:
+        return chunks
+
+    if bytearray is None:
+        return _fill_chunks_joined(chunks, chunk_size)
+
+    return _fill_chunks(chunks, chunk_size)
+
+
+def _iterate_data(get_data, args):
+    """
+    Yield non-empty chunks returned by get_data until it returns an empty
+    chunk or raises StopIteration.
+    """
+    while True:
+        try:
+            chunk = b(get_data(*args))
+        except StopIteration:
+            return
+
+        if len(chunk) == 0:
+            return
+
+        yield chunk
+
+
+def _fill_chunks(chunks, chunk_size):
+    """
+    Re-slice chunks into chunks of chunk_size bytes.
+
+    The data is collected in a single bytearray which is compacted once per
+    incoming chunk, so each byte is copied at most twice regardless of the
+    chunk sizes. Incoming chunks which already have the right size are
+    passed through without being copied.
+    """
+    data = bytearray()
+
+    for chunk in chunks:
+        if not data and len(chunk) == chunk_size:
+            yield chunk
+            continue
+
+        data.extend(chunk)
+
+        if len(data) < chunk_size:
+            continue
+
+        offset = 0
+        view = _get_view(data)
+
+        while len(data) - offset >= chunk_size:
+            yield _to_bytes(view[offset:offset + chunk_size])
+            offset += chunk_size
+
+        # The buffer can't be resized while a view of it exists
+        view = None
+        del data[:offset]
+
+    if data:
+        yield _to_bytes(data)
+
+
+def _fill_chunks_joined(chunks, chunk_size):
+    """
+    Re-slice chunks into chunks of chunk_size bytes on Pythons without
+    bytearray.
+    """
+    pending = []
+    pending_size = 0
+
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+
+        if pending_size < chunk_size:
+            continue
+
+        data = b('').join(pending)
+        offset = 0
+
+        while len(data) - offset >= chunk_size:
+            yield data[offset:offset + chunk_size]
+            offset += chunk_size
+
+        pending = [data[offset:]]
+        pending_size = len(pending[0])
+
+    if pending_size:
+        yield b('').join(pending)
+
+
+def _get_view(data):
+    if memoryview is None:
+        return data
+
+    return memoryview(data)
 
-    while not empty or len(data) > 0:
-        if not empty:
-            try:
-                chunk = b(get_data(*args))
-                if len(chunk) > 0:
-                    data += chunk
-                else:
-                    empty = True
-            except StopIteration:
-                empty = True
 
-        if len(data) == 0:
-            raise StopIteration
+def _to_bytes(data):
+    if hasattr(data, 'tobytes'):
+        return data.tobytes()
 
-        if fill_size:
-            if empty or len(data) >= chunk_size:
-                yield data[:chunk_size]
-                data = data[chunk_size:]
-        else:
-            yield data
-            data = b('')
+    return bytes(data)
 
 
 def exhaust_iterator(iterator):
@@ -91,7 +181,7 @@ def exhaust_iterator(iterator):
     @rtype C{str}
     @return Data returned by the iterator.
     """
-    data = b('')
+    chunks = []
 
     try:
         chunk = b(next(iterator))
@@ -99,14 +189,14 @@ def exhaust_iterator(iterator):
         chunk = b('')
 
     while len(chunk) > 0:
-        data += chunk
+        chunks.append(chunk)
 
         try:
             chunk = b(next(iterator))
         except StopIteration:
             chunk = b('')
 
-    return data
+    return b('').join(chunks)
 
 
 def guess_file_mime_type(file_path):
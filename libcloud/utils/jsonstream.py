@@ -0,0 +1,185 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from libcloud.utils.py3 import b
+from libcloud.utils.py3 import bytes
+from libcloud.utils.files import CHUNK_SIZE
+
+__all__ = [
+    'JsonItemIterator'
+]
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+
+class JsonItemIterator(object):
+    """
+    Incrementally parse a JSON document from a file-like object and iterate
+    over the items of the array at the provided path.
+
+    The path is a "/" separated list of object keys which lead to the array
+    (e.g. "listvirtualmachinesresponse/virtualmachine"). If no path is
+    provided, the document itself must be an array. Empty document yields
+    no items.
+
+    Only a single item (plus at most one chunk of unparsed data) is kept in
+    memory at a time. Values which are not on the path are collected in the
+    L{root} dictionary (e.g. item count or pagination markers) which mirrors
+    the structure of the document.
+    """
+
+    def __init__(self, source, path=None, chunk_size=CHUNK_SIZE):
+        """
+        @param source: File-like object with a read method.
+        @type source: C{object}
+
+        @param path: Path to the array.
+        @type path: C{str}
+
+        @param chunk_size: Number of bytes which are read at a time.
+        @type chunk_size: C{int}
+        """
+        self.source = source
+        self.keys = path and path.split('/') or []
+        self.chunk_size = chunk_size
+        self.root = None
+
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        self.root = {}
+
+        # Same as with the non-streaming responses, empty body is not an error
+        if not self._peek():
+            return
+
+        for item in self._iter_items(self.keys, self.root):
+            yield item
+
+        if self._peek():
+            raise ValueError('Extra data at position %d' % (self._pos))
+
+    def _iter_items(self, keys, values):
+        if not keys:
+            self._expect('[')
+
+            if self._peek() == ']':
+                self._pos += 1
+                return
+
+            while True:
+                yield self._decode_value()
+
+                if self._expect(',]') == ']':
+                    return
+
+        self._expect('{')
+
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self._decode_value()
+            self._expect(':')
+
+            if key == keys[0] and len(keys) == 1:
+                for item in self._iter_items(keys[1:], values):
+                    yield item
+            elif key == keys[0]:
+                values[key] = {}
+
+                for item in self._iter_items(keys[1:], values[key]):
+                    yield item
+            else:
+                values[key] = self._decode_value()
+
+            if self._expect(',}') == '}':
+                return
+
+    def _decode_value(self):
+        self._peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+            else:
+                # Number at the end of the buffer (e.g. "1." out of "1.5")
+                # might not be complete yet. Complete values are always
+                # followed by a delimiter or the end of the document.
+                if self._eof or (end < len(self._buffer) and
+                                 self._buffer[end] in DELIMITERS):
+                    self._pos = end
+                    return value
+
+            self._fill()
+
+    def _expect(self, chars):
+        char = self._peek()
+
+        if not char or char not in chars:
+            raise ValueError('Expecting %s at position %d' %
+                             (' or '.join(chars), self._pos))
+
+        self._pos += 1
+        return char
+
+    def _peek(self):
+        """
+        Skip the whitespace and return the next character (an empty string
+        on the end of the document).
+        """
+        while True:
+            buffer_len = len(self._buffer)
+
+            while self._pos < buffer_len and \
+                    self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+
+            if self._pos < buffer_len:
+                return self._buffer[self._pos]
+
+            if self._eof:
+                return ''
+
+            self._fill()
+
+    def _fill(self):
+        data = self.source.read(self.chunk_size)
+
+        if not data:
+            self._eof = True
+            data = self._text_decoder.decode(b(''), True)
+        elif isinstance(data, bytes):
+            data = self._text_decoder.decode(data)
+
+        # Drop the data which has already been parsed
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
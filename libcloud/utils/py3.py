@@ -52,6 +52,7 @@ if PY3:
     import urllib as urllib2
     import urllib.parse as urlparse
     import xmlrpc.client as xmlrpclib
+    import queue
 
     from urllib.parse import quote as urlquote
     from urllib.parse import unquote as urlunquote
@@ -95,6 +96,7 @@ else:
     import urllib2
     import urlparse
     import xmlrpclib
+    import Queue as queue
     from urllib import quote as urlquote
     from urllib import unquote as urlunquote
     from urllib import urlencode as urlencode
@@ -13,13 +13,52 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import absolute_import
+
+from xml.etree import ElementTree as ET
+from xml.parsers.expat import ExpatError
+
+__all__ = [
+    'XML_PARSE_ERRORS',
+    'XmlItemIterator',
+    'XmlFieldExtractor',
+    'fixxpath',
+    'findtext',
+    'findattr',
+    'findall'
+]
+
+# ElementTree in Python 2.5 and 2.6 raises expat errors directly, later
+# versions raise ParseError (a SyntaxError subclass)
+XML_PARSE_ERRORS = (ExpatError, SyntaxError)
+
+
+# Maximum number of namespaced paths which are cached by fixxpath
+FIXXPATH_CACHE_SIZE = 2048
+
+_fixxpath_cache = {}
+
 
 def fixxpath(xpath, namespace=None):
     # ElementTree wants namespaces in its xpaths, so here we add them.
     if not namespace:
         return xpath
 
-    return '/'.join(['{%s}%s' % (namespace, e) for e in xpath.split('/')])
+    # Drivers use a small set of constant paths so the result is cached
+    # instead of being rebuilt on every call
+    key = (xpath, namespace)
+
+    try:
+        return _fixxpath_cache[key]
+    except KeyError:
+        pass
+
+    value = '/'.join(['{%s}%s' % (namespace, e) for e in xpath.split('/')])
+
+    if len(_fixxpath_cache) < FIXXPATH_CACHE_SIZE:
+        _fixxpath_cache[key] = value
+
+    return value
 
 
 def findtext(element, xpath, namespace=None, no_text_value=''):
@@ -41,3 +80,111 @@ def findattr(element, xpath, namespace=None):
 
 def findall(element, xpath, namespace=None):
     return element.findall(fixxpath(xpath=xpath, namespace=namespace))
+
+
+class XmlItemIterator(object):
+    """
+    Incrementally parse a XML document from a file-like object and iterate
+    over the elements which match the provided path.
+
+    The path is relative to the root element (e.g. "reservationSet/item").
+    Each element is yielded as soon as its end tag has been parsed and it's
+    cleared and removed from the tree once the consumer asks for the next one
+    so the memory usage doesn't depend on the number of items in the
+    document. All the other elements are kept and the root element is
+    available as L{root} after the iteration has finished, e.g. for reading
+    the pagination markers.
+    """
+
+    def __init__(self, source, xpath, namespace=None):
+        """
+        @param source: File-like object with a read method.
+        @type source: C{object}
+
+        @param xpath: Path to the items, relative to the root element.
+        @type xpath: C{str}
+
+        @param namespace: Optional namespace of the path elements.
+        @type namespace: C{str}
+        """
+        self.source = source
+        self.tags = [fixxpath(xpath=tag, namespace=namespace)
+                     for tag in xpath.split('/')]
+        self.root = None
+
+    def __iter__(self):
+        depth = len(self.tags) + 1
+        stack = []
+
+        for event, element in ET.iterparse(self.source,
+                                           events=('start', 'end')):
+            if event == 'start':
+                if self.root is None:
+                    self.root = element
+
+                stack.append(element)
+                continue
+
+            if len(stack) == depth and self._matches(stack):
+                yield element
+
+                element.clear()
+                stack[-2].remove(element)
+
+            stack.pop()
+
+    def _matches(self, stack):
+        for element, tag in zip(stack[1:], self.tags):
+            if element.tag != tag:
+                return False
+
+        return True
+
+
+class XmlFieldExtractor(object):
+    """
+    Extract text values of a fixed set of fields from XML elements.
+
+    Namespaced paths are built once when the extractor is created (usually
+    as a driver class attribute) so extracting the values from each element
+    only costs a findtext call per field.
+
+    >>> extractor = XmlFieldExtractor({'id': 'instanceId',
+    ...                                'state': 'instanceState/name'})
+    >>> element = ET.XML('<item><instanceId>i-1</instanceId>'
+    ...                  '<instanceState><name>running</name></instanceState>'
+    ...                  '</item>')
+    >>> sorted(extractor.extract(element).items())
+    [('id', 'i-1'), ('state', 'running')]
+    """
+
+    def __init__(self, fields, namespace=None):
+        """
+        @param fields: Mapping of field name to a path (relative to the
+                       element the values are extracted from).
+        @type fields: C{dict}
+
+        @param namespace: Optional namespace of the path elements.
+        @type namespace: C{str}
+        """
+        self.namespace = namespace
+        self.fields = [(name, fixxpath(xpath=xpath, namespace=namespace))
+                       for name, xpath in fields.items()]
+
+    def extract(self, element, values=None):
+        """
+        Return a dictionary with the field values. Value of a missing element
+        is C{None}.
+
+        @param values: Optional dictionary the values are added to.
+        @type values: C{dict}
+
+        @rtype: C{dict}
+        """
+        if values is None:
+            values = {}
+
+        for name, xpath in self.fields:
+            values[name] = element.findtext(xpath)
+
+        return values
@@ -56,6 +56,14 @@ if sys.version_info <= (2, 4):
 # pre-2.6 will need the ssl PyPI package
 pre_python26 = (sys.version_info[0] == 2 and sys.version_info[1] < 6)
 
+# The asyncio front-end (libcloud.aio) uses syntax which is only valid in
+# Python 3.6 and later so it's not installed (and byte-compiled) on older
+# versions
+IGNORE_PACKAGES = []
+
+if sys.version_info < (3, 6):
+    IGNORE_PACKAGES.append('aio')
+
 
 def read_version_string():
     version = None
@@ -238,11 +246,12 @@ setup(
     author='Apache Software Foundation',
     author_email='dev@libcloud.apache.org',
     requires=([], ['ssl', 'simplejson'],)[pre_python26],
-    packages=get_packages('libcloud'),
+    packages=get_packages('libcloud', ignore=IGNORE_PACKAGES),
     package_dir={
         'libcloud': 'libcloud',
     },
-    package_data={'libcloud': get_data_files('libcloud', parent='libcloud')},
+    package_data={'libcloud': get_data_files('libcloud', parent='libcloud',
+                                             ignore=IGNORE_PACKAGES)},
     license='Apache License (2.0)',
     url='http://libcloud.apache.org/',
     cmdclass={